@@ -0,0 +1,165 @@
+"""Frontend estático con nombres por contenido y versiones precomprimidas.
+
+`build()` copia frontend/ a STATIC_BUILD_DIR. Cada recurso queda como
+`nombre.<hash>.ext`, junto a su `.gz` (y `.br` si está instalado `brotli`),
+e index.html con las referencias reescritas a esos nombres. Es un paso del
+despliegue, no del arranque:
+
+    python -m app.assets build
+
+El último archivo que escribe es MANIFEST. `frontend_app()` (el montaje de /app)
+solo lo lee: si está, AssetFiles sirve la carpeta. Elige la variante
+comprimida según Accept-Encoding. Los nombres con hash van con caché de un año
+(`immutable`: si el contenido cambia, cambia el nombre) e index.html con
+`no-cache`. Si no hay build, se sirve frontend/ tal cual con StaticFiles.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import re
+import sys
+from pathlib import Path
+from typing import Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+try:
+    import brotli  # opcional: pip install brotli
+except ImportError:
+    brotli = None
+
+FRONTEND_DIR = Path(__file__).resolve().parents[2] / "frontend"
+STATIC_BUILD_DIR = Path(os.getenv("STATIC_BUILD_DIR", Path(__file__).resolve().parents[1] / "static_build"))
+
+MANIFEST = "manifest.json"
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+COMPRESSIBLE = {".html", ".js", ".css", ".svg", ".json", ".txt", ".map"}
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))  # orden de preferencia
+HASHED = re.compile(r"\.[0-9a-f]{10}\.\w+$")
+# href="./styles.css", src="app.js?v=3" (las URLs absolutas o con esquema no se tocan)
+REF = re.compile(r'(?P<attr>href|src)="(?:\./)?(?P<name>[^"?#:/]+)(?:\?[^"]*)?"')
+
+log = logging.getLogger("village.assets")
+
+
+def accepted_encodings(header: str) -> set:
+    """Codificaciones aceptadas en un Accept-Encoding (las de q=0 no cuentan)."""
+    found = set()
+    for part in header.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            found.add(coding.strip())
+    return found
+
+
+# -------------------- build --------------------
+def _write(path: Path, data: bytes):
+    # Escribe y renombra: un worker que arranca a la vez nunca sirve un archivo a medias
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def _emit(out: Path, name: str, data: bytes):
+    _write(out / name, data)
+    if Path(name).suffix in COMPRESSIBLE:
+        _write(out / f"{name}.gz", gzip.compress(data, 9, mtime=0))
+        if brotli is not None:
+            _write(out / f"{name}.br", brotli.compress(data))
+
+
+def build(src: Path = FRONTEND_DIR, out: Path = STATIC_BUILD_DIR) -> dict:
+    """Genera la carpeta servida; devuelve {nombre original: nombre con hash}."""
+    out.mkdir(parents=True, exist_ok=True)
+    manifest = {}
+    for path in sorted(p for p in src.iterdir() if p.is_file() and p.suffix != ".html"):
+        data = path.read_bytes()
+        hashed = f"{path.stem}.{hashlib.sha256(data).hexdigest()[:10]}{path.suffix}"
+        if not (out / hashed).exists():  # mismo contenido, mismo nombre: ya está
+            _emit(out, hashed, data)
+        manifest[path.name] = hashed
+    # Los hashes viejos se conservan: una pestaña abierta con el index anterior los sigue pidiendo
+
+    def rewrite(m):
+        name = manifest.get(m["name"])
+        return f'{m["attr"]}="./{name}"' if name else m[0]
+
+    for path in src.glob("*.html"):
+        _emit(out, path.name, REF.sub(rewrite, path.read_text(encoding="utf-8")).encode("utf-8"))
+    # Al final: si existe, el build está completo
+    _write(out / MANIFEST, json.dumps(manifest, indent=2).encode("utf-8"))
+    return manifest
+
+
+def read_manifest(out: Path = STATIC_BUILD_DIR) -> Optional[dict]:
+    try:
+        return json.loads((out / MANIFEST).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+# -------------------- servir --------------------
+class AssetFiles(StaticFiles):
+    """StaticFiles que sirve las variantes precomprimidas y fija el Cache-Control."""
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        request_headers = Headers(scope=scope)
+        name = str(full_path)
+        headers = {"Cache-Control": IMMUTABLE if HASHED.search(name) else REVALIDATE}
+        path = name
+        if Path(name).suffix in COMPRESSIBLE:
+            headers["Vary"] = "Accept-Encoding"
+            accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+            for coding, suffix in ENCODINGS:
+                if coding not in accepted:
+                    continue
+                try:
+                    stat_result = os.stat(name + suffix)
+                except FileNotFoundError:
+                    continue
+                path = name + suffix
+                headers["Content-Encoding"] = coding
+                break
+
+        media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        response = FileResponse(
+            path, status_code=status_code, headers=headers, media_type=media_type, stat_result=stat_result
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+def frontend_app(out: Path = STATIC_BUILD_DIR, src: Path = FRONTEND_DIR) -> StaticFiles:
+    """La app que se monta en /app: el build si existe, si no frontend/ sin hash ni caché."""
+    if read_manifest(out) is not None:
+        return AssetFiles(directory=str(out), html=True)
+    log.warning("sin build en %s: se sirve %s sin hash ni precompresión (python -m app.assets build)", out, src)
+    return StaticFiles(directory=str(src), html=True)
+
+
+def _main(argv):
+    if len(argv) < 2 or argv[1] != "build":
+        print("uso: python -m app.assets build")
+        return 2
+    for original, hashed in build().items():
+        print(f"{original} -> {hashed}")
+    print(f"en {STATIC_BUILD_DIR}" + ("" if brotli else " (sin brotli: solo .gz)"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv))
@@ -1,29 +1,90 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from .database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from .database import DEFAULT_TENANT, current_tenant, get_db
 from . import models
 
 SECRET_KEY = "HOLI_HOLI"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 6
 
+# Caché de usuarios autenticados (evita un SELECT por request)
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "30"))  # segundos
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "1024"))
+# Cada cuánto se mira la versión de `users` (cambios hechos por otros workers)
+PRINCIPAL_VERSION_CHECK = float(os.getenv("PRINCIPAL_VERSION_CHECK", "1"))  # segundos
+
+# Costes de argon2 (si cambian, el login rehashea la contraseña de forma transparente)
+ARGON2_SETTINGS = {
+    f"argon2__{name}": int(os.environ[env])
+    for name, env in (
+        ("time_cost", "ARGON2_TIME_COST"),
+        ("memory_cost", "ARGON2_MEMORY_COST"),  # KiB
+        ("parallelism", "ARGON2_PARALLELISM"),
+    )
+    if os.getenv(env)
+}
+
+# Pool dedicado para argon2: no ocupa el threadpool compartido de FastAPI
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_QUEUE = int(os.getenv("HASH_QUEUE", "16"))  # peticiones que pueden esperar turno
+
 pwd_context = CryptContext(
     schemes=["argon2"],
     default="argon2",
     deprecated="auto",
+    **ARGON2_SETTINGS,
 )
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+oauth2_optional = OAuth2PasswordBearer(tokenUrl="/api/auth/login", auto_error=False)
+
+
+class HashingPool:
+    """Executor acotado: si está lleno se rechaza al instante con 503."""
+
+    def __init__(self, workers: int, queue: int):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="argon2")
+        self._slots = threading.BoundedSemaphore(workers + queue)
+
+    def submit(self, fn, *args) -> Future:
+        if not self._slots.acquire(blocking=False):
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Servidor ocupado, intenta de nuevo en unos segundos",
+                headers={"Retry-After": "1"},
+            )
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+hashing_pool = HashingPool(HASH_WORKERS, HASH_QUEUE)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+
+async def hash_password(password: str) -> str:
+    return await asyncio.wrap_future(hashing_pool.submit(pwd_context.hash, password))
+
+async def verify_and_update_password(plain_password: str, hashed_password: str):
+    """(ok, nuevo_hash): nuevo_hash no es None si el hash usa costes viejos."""
+    return await asyncio.wrap_future(
+        hashing_pool.submit(pwd_context.verify_and_update, plain_password, hashed_password)
+    )
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -32,27 +93,151 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> models.User:
+@dataclass(frozen=True)
+class Principal:
+    """Copia inmutable de los campos del usuario que usan las rutas."""
+    id: int
+    name: str
+    email: str
+    role: str
+    is_active: bool
+
+    @classmethod
+    def from_user(cls, user: models.User) -> "Principal":
+        return cls(user.id, user.name, user.email, user.role, user.is_active)
+
+
+class PrincipalCache:
+    """LRU acotada con TTL, indexada por (tenant, user_id).
+
+    `invalidate` solo limpia este proceso. Para los cambios de otros workers se
+    compara la versión de la tabla `users` (versions.bump) cada
+    `check_interval` segundos: si cambió, se vacían las entradas del tenant.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, check_interval: float = PRINCIPAL_VERSION_CHECK):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._versions: dict = {}  # tenant -> (versión de users vista, próximo chequeo)
+        self._lock = threading.Lock()
+
+    def version_due(self) -> bool:
+        """True si toca leer la versión de users; la próxima lectura queda agendada."""
+        tenant = current_tenant.get()
+        now = time.monotonic()
+        with self._lock:
+            version, next_check = self._versions.get(tenant, (None, 0.0))
+            if now < next_check:
+                return False
+            self._versions[tenant] = (version, now + self.check_interval)
+            return True
+
+    def sync_version(self, version: int) -> None:
+        tenant = current_tenant.get()
+        with self._lock:
+            seen, next_check = self._versions.get(tenant, (None, 0.0))
+            if seen is not None and seen != version:
+                for key in [k for k in self._data if k[0] == tenant]:
+                    del self._data[key]
+            self._versions[tenant] = (version, next_check)
+
+    def get(self, user_id: int) -> Optional[Principal]:
+        key = (current_tenant.get(), user_id)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, principal: Principal) -> None:
+        key = (current_tenant.get(), principal.id)
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, principal)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._data.pop((current_tenant.get(), user_id), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._versions.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+principal_cache = PrincipalCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL)
+
+
+async def principal_from_token(db: AsyncSession, token: Optional[str]) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    if not token:
+        raise credentials_exception
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: int = int(payload.get("sub"))
-        if user_id is None:
-            raise credentials_exception
-    except JWTError:
+    except (JWTError, TypeError, ValueError):
         raise credentials_exception
+    # El token solo vale en el condominio que lo emitió
+    if payload.get("tid", DEFAULT_TENANT) != current_tenant.get():
+        raise credentials_exception
+
+    if principal_cache.version_due():
+        T = models.TableVersion
+        version = await db.scalar(select(T.version).where(T.table_name == "users"))
+        principal_cache.sync_version(version or 0)
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
 
-    user = db.get(models.User, user_id)
-    if user is None or not user.is_active:
+    user = await db.get(models.User, user_id)
+    if user is None or not user.is_active or user.deleted_at is not None:
         raise credentials_exception
-    return user
+    principal = Principal.from_user(user)
+    principal_cache.put(principal)
+    return principal
+
+
+async def get_current_user(db: AsyncSession = Depends(get_db), token: str = Depends(oauth2_scheme)) -> Principal:
+    return await principal_from_token(db, token)
+
+
+async def get_stream_user(
+    db: AsyncSession = Depends(get_db),
+    header_token: Optional[str] = Depends(oauth2_optional),
+    token: Optional[str] = Query(None),
+) -> Principal:
+    # EventSource no puede enviar headers: se acepta también ?token=
+    return await principal_from_token(db, header_token or token)
 
 def require_role(*allowed_roles: str):
-    def checker(user: models.User = Depends(get_current_user)):
+    async def checker(user: Principal = Depends(get_current_user)):
         if user.role not in allowed_roles:
             raise HTTPException(status_code=403, detail="Insufficient permissions")
         return user
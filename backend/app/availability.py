@@ -0,0 +1,153 @@
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import DateTime, Integer, and_, literal, select, union_all
+
+from . import models
+from .database import current_tenant
+
+# Las reservas canceladas no ocupan el espacio
+BLOCKING = models.Reservation.status != "cancelled"
+
+# Rango máximo que se puede consultar de una vez
+MAX_WINDOW = timedelta(days=31)
+
+# Sin referencias fuertes: el lock de una amenidad vive mientras alguien lo tiene o
+# lo espera (o un lote lo retiene), así el dict no crece con cada amenidad usada
+_amenity_locks: "weakref.WeakValueDictionary[tuple, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def _amenity_lock(amenity_id: int) -> asyncio.Lock:
+    # Por tenant: la amenidad 3 de un condominio no es la de otro
+    return _amenity_locks.setdefault((current_tenant.get(), amenity_id), asyncio.Lock())
+
+
+@asynccontextmanager
+async def booking_lock(db, amenity_id: int):
+    """Serializa las reservas de una misma amenidad.
+
+    El lock local cubre las peticiones de este proceso; el SELECT ... FOR UPDATE
+    sobre la fila de la amenidad cubre al resto de workers en MySQL hasta
+    el commit. Devuelve False si la amenidad no existe. En un lote
+    transaccional (`db.info["held_locks"]`) el lock local se suelta al
+    confirmar el lote.
+    """
+    lock = _amenity_lock(amenity_id)
+    held = db.info.get("held_locks")
+    if held is None:
+        async with lock:
+            yield await _lock_amenity_row(db, amenity_id)
+        return
+    # Lote transaccional: el commit llega al final del lote, que suelta los locks
+    if lock not in held:
+        if lock.locked():
+            # Sin espera (como NOWAIT): el lote ya puede tener escrituras sin confirmar que
+            # quien tiene el lock necesita; esperar trabaría a los dos
+            raise HTTPException(status_code=409, detail="Amenity is busy, retry the batch", headers={"Retry-After": "1"})
+        await lock.acquire()
+        held.append(lock)
+    yield await _lock_amenity_row(db, amenity_id)
+
+
+async def _lock_amenity_row(db, amenity_id: int) -> bool:
+    found = (
+        await db.execute(
+            select(models.Amenity.id)
+            .where(models.Amenity.id == amenity_id, models.Amenity.deleted_at.is_(None))
+            .with_for_update()
+        )
+    ).first()
+    return found is not None
+
+
+async def find_overlap(db, amenity_id: int, start_at: datetime, end_at: datetime):
+    """Primera reserva que choca con [start_at, end_at); llamar dentro de booking_lock.
+
+    Es una lectura con lock (LOCK IN SHARE MODE en MySQL): en REPEATABLE READ
+    una lectura simple usa la foto de la primera consulta de la transacción
+    (p. ej. la del usuario en get_current_user, antes de esperar el lock) y no
+    vería la reserva que acaba de confirmar quien tenía el lock. La lectura
+    con lock lee siempre lo último confirmado.
+    """
+    R = models.Reservation
+    result = await db.execute(
+        select(R.id)
+        .where(
+            R.amenity_id == amenity_id,
+            R.start_at < end_at,
+            R.end_at > start_at,
+            BLOCKING,
+        )
+        .limit(1)
+        .with_for_update(read=True)
+    )
+    return result.first()
+
+
+async def find_conflicts(db, amenity_id: int, spans: List[Tuple[datetime, datetime]]) -> set:
+    """Índices de `spans` que chocan con reservas existentes, en una sola consulta.
+
+    Las ocurrencias van como tabla derivada (UNION ALL de literales: funciona
+    igual en SQLite y MySQL) y se cruzan contra reservations por el índice
+    (amenity_id, start_at, end_at). Lectura con lock, como find_overlap.
+    """
+    if not spans:
+        return set()
+    R = models.Reservation
+    occ = union_all(
+        *(
+            select(
+                literal(i, Integer).label("idx"),
+                literal(s, DateTime).label("start_at"),
+                literal(e, DateTime).label("end_at"),
+            )
+            for i, (s, e) in enumerate(spans)
+        )
+    ).subquery("occ")
+    stmt = (
+        select(occ.c.idx)
+        .join(
+            R,
+            and_(
+                R.amenity_id == amenity_id,
+                R.start_at < occ.c.end_at,
+                R.end_at > occ.c.start_at,
+                BLOCKING,
+            ),
+        )
+        .distinct()
+        .with_for_update(read=True)
+    )
+    return set((await db.execute(stmt)).scalars())
+
+
+async def free_slots(
+    db, amenity_id: int, start: datetime, end: datetime, duration: timedelta
+) -> List[Tuple[datetime, datetime]]:
+    """Huecos libres de al menos `duration` en [start, end), en una sola pasada."""
+    R = models.Reservation
+    busy = await db.execute(
+        select(R.start_at, R.end_at)
+        .where(
+            R.amenity_id == amenity_id,
+            R.start_at < end,
+            R.end_at > start,
+            BLOCKING,
+        )
+        .order_by(R.start_at)
+    )
+
+    slots = []
+    cursor = start
+    for busy_start, busy_end in busy:
+        if busy_start - cursor >= duration:
+            slots.append((cursor, busy_start))
+        if busy_end > cursor:
+            cursor = busy_end
+    if end - cursor >= duration:
+        slots.append((cursor, end))
+    return slots
@@ -0,0 +1,176 @@
+"""POST /api/batch: varias peticiones de la API en un solo viaje.
+
+Cada sub-petición pasa por la app completa dentro del mismo proceso (tenant,
+auth, validación, ETag, métricas) con el token del lote, así que los permisos
+son los mismos que por separado. Sin `transaction`, los GET consecutivos
+corren en paralelo (cada uno con su sesión, de la réplica si hay) y las
+escrituras en orden. Con `transaction=true` todo corre en orden sobre una sola
+sesión del primario y se confirma al final, solo si ninguna sub-petición falló.
+"""
+import asyncio
+import json
+import logging
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import schemas
+from .database import current_subject, current_tenant, shared_session, tenant_engine
+
+# Streaming (SSE, exportaciones) o el lote mismo: no se pueden juntar en una respuesta
+EXCLUDED = ("/api/batch", "/api/events")
+# Headers de la respuesta que se devuelven por sub-petición
+KEPT_HEADERS = ("etag", "cache-control", "retry-after")
+# Headers del lote que no pasan a las sub-peticiones
+DROPPED_HEADERS = (b"content-length", b"content-type", b"if-none-match", b"accept-encoding")
+
+log = logging.getLogger("village.batch")
+
+
+class BatchSession(AsyncSession):
+    """Sesión de un lote transaccional: el commit de cada handler solo hace flush."""
+
+    async def commit(self):
+        await self.flush()
+
+    async def rollback(self):
+        # Un handler deshizo su parte (y con ella todo lo anterior): el lote no se confirma
+        self.info["aborted"] = True
+        await super().rollback()
+
+    async def commit_batch(self):
+        await super().commit()
+
+
+def _scope(base: dict, item: schemas.BatchRequest, body: bytes) -> dict:
+    path, _, query = item.path.partition("?")
+    headers = [(k, v) for k, v in base["headers"] if k not in DROPPED_HEADERS]
+    headers += [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    if item.if_none_match:
+        headers.append((b"if-none-match", item.if_none_match.encode("latin-1")))
+    return {
+        "type": "http",
+        "asgi": base.get("asgi", {"version": "3.0"}),
+        "http_version": base.get("http_version", "1.1"),
+        "scheme": base.get("scheme", "http"),
+        "server": base.get("server"),
+        "client": base.get("client"),
+        "root_path": base.get("root_path", ""),
+        "method": item.method,
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "headers": headers,
+    }
+
+
+async def _call(app, base_scope: dict, item: schemas.BatchRequest) -> dict:
+    path = item.path.partition("?")[0].rstrip("/")
+    if path in EXCLUDED or path.endswith("/export"):
+        return {"id": item.id, "status": 400, "body": {"detail": f"{path} cannot be batched"}}
+
+    body = b"" if item.body is None else json.dumps(item.body).encode()
+    received = False
+    status, headers, chunks = 500, {}, []
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.Event().wait()  # nunca hay desconexión: la respuesta se junta entera
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            for k, v in message.get("headers", []):
+                name = k.decode("latin-1").lower()
+                if name in KEPT_HEADERS:
+                    headers[name] = v.decode("latin-1")
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    try:
+        await app(_scope(base_scope, item, body), receive, send)
+    except Exception:
+        # ServerErrorMiddleware ya respondió 500 y relanza: el lote sigue con las demás
+        log.exception("falló la sub-petición %s %s del lote", item.method, item.path)
+        status, chunks = 500, [b'{"detail":"Internal Server Error"}']
+
+    raw = b"".join(chunks)
+    try:
+        parsed = json.loads(raw) if raw else None
+    except ValueError:
+        parsed = raw.decode("utf-8", "replace")
+    return {"id": item.id, "status": status, "headers": headers, "body": parsed}
+
+
+async def _run_independent(app, scope: dict, requests) -> list:
+    results, reads = [], []
+    for item in requests:
+        if item.method == "GET":
+            reads.append(item)
+            continue
+        # Una escritura cierra el grupo de lecturas anterior: se respeta el orden
+        results += await asyncio.gather(*(_call(app, scope, r) for r in reads))
+        reads = []
+        results.append(await _call(app, scope, item))
+    results += await asyncio.gather(*(_call(app, scope, r) for r in reads))
+    return results
+
+
+_sqlite_writers: dict = {}
+
+
+async def _run_transaction(app, scope: dict, requests) -> tuple:
+    tenant = current_tenant.get()
+    engine = tenant_engine(tenant)
+    if engine.dialect.name != "sqlite":
+        return await _transaction(app, scope, requests, engine)
+    # SQLite admite un solo escritor: dos lotes con escrituras sin confirmar se
+    # trabarían entre sí, así que en este proceso corren de a uno
+    async with _sqlite_writers.setdefault(tenant, asyncio.Lock()):
+        return await _transaction(app, scope, requests, engine)
+
+
+async def _transaction(app, scope: dict, requests, engine) -> tuple:
+    tenant, subject = current_tenant.get(), current_subject.get()
+    db = BatchSession(
+        engine,
+        expire_on_commit=False,
+        info={
+            "tenant": tenant,
+            "replica": False,
+            "held_locks": [],  # locks de reservas, tomados hasta el commit (availability.booking_lock)
+            "writer": (tenant, subject) if subject else None,
+        },
+    )
+    token = shared_session.set(db)
+    results, failed = [], False
+    try:
+        for item in requests:
+            if failed:
+                results.append(
+                    {"id": item.id, "status": 424, "body": {"detail": "Skipped: an earlier request failed"}}
+                )
+                continue
+            result = await _call(app, scope, item)
+            results.append(result)
+            failed = result["status"] >= 400 or bool(db.info.get("aborted"))
+        if failed:
+            await AsyncSession.rollback(db)
+        else:
+            await db.commit_batch()  # aquí salen los eventos y se marca al usuario como escritor
+    finally:
+        shared_session.reset(token)
+        for lock in db.info["held_locks"]:
+            lock.release()
+        await db.close()
+    return results, not failed
+
+
+async def run(app, scope: dict, batch_in: schemas.BatchIn) -> dict:
+    if batch_in.transaction:
+        results, committed = await _run_transaction(app, scope, batch_in.requests)
+        return {"responses": results, "committed": committed}
+    return {"responses": await _run_independent(app, scope, batch_in.requests), "committed": None}
@@ -0,0 +1,147 @@
+"""Facturación mensual: una expensa (Charge) por unidad y período según su área.
+
+    python -m app.billing run 2025-03 [--tenant SLUG]
+    POST /api/billing/runs  {"period": "2025-03"}
+
+La tarifa sale de BILLING_SCHEDULE (JSON) o de la clave `billing` del tenant en
+TENANTS_FILE:
+
+    {"fixed": 20.0, "tiers": [[0, 1.5], [100, 1.2]], "minimum": 50.0}
+
+`tiers` son tramos marginales [desde_m2, tarifa_por_m2]: con el ejemplo, una
+unidad de 120 m² paga 20 + 100 * 1.5 + 20 * 1.2. El importe de todas las
+unidades se calcula en la base con una sola consulta (una expresión CASE sobre
+`area_m2`) y los cargos se insertan por lotes en una transacción. La corrida es
+idempotente: solo factura las unidades que aún no tienen cargo en el período, y
+la restricción única (period, concept, unit_id) frena a dos corridas simultáneas.
+"""
+import asyncio
+import json
+import os
+import re
+import sys
+from datetime import datetime
+from typing import List, NamedTuple, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import case, func, insert, literal, select
+from sqlalchemy.exc import IntegrityError
+
+from . import models, summaries, versions
+from .database import TENANTS, current_tenant
+
+CONCEPT = "dues"
+PERIOD_PATTERN = r"^\d{4}-(0[1-9]|1[0-2])$"
+CHUNK_SIZE = 1000
+DEFAULT_SCHEDULE = {"fixed": 0.0, "tiers": [[0, 1.0]], "minimum": 0.0}
+
+
+class FeeSchedule(NamedTuple):
+    fixed: float
+    tiers: Tuple[Tuple[float, float], ...]  # (desde_m2, tarifa) ordenados
+    minimum: float
+
+    @classmethod
+    def parse(cls, raw: dict) -> "FeeSchedule":
+        tiers = tuple((float(start), float(rate)) for start, rate in raw.get("tiers", DEFAULT_SCHEDULE["tiers"]))
+        if not tiers or tiers[0][0] != 0 or any(a[0] >= b[0] for a, b in zip(tiers, tiers[1:])):
+            raise ValueError("tiers debe empezar en 0 m² y estar ordenado de menor a mayor")
+        return cls(float(raw.get("fixed", 0.0)), tiers, float(raw.get("minimum", 0.0)))
+
+    def amount(self, area):
+        """Expresión SQL del importe para la columna (o valor) `area`."""
+        total = literal(self.fixed)
+        bounds = [start for start, _ in self.tiers[1:]] + [None]
+        for (start, rate), end in zip(self.tiers, bounds):
+            over = area - start
+            if end is not None:
+                # Tramo completo si el área lo supera; si no, lo que entra en él
+                over = case((area >= end, literal(end - start)), else_=over)
+            total = total + rate * case((area > start, over), else_=0.0)
+        total = func.round(total, 2)
+        return case((total < self.minimum, literal(self.minimum)), else_=total)
+
+
+BILLING_SCHEDULE = FeeSchedule.parse(json.loads(os.getenv("BILLING_SCHEDULE") or "{}") or DEFAULT_SCHEDULE)
+
+
+def schedule_for(tenant: str) -> FeeSchedule:
+    raw = TENANTS.get(tenant, {}).get("billing")
+    return FeeSchedule.parse(raw) if raw else BILLING_SCHEDULE
+
+
+def current_period() -> str:
+    return datetime.utcnow().strftime("%Y-%m")
+
+
+async def run_billing(db, period: str) -> dict:
+    """Genera las expensas del período que falten; devuelve el resumen de la corrida."""
+    U, C = models.Unit, models.Charge
+    schedule = schedule_for(current_tenant.get())
+    area = func.coalesce(U.area_m2, 0.0)
+    billed = select(C.unit_id).where(C.period == period, C.concept == CONCEPT)
+    already = await db.scalar(select(func.count()).select_from(billed.subquery()))
+    # Una pasada: columnas sueltas (sin ORM) con el importe ya calculado por la base
+    rows = (
+        await db.execute(
+            select(U.id, U.owner_id, area, schedule.amount(area))
+            .where(U.id.not_in(billed), U.deleted_at.is_(None))
+            .order_by(U.id)
+        )
+    ).all()
+
+    now = datetime.utcnow()
+    values: List[dict] = [
+        {
+            "unit_id": unit_id,
+            "user_id": owner_id,
+            "period": period,
+            "concept": CONCEPT,
+            "area_m2": unit_area,
+            "amount": amount,
+            "created_at": now,
+        }
+        for unit_id, owner_id, unit_area, amount in rows
+    ]
+    try:
+        for i in range(0, len(values), CHUNK_SIZE):
+            await db.execute(insert(C), values[i : i + CHUNK_SIZE])
+        if values:
+            await summaries.charges_added(db, values)
+            await versions.bump(db, "charges")
+        await db.commit()
+    except IntegrityError:
+        # Otra corrida del mismo período insertó primero
+        await db.rollback()
+        raise HTTPException(status_code=409, detail=f"Another billing run for {period} is in progress, retry")
+    return {
+        "period": period,
+        "charged": len(values),
+        "already_billed": already,
+        "total": round(sum(v["amount"] for v in values), 2),
+    }
+
+
+async def _main(argv):
+    from .database import dispose_engine, session_factory
+
+    if len(argv) < 2 or argv[1] != "run":
+        print("uso: python -m app.billing run [YYYY-MM] [--tenant SLUG]")
+        return 2
+    period = argv[2] if len(argv) > 2 and not argv[2].startswith("--") else current_period()
+    if not re.match(PERIOD_PATTERN, period):
+        print(f"período inválido: {period} (YYYY-MM)")
+        return 2
+    tenants = [argv[argv.index("--tenant") + 1]] if "--tenant" in argv else list(TENANTS)
+    try:
+        for tenant in tenants:
+            current_tenant.set(tenant)
+            async with session_factory(tenant)() as db:
+                print(tenant, await run_billing(db, period))
+    finally:
+        await dispose_engine()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv)))
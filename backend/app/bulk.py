@@ -0,0 +1,172 @@
+import asyncio
+import csv
+import io
+import json
+from datetime import datetime
+from typing import List, Tuple
+
+from fastapi import HTTPException, Request
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+from . import events, models, schemas, sequences, summaries, versions
+from .auth import HASH_WORKERS, hash_password
+
+# Filas por executemany y máximo de filas por petición
+BATCH_SIZE = 500
+MAX_ROWS = 10_000
+
+
+async def read_rows(request: Request) -> List[dict]:
+    """Filas de un array JSON o de un CSV con cabecera (Content-Type: text/csv)."""
+    body = await request.body()
+    if request.headers.get("content-type", "").startswith("text/csv"):
+        try:
+            text = body.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail="CSV must be UTF-8")
+        # Celdas vacías = campo ausente, para que apliquen los valores por defecto
+        rows = [
+            {k: v for k, v in row.items() if k and v not in ("", None)}
+            for row in csv.DictReader(io.StringIO(text))
+        ]
+    else:
+        try:
+            rows = json.loads(body)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid JSON body")
+        if not isinstance(rows, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array or text/csv")
+
+    if len(rows) > MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"Too many rows (max {MAX_ROWS})")
+    return rows
+
+
+def _validate(rows: List[dict], schema) -> Tuple[list, list]:
+    valid, errors = [], []
+    for n, raw in enumerate(rows, start=1):
+        if not isinstance(raw, dict):
+            errors.append({"row": n, "error": "Row must be an object"})
+            continue
+        try:
+            valid.append((n, schema.model_validate(raw)))
+        except ValidationError as e:
+            msg = "; ".join(
+                f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()
+            )
+            errors.append({"row": n, "error": msg})
+    return valid, errors
+
+
+async def _existing(db, column, values, *where) -> set:
+    """Valores de `values` que ya existen en `column` (una sola consulta)."""
+    values = {v for v in values if v is not None}
+    if not values:
+        return set()
+    return set((await db.execute(select(column).where(column.in_(values), *where))).scalars())
+
+
+async def _live_ids(db, model, values) -> set:
+    # Referencias: un registro borrado (lápida) ya no se puede usar
+    return await _existing(db, model.id, values, model.deleted_at.is_(None))
+
+
+def _check_unique(valid, key, taken: set, errors: list, label: str):
+    seen, kept = set(), []
+    for n, item in valid:
+        value = getattr(item, key)
+        if value in taken:
+            errors.append({"row": n, "error": f"{label} already exists"})
+        elif value in seen:
+            errors.append({"row": n, "error": f"Duplicate {label} in upload"})
+        else:
+            seen.add(value)
+            kept.append((n, item))
+    return kept
+
+
+def _check_refs(valid, key, known: set, errors: list, label: str):
+    kept = []
+    for n, item in valid:
+        value = getattr(item, key)
+        if value is not None and value not in known:
+            errors.append({"row": n, "error": f"{label} {value} not found"})
+        else:
+            kept.append((n, item))
+    return kept
+
+
+def _abort_on_errors(errors: list, mode: str):
+    if errors and mode == "all_or_nothing":
+        raise HTTPException(status_code=422, detail=_report(0, errors))
+
+
+async def _insert(db, model, values: List[dict], errors: list, mode: str) -> int:
+    _abort_on_errors(errors, mode)
+    # Todo en una transacción; executemany por lotes
+    try:
+        for i in range(0, len(values), BATCH_SIZE):
+            await db.execute(insert(model), values[i : i + BATCH_SIZE])
+        if values:
+            await versions.bump(db, model.__tablename__)
+        await db.commit()
+    except IntegrityError:
+        # Otra petición insertó un código/email repetido entre la validación y el commit
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Conflicting rows were inserted concurrently, retry the upload")
+    return len(values)
+
+
+def _report(inserted: int, errors: list) -> dict:
+    return {"inserted": inserted, "errors": sorted(errors, key=lambda e: e["row"])}
+
+
+async def import_units(db, rows: List[dict], mode: str) -> dict:
+    valid, errors = _validate(rows, schemas.UnitIn)
+    taken = await _existing(db, models.Unit.code, (u.code for _, u in valid))
+    valid = _check_unique(valid, "code", taken, errors, "Unit code")
+    owners = await _live_ids(db, models.User, (u.owner_id for _, u in valid))
+    valid = _check_refs(valid, "owner_id", owners, errors, "Owner")
+
+    inserted = await _insert(db, models.Unit, [u.model_dump() for _, u in valid], errors, mode)
+    return _report(inserted, errors)
+
+
+async def import_users(db, rows: List[dict], mode: str) -> dict:
+    valid, errors = _validate(rows, schemas.UserCreate)
+    taken = await _existing(db, models.User.email, (u.email for _, u in valid))
+    valid = _check_unique(valid, "email", taken, errors, "Email")
+    _abort_on_errors(errors, mode)
+
+    # argon2 en el pool dedicado, de a HASH_WORKERS a la vez para no acaparar la cola
+    hashes = []
+    for i in range(0, len(valid), HASH_WORKERS):
+        window = valid[i : i + HASH_WORKERS]
+        hashes += await asyncio.gather(*(hash_password(u.password) for _, u in window))
+
+    values = [
+        {"name": u.name, "email": u.email, "hashed_password": h, "role": u.role, "is_active": True}
+        for (_, u), h in zip(valid, hashes)
+    ]
+    inserted = await _insert(db, models.User, values, errors, mode)
+    return _report(inserted, errors)
+
+
+async def import_payments(db, rows: List[dict], mode: str) -> dict:
+    valid, errors = _validate(rows, schemas.PaymentIn)
+    users = await _live_ids(db, models.User, (p.user_id for _, p in valid))
+    valid = _check_refs(valid, "user_id", users, errors, "User")
+    units = await _live_ids(db, models.Unit, (p.unit_id for _, p in valid))
+    valid = _check_refs(valid, "unit_id", units, errors, "Unit")
+
+    _abort_on_errors(errors, mode)
+    now = datetime.utcnow()
+    receipts = await sequences.next_receipts(db, len(valid))
+    values = [{**p.model_dump(), "paid_at": now, "receipt": r} for (_, p), r in zip(valid, receipts)]
+    await summaries.payments_added(db, values)
+    if values:
+        events.emit_bulk(db, "payments", len(values))
+    inserted = await _insert(db, models.Payment, values, errors, mode)
+    return _report(inserted, errors)
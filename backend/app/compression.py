@@ -0,0 +1,117 @@
+"""Compresión negociada (br/gzip) de las respuestas dinámicas.
+
+Se comprime solo lo que es texto (JSON, CSV, NDJSON...) y mide al menos
+COMPRESS_MIN_SIZE bytes. No se tocan las respuestas que ya traen
+Content-Encoding (los archivos precomprimidos de /app) ni el SSE
+(`text/event-stream`), que tiene que salir evento por evento. Las exportaciones
+en streaming se comprimen por partes, sin juntar el cuerpo entero.
+"""
+import os
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from .assets import accepted_encodings
+
+try:
+    import brotli  # opcional, igual que en assets.py
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # respuestas dinámicas: más rápido que el máximo
+TEXT_TYPES = ("application/json", "application/x-ndjson", "text/csv", "text/plain", "text/html")
+
+
+class _Gzip:
+    def __init__(self):
+        self._z = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits=31: formato gzip
+
+    def chunk(self, data: bytes) -> bytes:
+        # SYNC_FLUSH: cada parte llega al cliente en cuanto sale, sin esperar al final
+        return self._z.compress(data) + self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._z.compress(data) + self._z.flush()
+
+
+class _Brotli:
+    def __init__(self):
+        self._c = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._c.process(data) + self._c.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._c.process(data) + self._c.finish()
+
+
+def _choose(accept_encoding: str):
+    accepted = accepted_encodings(accept_encoding)
+    if brotli is not None and "br" in accepted:
+        return "br", _Brotli
+    if "gzip" in accepted:
+        return "gzip", _Gzip
+    return None, None
+
+
+class CompressionMiddleware:
+    """ASGI puro, como MetricsMiddleware: no rompe el streaming."""
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        coding, codec = _choose(Headers(scope=scope).get("accept-encoding", ""))
+        if coding is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, compressor, passthrough
+            if passthrough:
+                return await send(message)
+            if message["type"] == "http.response.start":
+                start = message  # se decide con el primer trozo del cuerpo
+                return
+            if message["type"] != "http.response.body":
+                return await send(message)
+
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+            if compressor is None:
+                headers = Headers(raw=start.get("headers", []))
+                content_type = headers.get("content-type", "").split(";")[0].strip()
+                if (
+                    "content-encoding" in headers
+                    or content_type not in TEXT_TYPES
+                    or (not more and len(body) < self.minimum_size)
+                ):
+                    passthrough = True
+                    await send(start)
+                    return await send(message)
+
+                compressor = codec()
+                out = MutableHeaders(raw=start.setdefault("headers", []))
+                out["Content-Encoding"] = coding
+                out.add_vary_header("Accept-Encoding")
+                if more:
+                    del out["Content-Length"]
+                    await send(start)
+                    return await send({"type": "http.response.body", "body": compressor.chunk(body), "more_body": True})
+                data = compressor.finish(body)
+                out["Content-Length"] = str(len(data))
+                await send(start)
+                return await send({"type": "http.response.body", "body": data})
+
+            data = compressor.chunk(body) if more else compressor.finish(body)
+            await send({"type": "http.response.body", "body": data, "more_body": more})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,299 @@
+"""Feed de cambios en tiempo real (SSE) para reservas, tickets y pagos.
+
+Los handlers llaman a `emit` antes del commit; el evento solo sale si la
+transacción se confirma. El broker se elige con EVENTS_BROKER:
+
+- `memory` (por defecto): buffer circular en el proceso, para un solo worker.
+- `database`: tabla outbox escrita en la misma transacción que el cambio; cada
+  worker la lee con un poller y reparte a sus clientes (varios workers).
+
+El `id` de cada evento es el token de reanudación (`?since=` o Last-Event-ID).
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import delete, event as sa_event, func, select
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+from .database import DEFAULT_TENANT, current_tenant, session_factory
+
+log = logging.getLogger("village.events")
+
+EVENTS_BROKER = os.getenv("EVENTS_BROKER", "memory")  # memory | database
+EVENTS_BUFFER = int(os.getenv("EVENTS_BUFFER", "1000"))  # eventos recientes en memoria
+EVENTS_POLL_INTERVAL = float(os.getenv("EVENTS_POLL_INTERVAL", "0.5"))  # segundos (broker database)
+EVENTS_RETENTION_HOURS = int(os.getenv("EVENTS_RETENTION_HOURS", "24"))  # outbox
+HEARTBEAT = 15  # segundos sin eventos antes de mandar un comentario keep-alive
+GAP_GRACE = 2.0  # segundos que se espera un id faltante (transacción aún sin commit)
+
+# Esquema con el que se serializa cada tópico
+TOPICS = {
+    "reservations": schemas.ReservationOut,
+    "tickets": schemas.TicketOut,
+    "payments": schemas.PaymentOut,
+}
+
+
+@dataclass(frozen=True)
+class Event:
+    id: int
+    topic: str
+    action: str
+    user_id: Optional[int]
+    data: dict
+
+    def visible_to(self, principal) -> bool:
+        return principal.role == "admin" or (self.user_id is not None and self.user_id == principal.id)
+
+    def sse(self) -> str:
+        body = json.dumps({"id": self.id, "topic": self.topic, "action": self.action, "data": self.data})
+        return f"id: {self.id}\nevent: {self.topic}\ndata: {body}\n\n"
+
+
+class MemoryBroker:
+    """Buffer circular en el proceso; los eventos se publican en el commit."""
+
+    def __init__(self, size: int):
+        self._ring: deque = deque(maxlen=size)
+        self._changed = asyncio.Event()
+        self.last_id = 0
+        self.ready = asyncio.Event()  # last_id ya refleja lo que hay (los streams esperan esto)
+
+    # --- escritura ---
+    def stage(self, db, topic: str, action: str, user_id: Optional[int], data: dict):
+        db.info.setdefault("pending_events", []).append((topic, action, user_id, data))
+
+    def committed(self, pending: list):
+        for topic, action, user_id, data in pending:
+            self.last_id += 1
+            self._ring.append(Event(self.last_id, topic, action, user_id, data))
+        self._notify()
+
+    def _notify(self):
+        # Despierta a todos los suscriptores y deja un Event nuevo para la próxima espera
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    # --- lectura ---
+    def changed(self) -> asyncio.Event:
+        return self._changed
+
+    async def read(self, since: int) -> Optional[List[Event]]:
+        """Eventos con id > since; None si `since` ya no está en el buffer (el cliente debe recargar)."""
+        if since > self.last_id:
+            return None  # token de otro arranque del proceso
+        if self._ring and since < self._ring[0].id - 1:
+            return None
+        return [e for e in self._ring if e.id > since]
+
+    def start(self):
+        self.ready.set()
+
+    async def stop(self):
+        pass
+
+
+class DatabaseBroker(MemoryBroker):
+    """Outbox en la base: sirve para varios workers.
+
+    Los eventos se insertan en `events_outbox` dentro de la transacción del
+    cambio. Un poller por proceso copia las filas nuevas al buffer local, así
+    los clientes SSE no consultan la base; solo una reanudación más antigua que
+    el buffer baja a la tabla.
+    """
+
+    def __init__(self, size: int, session_factory):
+        super().__init__(size)
+        self._session_factory = session_factory
+        self._poke = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._gap_since: Optional[float] = None
+        self._trimmed_at = 0.0
+
+    def stage(self, db, topic, action, user_id, data):
+        db.add(models.OutboxEvent(topic=topic, action=action, user_id=user_id, payload=json.dumps(data)))
+        db.info["pending_events"] = True
+
+    def committed(self, pending):
+        # Commit en este proceso: no esperar al siguiente intervalo del poller
+        self._poke.set()
+
+    @staticmethod
+    def _from_row(row) -> Event:
+        return Event(row.id, row.topic, row.action, row.user_id, json.loads(row.payload))
+
+    def start(self):
+        # Sin consultas aquí: el arranque no depende de que la base responda
+        self._task = asyncio.create_task(self._run())
+
+    async def _init_cursor(self):
+        while True:
+            try:
+                async with self._session_factory() as db:
+                    self.last_id = (await db.execute(select(func.max(models.OutboxEvent.id)))).scalar() or 0
+                self.ready.set()
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning("esperando la base: %r", e)
+                await asyncio.sleep(EVENTS_POLL_INTERVAL * 4)
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        await self._init_cursor()
+        while True:
+            try:
+                await self._poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:  # la base puede no estar disponible un momento
+                log.warning("poller: %r", e)
+            try:
+                await asyncio.wait_for(self._poke.wait(), EVENTS_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._poke.clear()
+
+    async def _poll(self):
+        E = models.OutboxEvent
+        async with self._session_factory() as db:
+            rows = (
+                await db.execute(select(E).where(E.id > self.last_id).order_by(E.id).limit(500))
+            ).scalars().all()
+            if time.monotonic() - self._trimmed_at > 60:
+                cutoff = datetime.utcnow() - timedelta(hours=EVENTS_RETENTION_HOURS)
+                await db.execute(delete(E).where(E.created_at < cutoff))
+                await db.commit()
+                self._trimmed_at = time.monotonic()
+
+        fresh = False
+        for row in rows:
+            if row.id > self.last_id + 1:
+                # Hueco: otra transacción tomó ese id y aún no confirmó (o hizo rollback).
+                # Se espera GAP_GRACE para no entregar fuera de orden.
+                self._gap_since = self._gap_since or time.monotonic()
+                if time.monotonic() - self._gap_since < GAP_GRACE:
+                    break
+            self._gap_since = None
+            self.last_id = row.id
+            self._ring.append(self._from_row(row))
+            fresh = True
+        if fresh:
+            self._notify()
+
+    async def read(self, since):
+        if since > self.last_id:
+            return None
+        if since == self.last_id or (self._ring and since >= self._ring[0].id - 1):
+            return [e for e in self._ring if e.id > since]
+        # Reanudación más vieja que el buffer: leer de la tabla
+        E = models.OutboxEvent
+        async with self._session_factory() as db:
+            oldest = (await db.execute(select(func.min(E.id)))).scalar()
+            if oldest is None or since < oldest - 1:
+                return None
+            rows = (
+                await db.execute(
+                    select(E).where(E.id > since, E.id <= self.last_id).order_by(E.id).limit(self._ring.maxlen)
+                )
+            ).scalars().all()
+        return [self._from_row(r) for r in rows]
+
+
+# Un broker por condominio, creado al primer evento o suscripción: los ids y el
+# outbox son de la base de cada tenant.
+_brokers: dict = {}
+
+
+def broker_for(tenant: Optional[str] = None) -> MemoryBroker:
+    tenant = tenant or current_tenant.get()
+    found = _brokers.get(tenant)
+    if found is None:
+        if EVENTS_BROKER == "database":
+            found = DatabaseBroker(EVENTS_BUFFER, session_factory(tenant))
+        else:
+            found = MemoryBroker(EVENTS_BUFFER)
+        _brokers[tenant] = found
+        found.start()
+    return found
+
+
+async def stop_all():
+    for b in _brokers.values():
+        await b.stop()
+    _brokers.clear()
+
+
+def _session_tenant(session) -> str:
+    return session.info.get("tenant", DEFAULT_TENANT)
+
+
+@sa_event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    pending = session.info.pop("pending_events", None)
+    if pending:
+        broker_for(_session_tenant(session)).committed(pending)
+
+
+@sa_event.listens_for(Session, "after_rollback")
+def _after_rollback(session):
+    session.info.pop("pending_events", None)
+
+
+# -------------------- API para los handlers --------------------
+def emit(db, topic: str, action: str, obj, user_id: Optional[int]):
+    """Encola un evento; se publica solo si la transacción hace commit.
+
+    `obj` debe tener id (hacer flush antes en las altas).
+    """
+    data = TOPICS[topic].model_validate(obj).model_dump(mode="json")
+    broker_for(_session_tenant(db)).stage(db, topic, action, user_id, data)
+
+
+def emit_bulk(db, topic: str, inserted: int):
+    # Cargas masivas: un solo aviso (solo admins) en vez de un evento por fila
+    broker_for(_session_tenant(db)).stage(db, topic, "bulk", None, {"inserted": inserted})
+
+
+async def stream(request, principal, since: Optional[int], topics: Optional[set]):
+    """Generador SSE: primero el delta desde `since`, luego los eventos nuevos."""
+    yield "retry: 3000\n\n"
+    broker = broker_for()
+    await broker.ready.wait()
+    cursor = broker.last_id if since is None else since
+    while True:
+        changed = broker.changed()
+        batch = await broker.read(cursor)
+        if batch is None:
+            # El token es más viejo que lo retenido: el cliente debe recargar los listados
+            cursor = broker.last_id
+            yield f"id: {cursor}\nevent: reset\ndata: {{}}\n\n"
+            continue
+        for ev in batch:
+            cursor = ev.id
+            if ev.visible_to(principal) and (not topics or ev.topic in topics):
+                yield ev.sse()
+        if batch and cursor < broker.last_id:
+            continue  # quedan eventos: seguir sin esperar
+        if await request.is_disconnected():
+            return
+        try:
+            await asyncio.wait_for(changed.wait(), HEARTBEAT)
+        except asyncio.TimeoutError:
+            yield ": ping\n\n"
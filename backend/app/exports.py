@@ -0,0 +1,63 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from fastapi.responses import StreamingResponse
+
+from .database import session_factory
+
+# Filas que se traen del cursor del servidor en cada vuelta
+CHUNK_SIZE = 1000
+
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+async def _iter_chunks(factory, stmt):
+    # Sesión propia: la de get_db se cierra antes de que empiece el streaming
+    async with factory() as db:
+        result = await db.stream(stmt.execution_options(yield_per=CHUNK_SIZE))
+        async for chunk in result.partitions():
+            yield chunk
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+async def _csv_lines(factory, stmt, fields):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(fields)
+    async for chunk in _iter_chunks(factory, stmt):
+        writer.writerows(chunk)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+async def _ndjson_lines(factory, stmt, fields):
+    async for chunk in _iter_chunks(factory, stmt):
+        yield "".join(
+            json.dumps(dict(zip(fields, row)), default=_json_default) + "\n"
+            for row in chunk
+        )
+
+
+def stream_export(db, stmt, fmt: str, filename: str) -> StreamingResponse:
+    """Exporta `stmt` (select de columnas) como CSV o NDJSON sin cargarlo en memoria.
+
+    Lee de la misma base que `db` (la réplica, si get_db la eligió).
+    """
+    factory = session_factory(db.info["tenant"], replica=db.info["replica"])
+    fields = [c.key for c in stmt.selected_columns]
+    lines = _csv_lines(factory, stmt, fields) if fmt == "csv" else _ndjson_lines(factory, stmt, fields)
+    return StreamingResponse(
+        lines,
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
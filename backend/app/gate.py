@@ -0,0 +1,189 @@
+"""Consulta de portería: ¿este documento tiene una visita autorizada vigente?
+
+    GET /api/visitors/check?id_number=12345678
+
+Una autorización (fila de VisitorLog) vale GATE_PASS_HOURS desde `allowed_at`.
+La respuesta trae al residente que la dio y sus unidades, en una sola
+consulta. Las vigentes quedan en una tabla en memoria por proceso (GatePasses):
+la consulta repetida del mismo documento (varias porterías, el mismo visitante
+que entra y sale) no toca la base. allow_visitor la actualiza al registrar.
+
+Con varios workers, cada uno tiene su tabla: un pase que se dio en otro worker
+se lee de la base la primera vez (índice `ix_visitors_id_number_allowed`) y
+queda en memoria. Los "no autorizado" nunca se guardan: una autorización nueva
+se ve en la siguiente consulta. La tabla se toca recién con el commit (también
+el de un lote transaccional): una visita que se deshace no deja un pase. Un pase guardado se vuelve a leer a los
+GATE_CACHE_TTL segundos, así un residente borrado deja de autorizar en todos
+los workers como mucho en ese tiempo.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import and_, select
+
+from . import models
+from .database import current_tenant, on_commit
+
+GATE_PASS_HOURS = float(os.getenv("GATE_PASS_HOURS", "24"))
+GATE_CACHE_TTL = float(os.getenv("GATE_CACHE_TTL", "30"))  # segundos
+GATE_CACHE_SIZE = int(os.getenv("GATE_CACHE_SIZE", "10000"))
+GATE_ROLES = ("admin", "guard")  # cuenta de portería: role = "guard"
+
+
+@dataclass(frozen=True)
+class GatePass:
+    visitor_id: int
+    visitor_name: str
+    id_number: str
+    allowed_at: datetime
+    expires_at: datetime
+    resident_id: int
+    resident_name: str
+    units: Tuple[Tuple[int, str], ...]  # (id, code) de las unidades del residente
+
+    def as_dict(self) -> dict:
+        return {
+            "authorized": True,
+            "visitor_id": self.visitor_id,
+            "visitor_name": self.visitor_name,
+            "id_number": self.id_number,
+            "allowed_at": self.allowed_at,
+            "expires_at": self.expires_at,
+            "resident": {"id": self.resident_id, "name": self.resident_name},
+            "units": [{"id": unit_id, "code": code} for unit_id, code in self.units],
+        }
+
+
+class GatePasses:
+    """LRU acotada de pases vigentes, indexada por (tenant, id_number); como PrincipalCache."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, id_number: str) -> Optional[GatePass]:
+        key = (current_tenant.get(), id_number)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic() or entry[1].expires_at <= datetime.utcnow():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, gate_pass: GatePass) -> None:
+        key = (current_tenant.get(), gate_pass.id_number)
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, gate_pass)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, id_number: str) -> None:
+        with self._lock:
+            self._data.pop((current_tenant.get(), id_number), None)
+
+    def invalidate_resident(self, resident_id: int) -> None:
+        tenant = current_tenant.get()
+        with self._lock:
+            for key in [k for k, (_, p) in self._data.items() if k[0] == tenant and p.resident_id == resident_id]:
+                del self._data[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "pass_hours": GATE_PASS_HOURS,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+gate_passes = GatePasses(GATE_CACHE_SIZE, GATE_CACHE_TTL)
+
+
+async def _load(db, id_number: str) -> Optional[GatePass]:
+    """La autorización vigente más reciente del documento, con residente y unidades."""
+    V, U, Unit = models.VisitorLog, models.User, models.Unit
+    window = timedelta(hours=GATE_PASS_HOURS)
+    latest = (
+        select(V.id)
+        .join(U, U.id == V.resident_id)
+        .where(
+            V.id_number == id_number,
+            V.allowed_at > datetime.utcnow() - window,
+            U.deleted_at.is_(None),
+            U.is_active.is_(True),
+        )
+        .order_by(V.allowed_at.desc(), V.id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    rows = (
+        await db.execute(
+            select(V.id, V.visitor_name, V.allowed_at, V.resident_id, U.name, Unit.id, Unit.code)
+            .join(U, U.id == V.resident_id)
+            .outerjoin(Unit, and_(Unit.owner_id == V.resident_id, Unit.deleted_at.is_(None)))
+            .where(V.id == latest)
+            .order_by(Unit.id)
+        )
+    ).all()
+    if not rows:
+        return None
+    visitor_id, visitor_name, allowed_at, resident_id, resident_name = rows[0][:5]
+    return GatePass(
+        visitor_id,
+        visitor_name,
+        id_number,
+        allowed_at,
+        allowed_at + window,
+        resident_id,
+        resident_name,
+        tuple((unit_id, code) for *_, unit_id, code in rows if unit_id is not None),
+    )
+
+
+async def check(db, id_number: str) -> Optional[GatePass]:
+    gate_pass = gate_passes.get(id_number)
+    if gate_pass is None:
+        gate_pass = await _load(db, id_number)
+        if gate_pass is not None:
+            gate_passes.put(gate_pass)
+    return gate_pass
+
+
+async def refresh(db, id_number: str) -> None:
+    """Al registrar una visita, antes del commit: con el commit la tabla en memoria queda con la autorización nueva."""
+    gate_pass = await _load(db, id_number)  # dentro de la transacción: ya ve la visita nueva
+
+    def apply():
+        gate_passes.invalidate(id_number)
+        if gate_pass is not None:
+            gate_passes.put(gate_pass)
+
+    on_commit(db, apply)
+
+
+def forget_resident(db, resident_id: int) -> None:
+    """Con el commit, los pases que dio el residente dejan de estar en memoria."""
+    on_commit(db, lambda: gate_passes.invalidate_resident(resident_id))
@@ -1,28 +1,62 @@
-from fastapi import FastAPI, Depends, HTTPException, Response
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+import time
+
+_import_started = time.perf_counter()  # arranque en frío: desde aquí hasta aceptar peticiones
+
+from fastapi import FastAPI, Depends, HTTPException, Request, Response
+from fastapi.responses import HTMLResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from sqlalchemy import exists, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
-from datetime import datetime
-from typing import List, Optional
-from pathlib import Path
+from datetime import date, datetime, timedelta
+from typing import List, Literal, Optional
 from pydantic import BaseModel, EmailStr
 
-from .database import Base, engine, get_db
+from . import database
+from .database import get_db
 from . import models, schemas
+from .pagination import FastJSONResponse, PageParams, page_response, paginate, parse_fields
+from .exports import stream_export
+from . import assets, availability, batch, billing, bulk, compression, events, gate, metrics, migrate, purge, retention, search, sequences, series, summaries, tenancy, versions
 from .auth import (
     hash_password,
-    verify_password,
+    verify_and_update_password,
     create_access_token,
     get_current_user,
+    get_stream_user,
     require_role,
+    principal_cache,
 )
 from fastapi import FastAPI, Depends, HTTPException, Response, Query
 
+log = logging.getLogger("village.startup")
+
+# Logs de la app (village.*) a stderr, salvo que ya haya logging configurado
+# (p. ej. uvicorn --log-config con handlers en la raíz)
+_village_log = logging.getLogger("village")
+if not logging.getLogger().handlers and not _village_log.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(levelname)s %(name)s: %(message)s"))
+    _village_log.addHandler(_handler)
+_village_log.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
 
 # -------------------- APP & CORS & FRONTEND --------------------
 
+# Carga masiva: cuerpo JSON (array) o CSV con cabecera
+BULK_BODY = {
+    "requestBody": {
+        "content": {
+            "application/json": {"schema": {"type": "array", "items": {"type": "object"}}},
+            "text/csv": {"schema": {"type": "string"}},
+        }
+    }
+}
+BulkMode = Literal["skip_invalid", "all_or_nothing"]
+
 # Modelo de actualización (para no tocar schemas.py)
 class UserUpdate(BaseModel):
     name: Optional[str] = None
@@ -31,9 +65,65 @@ class UserUpdate(BaseModel):
     role: Optional[str] = None
     is_active: Optional[bool] = None
 
+class ReservationUpdate(BaseModel):
+    status: Literal["pending", "approved", "cancelled"]
+
+class TicketUpdate(BaseModel):
+    title: Optional[str] = None
+    description: Optional[str] = None
+    status: Optional[Literal["open", "in_progress", "closed"]] = None
+
+class PaymentUpdate(BaseModel):
+    amount: Optional[float] = None
+    method: Optional[str] = None
+    unit_id: Optional[int] = None  # null explícito: pago sin unidad
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # El esquema lo maneja `python -m app.migrate` (una vez por despliegue); el
+    # worker solo crea el pool (sin conectar) y verifica la versión con un SELECT.
+    # Los demás condominios se verifican en su primera petición (database.get_db).
+    started = time.perf_counter()
+    engine = database.init_engine()
+    if migrate.AUTO_MIGRATE:
+        await migrate.upgrade_tenants(log=migrate.logger.info)
+    elif database.DEFAULT_TENANT in database.TENANTS:
+        await database.check_schema(database.DEFAULT_TENANT)
+    else:
+        await migrate.check(engine)
+    # Archivado de visitas viejas en segundo plano (por lotes, ver retention.py)
+    archiver = None
+    if retention.VISITOR_RETENTION_DAYS > 0:
+        archiver = asyncio.create_task(retention.run_forever())
+    # Limpieza de lo que referencia a registros borrados (ver purge.py)
+    purger = asyncio.create_task(purge.run_forever())
+    _report_startup(started)
+    yield
+    if archiver:
+        archiver.cancel()
+    purger.cancel()
+    await events.stop_all()
+    await database.dispose_engine()
+
+
+def _report_startup(lifespan_started: float):
+    now = time.perf_counter()
+    phases = {
+        "import": lifespan_started - _import_started,
+        "lifespan": now - lifespan_started,
+        "total": now - _import_started,
+    }
+    for phase, seconds in phases.items():
+        metrics.STARTUP.set(round(seconds, 4), phase)
+    log.info(" ".join(f"{k}={v * 1000:.0f}ms" for k, v in phases.items()))
+
 
 # 1) Crear la app
-app = FastAPI(title="Village - Gestión de Condominios")
+app = FastAPI(title="Village - Gestión de Condominios", lifespan=lifespan)
+
+# Condominio de cada petición /api (ver tenancy.py); CORS queda por fuera
+app.add_middleware(tenancy.TenantMiddleware)
 
 # 2) CORS
 app.add_middleware(
@@ -51,53 +141,67 @@ app.add_middleware(
     allow_headers=["*"],  # incluye Authorization
 )
 
-# 3) Montar el frontend en /app
-FRONTEND_DIR = Path(__file__).resolve().parents[2] / "frontend"
-app.mount("/app", StaticFiles(directory=str(FRONTEND_DIR), html=True), name="app")
+# Compresión br/gzip de las respuestas de la API (ver compression.py)
+app.add_middleware(compression.CompressionMiddleware)
+
+# Latencia por ruta, consultas SQL y Server-Timing (ver /metrics)
+app.add_middleware(metrics.MetricsMiddleware)
+
+# 3) Montar el frontend en /app: el build de `python -m app.assets build` (ver assets.py)
+app.mount("/app", assets.frontend_app(), name="app")
 
 
 @app.get("/", response_class=HTMLResponse)
-def root():
+async def root():
     return '<meta http-equiv="refresh" content="0; url=/app/index.html" />'
 
 
-# 4) Crear tablas automáticamente
-Base.metadata.create_all(bind=engine)
-
 # -------------------- AUTH --------------------
 @app.post("/api/auth/register", response_model=schemas.UserOut, tags=["auth"])
-def register(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
-    existing_user = db.query(models.User).filter_by(email=user_in.email).first()
+async def register(user_in: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
+    existing_user = await db.scalar(select(models.User).where(models.User.email == user_in.email))
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
 
     user = models.User(
         name=user_in.name,
         email=user_in.email,
-        hashed_password=hash_password(user_in.password),
+        hashed_password=await hash_password(user_in.password),
         role=user_in.role,
     )
 
     try:
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await versions.bump(db, "users")
+        await db.commit()
+        await db.refresh(user)
         return user
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail="Error saving user in database")
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
 
 @app.post("/api/auth/login", tags=["auth"])
-def login(creds: schemas.UserLogin, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter_by(email=creds.email).first()
-    if not user or not verify_password(creds.password, user.hashed_password):
+async def login(creds: schemas.UserLogin, db: AsyncSession = Depends(get_db)):
+    user = await db.scalar(
+        select(models.User).where(models.User.email == creds.email, models.User.deleted_at.is_(None))
+    )
+    if not user:
         raise HTTPException(status_code=401, detail="Invalid email or password")
-
-    token = create_access_token({"sub": str(user.id), "role": user.role})
+    ok, new_hash = await verify_and_update_password(creds.password, user.hashed_password)
+    if not ok:
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
+
+    tenant = database.current_tenant.get()
+    token = create_access_token({"sub": str(user.id), "role": user.role, "tid": tenant})
+    # Recién registrado, puede no estar aún en la réplica: sus primeras lecturas van al primario
+    database.recent_writers.mark((tenant, str(user.id)))
     return {
         "access_token": token,
         "token_type": "bearer",
@@ -107,50 +211,102 @@ def login(creds: schemas.UserLogin, db: Session = Depends(get_db)):
 
 # 👇 NUEVO: /me (lo usa el frontend)
 @app.get("/api/auth/me", response_model=schemas.UserOut, tags=["auth"])
-def me(user=Depends(get_current_user)):
+async def me(user=Depends(get_current_user)):
     return user
 
 
+@app.get("/api/auth/cache-stats", tags=["auth"])
+async def principal_cache_stats(user=Depends(require_role("admin"))):
+    return principal_cache.stats()
+
+
 # -------------------- USERS (solo admin) --------------------
-@app.get("/api/users", response_model=List[schemas.UserOut], tags=["users"])
-def list_users(db: Session = Depends(get_db), user=Depends(require_role("admin"))):
-    return db.query(models.User).all()
+@app.get("/api/users", response_model=schemas.Page[schemas.UserOut], tags=["users"])
+async def list_users(
+    request: Request,
+    response: Response,
+    role: Optional[str] = Query(None),
+    is_active: Optional[bool] = Query(None),
+    fields: Optional[str] = Query(None, description="Campos a devolver, separados por coma (por defecto todos)"),
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(require_role("admin")),
+):
+    not_modified = await versions.conditional(request, response, db, "users")
+    if not_modified:
+        return not_modified
+    stmt = select(models.User).where(models.User.deleted_at.is_(None))
+    if role is not None:
+        stmt = stmt.where(models.User.role == role)
+    if is_active is not None:
+        stmt = stmt.where(models.User.is_active == is_active)
+    sort_columns = {"id": models.User.id, "name": models.User.name}
+    result = await paginate(db, stmt, models.User, sort_columns, page, schemas.UserOut, fields)
+    return page_response(result, response)
 
 
 @app.post("/api/users", response_model=schemas.UserOut, tags=["users"])
-def create_user_admin(
+async def create_user_admin(
     user_in: schemas.UserCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user=Depends(require_role("admin")),
 ):
-    if db.query(models.User).filter_by(email=user_in.email).first():
+    if await db.scalar(select(models.User).where(models.User.email == user_in.email)):
         raise HTTPException(status_code=400, detail="Email already registered")
 
     u = models.User(
         name=user_in.name,
         email=user_in.email,
-        hashed_password=hash_password(user_in.password),
+        hashed_password=await hash_password(user_in.password),
         role=user_in.role,
     )
     db.add(u)
-    db.commit()
-    db.refresh(u)
+    await versions.bump(db, "users")
+    await db.commit()
+    await db.refresh(u)
+    return u
+
+
+@app.post("/api/users/bulk", response_model=schemas.BulkResult, tags=["users"], openapi_extra=BULK_BODY)
+async def bulk_create_users(
+    request: Request,
+    mode: BulkMode = Query("skip_invalid"),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(require_role("admin")),
+):
+    return await bulk.import_users(db, await bulk.read_rows(request), mode)
+
+
+@app.get("/api/users/{user_id}", response_model=schemas.UserOut, tags=["users"])
+async def get_user(
+    user_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    user=Depends(require_role("admin")),
+):
+    not_modified = await versions.conditional(request, response, db, "users")
+    if not_modified:
+        return not_modified
+    u = await purge.live(db, models.User, user_id)
+    if not u:
+        raise HTTPException(status_code=404, detail="User not found")
     return u
 
 
 @app.put("/api/users/{user_id}", response_model=schemas.UserOut, tags=["users"])
-def update_user(
+async def update_user(
     user_id: int,
     body: UserUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user=Depends(require_role("admin")),
 ):
-    u = db.query(models.User).get(user_id)
+    u = await purge.live(db, models.User, user_id)
     if not u:
         raise HTTPException(status_code=404, detail="User not found")
 
     if body.email and body.email != u.email:
-        if db.query(models.User).filter(models.User.email == body.email).first():
+        if await db.scalar(select(models.User).where(models.User.email == body.email)):
             raise HTTPException(status_code=400, detail="Email already registered")
         u.email = body.email
 
@@ -161,158 +317,314 @@ def update_user(
     if body.is_active is not None:
         u.is_active = body.is_active
     if body.password:
-        u.hashed_password = hash_password(body.password)
-
-    db.commit()
-    db.refresh(u)
+        u.hashed_password = await hash_password(body.password)
+
+    await versions.bump(db, "users")
+    # El rol/estado cacheado debe dejar de valer de inmediato (solo si se confirma)
+    database.on_commit(db, lambda: principal_cache.invalidate(user_id))
+    gate.forget_resident(db, user_id)
+    await db.commit()
+    await db.refresh(u)
     return u
 
 
-@app.delete("/api/users/{user_id}", tags=["users"])
-def delete_user(
-    user_id: int, db: Session = Depends(get_db), user=Depends(require_role("admin"))
+@app.delete("/api/users/{user_id}", status_code=202, response_model=schemas.PurgeJobOut, tags=["users"])
+async def delete_user(
+    user_id: int,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    user=Depends(require_role("admin")),
 ):
-    u = db.query(models.User).get(user_id)
+    u = await purge.live(db, models.User, user_id)
     if not u:
         raise HTTPException(status_code=404, detail="User not found")
-    db.delete(u)
-    db.commit()
-    return {"detail": "deleted"}
+    database.on_commit(db, lambda: principal_cache.invalidate(user_id))
+    gate.forget_resident(db, user_id)
+    job = await purge.soft_delete(db, "user", u)
+    response.headers["Location"] = f"/api/jobs/{job.id}"
+    return job
 
 
 # -------------------- UNITS --------------------
 @app.post("/api/units", response_model=schemas.UnitOut, tags=["units"])
-def create_unit(
+async def create_unit(
     unit_in: schemas.UnitIn,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user=Depends(require_role("admin")),
 ):
     unit = models.Unit(**unit_in.dict())
     db.add(unit)
-    db.commit()
-    db.refresh(unit)
+    await versions.bump(db, "units")
+    await db.commit()
+    await db.refresh(unit)
     return unit
 
 
-@app.get("/api/units", response_model=List[schemas.UnitOut], tags=["units"])
-def list_units(db: Session = Depends(get_db), user=Depends(get_current_user)):
-    return db.query(models.Unit).all()
+@app.post("/api/units/bulk", response_model=schemas.BulkResult, tags=["units"], openapi_extra=BULK_BODY)
+async def bulk_create_units(
+    request: Request,
+    mode: BulkMode = Query("skip_invalid"),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(require_role("admin")),
+):
+    return await bulk.import_units(db, await bulk.read_rows(request), mode)
 
 
-@app.delete("/api/units/{unit_id}", status_code=204, tags=["units"])
-def delete_unit(
+@app.get("/api/units", response_model=schemas.Page[schemas.UnitOut], tags=["units"])
+async def list_units(
+    request: Request,
+    response: Response,
+    owner_id: Optional[int] = Query(None),
+    fields: Optional[str] = Query(None, description="Campos a devolver, separados por coma (por defecto todos)"),
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    not_modified = await versions.conditional(request, response, db, "units")
+    if not_modified:
+        return not_modified
+    stmt = select(models.Unit).where(models.Unit.deleted_at.is_(None))
+    if owner_id is not None:
+        stmt = stmt.where(models.Unit.owner_id == owner_id)
+    sort_columns = {"id": models.Unit.id, "code": models.Unit.code}
+    result = await paginate(db, stmt, models.Unit, sort_columns, page, schemas.UnitOut, fields)
+    return page_response(result, response)
+
+
+@app.get("/api/units/{unit_id}", response_model=schemas.UnitOut, tags=["units"])
+async def get_unit(
     unit_id: int,
-    detach: bool = Query(False),
-    db: Session = Depends(get_db),
-    user=Depends(require_role("admin")),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    user=Depends(get_current_user),
 ):
-    unit = db.query(models.Unit).get(unit_id)
+    not_modified = await versions.conditional(request, response, db, "units")
+    if not_modified:
+        return not_modified
+    unit = await purge.live(db, models.Unit, unit_id)
     if not unit:
         raise HTTPException(status_code=404, detail="Unidad no encontrada")
+    return unit
 
-    try:
-        if detach:
-            # Soltar referencias (poner unit_id = NULL) en tickets y pagos
-            db.query(models.MaintenanceTicket).filter(
-                models.MaintenanceTicket.unit_id == unit_id
-            ).update({models.MaintenanceTicket.unit_id: None}, synchronize_session=False)
-
-            db.query(models.Payment).filter(
-                models.Payment.unit_id == unit_id
-            ).update({models.Payment.unit_id: None}, synchronize_session=False)
-
-            db.commit()  # Guardar los NULL antes de borrar la unidad
 
-        db.delete(unit)
-        db.commit()
-        return Response(status_code=204)
+@app.delete("/api/units/{unit_id}", status_code=202, response_model=schemas.PurgeJobOut, tags=["units"])
+async def delete_unit(
+    unit_id: int,
+    response: Response,
+    detach: bool = Query(False),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(require_role("admin")),
+):
+    unit = await purge.live(db, models.Unit, unit_id)
+    if not unit:
+        raise HTTPException(status_code=404, detail="Unidad no encontrada")
 
-    except IntegrityError:
-        db.rollback()
-        # Si aún quedan referencias (por triggers, FK sin permitir NULL, etc.)
-        raise HTTPException(
-            status_code=409,
-            detail="No se puede eliminar: existen pagos/tickets que referencian esta unidad",
-        )
+    if not detach:
+        # Sin detach solo se borra si nada la referencia (un EXISTS por tabla, con índice)
+        for model in (models.MaintenanceTicket, models.Payment, models.Charge):
+            if await db.scalar(select(exists().where(model.unit_id == unit_id))):
+                raise HTTPException(
+                    status_code=409,
+                    detail="No se puede eliminar: existen pagos/tickets que referencian esta unidad",
+                )
+    # Tickets y pagos se sueltan en segundo plano, por lotes (ver purge.py)
+    job = await purge.soft_delete(db, "unit", unit)
+    response.headers["Location"] = f"/api/jobs/{job.id}"
+    return job
 
 
 
 # -------------------- AMENITIES --------------------
 @app.post("/api/amenities", response_model=schemas.AmenityOut, tags=["amenities"])
-def create_amenity(
+async def create_amenity(
     amenity_in: schemas.AmenityIn,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user=Depends(require_role("admin")),
 ):
     a = models.Amenity(**amenity_in.dict())
     db.add(a)
-    db.commit()
-    db.refresh(a)
+    await versions.bump(db, "amenities")
+    await db.commit()
+    await db.refresh(a)
     return a
 
 
 @app.get("/api/amenities", response_model=List[schemas.AmenityOut], tags=["amenities"])
-def list_amenities(db: Session = Depends(get_db), user=Depends(get_current_user)):
-    return db.query(models.Amenity).all()
+async def list_amenities(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    not_modified = await versions.conditional(request, response, db, "amenities")
+    if not_modified:
+        return not_modified
+    return (await db.execute(select(models.Amenity).where(models.Amenity.deleted_at.is_(None)))).scalars().all()
+
+
+@app.get("/api/amenities/{amenity_id}", response_model=schemas.AmenityOut, tags=["amenities"])
+async def get_amenity(
+    amenity_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    not_modified = await versions.conditional(request, response, db, "amenities")
+    if not_modified:
+        return not_modified
+    a = await purge.live(db, models.Amenity, amenity_id)
+    if not a:
+        raise HTTPException(status_code=404, detail="Amenidad no encontrada")
+    return a
 
 
-@app.delete("/api/amenities/{amenity_id}", status_code=204, tags=["amenities"])
-def delete_amenity(
-    amenity_id: int, db: Session = Depends(get_db), user=Depends(require_role("admin"))
+@app.get(
+    "/api/amenities/{amenity_id}/availability",
+    response_model=schemas.AvailabilityOut,
+    tags=["amenities"],
+)
+async def amenity_availability(
+    amenity_id: int,
+    date_from: schemas.UTCDateTime = Query(..., alias="from"),
+    date_to: schemas.UTCDateTime = Query(..., alias="to"),
+    duration: int = Query(60, ge=1, le=24 * 60, description="Minutos"),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    if date_to <= date_from:
+        raise HTTPException(status_code=400, detail="'to' must be after 'from'")
+    if date_to - date_from > availability.MAX_WINDOW:
+        raise HTTPException(status_code=400, detail="Range too large (max 31 days)")
+    if not await purge.live(db, models.Amenity, amenity_id):
+        raise HTTPException(status_code=404, detail="Amenidad no encontrada")
+
+    slots = await availability.free_slots(
+        db, amenity_id, date_from, date_to, timedelta(minutes=duration)
+    )
+    return {
+        "amenity_id": amenity_id,
+        "duration_minutes": duration,
+        "slots": [{"start_at": s, "end_at": e} for s, e in slots],
+    }
+
+
+@app.delete("/api/amenities/{amenity_id}", status_code=202, response_model=schemas.PurgeJobOut, tags=["amenities"])
+async def delete_amenity(
+    amenity_id: int,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    user=Depends(require_role("admin")),
 ):
-    a = db.query(models.Amenity).get(amenity_id)
+    a = await purge.live(db, models.Amenity, amenity_id)
     if not a:
         raise HTTPException(status_code=404, detail="Amenidad no encontrada")
-    try:
-        db.delete(a)
-        db.commit()
-        return Response(status_code=204)
-    except IntegrityError:
-        db.rollback()
-        raise HTTPException(
-            status_code=409,
-            detail="No se puede eliminar: existen reservas que referencian esta área común",
-        )
+    # Las reservas futuras se cancelan en segundo plano (ver purge.py)
+    job = await purge.soft_delete(db, "amenity", a)
+    response.headers["Location"] = f"/api/jobs/{job.id}"
+    return job
 
 
 # -------------------- RESERVATIONS --------------------
 @app.post("/api/reservations", response_model=schemas.ReservationOut, tags=["reservations"])
-def create_reservation(
+async def create_reservation(
     res_in: schemas.ReservationIn,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user=Depends(get_current_user),
 ):
-    overlap = (
-        db.query(models.Reservation)
-        .filter(
-            models.Reservation.amenity_id == res_in.amenity_id,
-            models.Reservation.start_at < res_in.end_at,
-            models.Reservation.end_at > res_in.start_at,
-        )
-        .first()
-    )
-    if overlap:
-        raise HTTPException(status_code=400, detail="Time slot not available")
-
-    r = models.Reservation(**res_in.dict(), status="pending")
-    db.add(r)
-    db.commit()
-    db.refresh(r)
+    if res_in.end_at <= res_in.start_at:
+        raise HTTPException(status_code=400, detail="end_at must be after start_at")
+
+    # Chequeo + inserción bajo lock por amenidad: dos reservas simultáneas no pueden pasar ambas
+    async with availability.booking_lock(db, res_in.amenity_id) as exists:
+        if not exists:
+            raise HTTPException(status_code=404, detail="Amenidad no encontrada")
+        if await availability.find_overlap(db, res_in.amenity_id, res_in.start_at, res_in.end_at):
+            await db.rollback()
+            raise HTTPException(status_code=400, detail="Time slot not available")
+
+        r = models.Reservation(**res_in.dict(), status="pending")
+        db.add(r)
+        await db.flush()  # id para el evento
+        events.emit(db, "reservations", "created", r, r.user_id)
+        await summaries.reservation_added(db, r.amenity_id, r.start_at, r.end_at)
+        await versions.bump(db, "reservations")
+        await db.commit()
+    await db.refresh(r)
     return r
 
 
-@app.get("/api/reservations", response_model=List[schemas.ReservationOut], tags=["reservations"])
-def list_reservations(db: Session = Depends(get_db), user=Depends(get_current_user)):
-    return db.query(models.Reservation).all()
+@app.post("/api/reservations/series", response_model=schemas.ReservationSeriesOut, tags=["reservations"])
+async def create_reservation_series(
+    series_in: schemas.ReservationSeriesIn,
+    db: AsyncSession = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    # Expande la regla, valida todo con una consulta e inserta en una transacción
+    return await series.create_series(db, series_in)
+
+
+@app.delete("/api/reservations/series/{series_id}", tags=["reservations"])
+async def delete_reservation_series(
+    series_id: int,
+    since: Optional[schemas.UTCDateTime] = Query(None, alias="from", description="Desde cuándo borrar (por defecto ahora)"),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    s = await db.get(models.ReservationSeries, series_id)
+    if not s:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if getattr(user, "role", "") != "admin" and s.user_id != user.id:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    removed = await series.cancel_series(db, s, since or datetime.utcnow())
+    return {"series_id": series_id, "deleted": removed}
+
+
+@app.get("/api/reservations", response_model=schemas.Page[schemas.ReservationOut], tags=["reservations"])
+async def list_reservations(
+    request: Request,
+    response: Response,
+    user_id: Optional[int] = Query(None),
+    amenity_id: Optional[int] = Query(None),
+    status: Optional[str] = Query(None),
+    series_id: Optional[int] = Query(None),
+    date_from: Optional[schemas.UTCDateTime] = Query(None, alias="from"),
+    date_to: Optional[schemas.UTCDateTime] = Query(None, alias="to"),
+    fields: Optional[str] = Query(None, description="Campos a devolver, separados por coma (por defecto todos)"),
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    not_modified = await versions.conditional(request, response, db, "reservations")
+    if not_modified:
+        return not_modified
+    R = models.Reservation
+    stmt = select(R)
+    if user_id is not None:
+        stmt = stmt.where(R.user_id == user_id)
+    if amenity_id is not None:
+        stmt = stmt.where(R.amenity_id == amenity_id)
+    if status is not None:
+        stmt = stmt.where(R.status == status)
+    if series_id is not None:
+        stmt = stmt.where(R.series_id == series_id)
+    if date_from is not None:
+        stmt = stmt.where(R.start_at >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(R.start_at < date_to)
+    sort_columns = {"id": R.id, "start_at": R.start_at}
+    result = await paginate(db, stmt, R, sort_columns, page, schemas.ReservationOut, fields)
+    return page_response(result, response)
 
 
 @app.delete("/api/reservations/{res_id}", status_code=204, tags=["reservations"])
-def delete_reservation(
+async def delete_reservation(
     res_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user=Depends(get_current_user),
 ):
-    r = db.get(models.Reservation, res_id)  # o db.query(models.Reservation).get(res_id)
+    r = await db.get(models.Reservation, res_id)
     if not r:
         raise HTTPException(status_code=404, detail="Not Found")
 
@@ -320,88 +632,551 @@ def delete_reservation(
     if getattr(user, "role", "") != "admin" and r.user_id != user.id:
         raise HTTPException(status_code=403, detail="Forbidden")
 
-    db.delete(r)
-    db.commit()
+    await db.delete(r)
+    events.emit(db, "reservations", "deleted", r, r.user_id)
+    if r.status != "cancelled":
+        await summaries.reservation_added(db, r.amenity_id, r.start_at, r.end_at, sign=-1)
+    await versions.bump(db, "reservations")
+    await db.commit()
     return Response(status_code=204)
 # 👆👆 FIN DELETE 👆👆
 
 
+@app.put("/api/reservations/{res_id}", response_model=schemas.ReservationOut, tags=["reservations"])
+async def update_reservation(
+    res_id: int,
+    body: ReservationUpdate,
+    db: AsyncSession = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    r = await db.get(models.Reservation, res_id)
+    if not r:
+        raise HTTPException(status_code=404, detail="Not Found")
+    # El dueño solo puede cancelar; aprobar o reactivar es del admin
+    if getattr(user, "role", "") != "admin" and (r.user_id != user.id or body.status != "cancelled"):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    if body.status == r.status:
+        return r
+
+    if r.status == "cancelled":
+        # Reactivar vuelve a ocupar el horario: mismo chequeo que el alta
+        async with availability.booking_lock(db, r.amenity_id) as exists:
+            if not exists:
+                raise HTTPException(status_code=404, detail="Amenidad no encontrada")
+            if await availability.find_overlap(db, r.amenity_id, r.start_at, r.end_at):
+                await db.rollback()
+                raise HTTPException(status_code=400, detail="Time slot not available")
+            await _set_reservation_status(db, r, body.status)
+            await db.commit()
+    else:
+        await _set_reservation_status(db, r, body.status)
+        await db.commit()
+    await db.refresh(r)
+    return r
+
+
+async def _set_reservation_status(db, r: models.Reservation, status: str):
+    if "cancelled" in (r.status, status):
+        sign = -1 if status == "cancelled" else 1
+        await summaries.reservation_added(db, r.amenity_id, r.start_at, r.end_at, sign=sign)
+    r.status = status
+    events.emit(db, "reservations", "updated", r, r.user_id)
+    await versions.bump(db, "reservations")
+
+
 
 
 
 # -------------------- MAINTENANCE --------------------
 @app.post("/api/tickets", response_model=schemas.TicketOut, tags=["maintenance"])
-def create_ticket(
-    t_in: schemas.TicketIn, db: Session = Depends(get_db), user=Depends(get_current_user)
+async def create_ticket(
+    t_in: schemas.TicketIn, db: AsyncSession = Depends(get_db), user=Depends(get_current_user)
 ):
-    t = models.MaintenanceTicket(**t_in.dict())
+    if t_in.unit_id is not None and not await purge.live(db, models.Unit, t_in.unit_id):
+        raise HTTPException(status_code=404, detail="Unidad no encontrada")
+    t = models.MaintenanceTicket(**t_in.dict(), status="open", created_at=datetime.utcnow())
     db.add(t)
-    db.commit()
-    db.refresh(t)
+    await db.flush()
+    events.emit(db, "tickets", "created", t, t.user_id)
+    await summaries.ticket_added(db, t.status, t.created_at)
+    await versions.bump(db, "maintenance_tickets")
+    await db.commit()
+    await db.refresh(t)
     return t
 
 
-@app.get("/api/tickets", response_model=List[schemas.TicketOut], tags=["maintenance"])
-def list_tickets(db: Session = Depends(get_db), user=Depends(get_current_user)):
-    return db.query(models.MaintenanceTicket).all()
+def _filter_tickets(stmt, user_id, unit_id, status, date_from, date_to):
+    T = models.MaintenanceTicket
+    if user_id is not None:
+        stmt = stmt.where(T.user_id == user_id)
+    if unit_id is not None:
+        stmt = stmt.where(T.unit_id == unit_id)
+    if status is not None:
+        stmt = stmt.where(T.status == status)
+    if date_from is not None:
+        stmt = stmt.where(T.created_at >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(T.created_at < date_to)
+    return stmt
+
+
+@app.get("/api/tickets", response_model=schemas.Page[schemas.TicketOut], tags=["maintenance"])
+async def list_tickets(
+    request: Request,
+    response: Response,
+    user_id: Optional[int] = Query(None),
+    unit_id: Optional[int] = Query(None),
+    status: Optional[str] = Query(None),
+    date_from: Optional[schemas.UTCDateTime] = Query(None, alias="from"),
+    date_to: Optional[schemas.UTCDateTime] = Query(None, alias="to"),
+    fields: Optional[str] = Query(None, description="Campos a devolver, separados por coma (por defecto todos)"),
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    not_modified = await versions.conditional(request, response, db, "maintenance_tickets")
+    if not_modified:
+        return not_modified
+    T = models.MaintenanceTicket
+    stmt = _filter_tickets(select(T), user_id, unit_id, status, date_from, date_to)
+    sort_columns = {"id": T.id, "created_at": T.created_at}
+    result = await paginate(db, stmt, T, sort_columns, page, schemas.TicketOut, fields)
+    return page_response(result, response)
+
+
+@app.get("/api/tickets/export", tags=["maintenance"])
+async def export_tickets(
+    format: Literal["csv", "ndjson"] = Query("csv"),
+    user_id: Optional[int] = Query(None),
+    unit_id: Optional[int] = Query(None),
+    status: Optional[str] = Query(None),
+    date_from: Optional[schemas.UTCDateTime] = Query(None, alias="from"),
+    date_to: Optional[schemas.UTCDateTime] = Query(None, alias="to"),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(require_role("admin")),
+):
+    T = models.MaintenanceTicket
+    stmt = select(
+        T.id, T.user_id, T.unit_id, T.title, T.description, T.status, T.created_at
+    ).order_by(T.id)
+    stmt = _filter_tickets(stmt, user_id, unit_id, status, date_from, date_to)
+    return stream_export(db, stmt, format, "tickets")
+
+
+@app.put("/api/tickets/{ticket_id}", response_model=schemas.TicketOut, tags=["maintenance"])
+async def update_ticket(
+    ticket_id: int, body: TicketUpdate, db: AsyncSession = Depends(get_db), user=Depends(require_role("admin"))
+):
+    t = await db.get(models.MaintenanceTicket, ticket_id)
+    if not t:
+        raise HTTPException(status_code=404, detail="Ticket no encontrado")
+    if body.title is not None:
+        t.title = body.title
+    if body.description is not None:
+        t.description = body.description
+    if body.status is not None and body.status != t.status:
+        # El resumen cuenta por estado: el ticket pasa de una fila a la otra
+        await summaries.ticket_added(db, t.status, t.created_at, sign=-1)
+        await summaries.ticket_added(db, body.status, t.created_at)
+        t.status = body.status
+    events.emit(db, "tickets", "updated", t, t.user_id)
+    await versions.bump(db, "maintenance_tickets")
+    await db.commit()
+    await db.refresh(t)
+    return t
 
 
 @app.delete("/api/tickets/{ticket_id}", status_code=204, tags=["maintenance"])
-def delete_ticket(
-    ticket_id: int, db: Session = Depends(get_db), user=Depends(require_role("admin"))
+async def delete_ticket(
+    ticket_id: int, db: AsyncSession = Depends(get_db), user=Depends(require_role("admin"))
 ):
-    t = db.query(models.MaintenanceTicket).get(ticket_id)
+    t = await db.get(models.MaintenanceTicket, ticket_id)
     if not t:
         raise HTTPException(status_code=404, detail="Ticket no encontrado")
-    db.delete(t)
-    db.commit()
+    await db.delete(t)
+    events.emit(db, "tickets", "deleted", t, t.user_id)
+    await summaries.ticket_added(db, t.status, t.created_at, sign=-1)
+    await versions.bump(db, "maintenance_tickets")
+    await db.commit()
     return Response(status_code=204)
 
 
 # -------------------- VISITORS --------------------
 @app.post("/api/visitors", response_model=schemas.VisitorOut, tags=["visitors"])
-def allow_visitor(
-    v_in: schemas.VisitorIn, db: Session = Depends(get_db), user=Depends(get_current_user)
+async def allow_visitor(
+    v_in: schemas.VisitorIn, db: AsyncSession = Depends(get_db), user=Depends(get_current_user)
 ):
     v = models.VisitorLog(**v_in.dict())
     db.add(v)
-    db.commit()
-    db.refresh(v)
+    await versions.bump(db, "visitors")
+    if v.id_number:
+        await gate.refresh(db, v.id_number)
+    await db.commit()
+    await db.refresh(v)
     return v
 
 
-@app.get("/api/visitors", response_model=List[schemas.VisitorOut], tags=["visitors"])
-def list_visitors(db: Session = Depends(get_db), user=Depends(require_role("admin"))):
-    return db.query(models.VisitorLog).all()
+@app.get("/api/visitors/check", response_model=schemas.GateCheckOut, tags=["visitors"])
+async def check_visitor(
+    response: Response,
+    id_number: str = Query(..., min_length=1, max_length=60),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(require_role(*gate.GATE_ROLES)),
+):
+    """Portería: autorización vigente del documento, con el residente y sus unidades."""
+    response.headers["Cache-Control"] = "no-store"
+    gate_pass = await gate.check(db, id_number.strip())
+    return gate_pass.as_dict() if gate_pass else {"authorized": False}
+
+
+@app.get("/api/visitors/check-stats", tags=["visitors"])
+async def gate_cache_stats(user=Depends(require_role("admin"))):
+    return gate.gate_passes.stats()
+
+
+def _filter_visitors(stmt, resident_id, unit_id, date_from, date_to):
+    V = models.VisitorLog
+    if resident_id is not None:
+        stmt = stmt.where(V.resident_id == resident_id)
+    if unit_id is not None:
+        # Las visitas se registran por residente: la unidad se resuelve por su propietario
+        owner = select(models.Unit.owner_id).where(models.Unit.id == unit_id)
+        stmt = stmt.where(V.resident_id.in_(owner.scalar_subquery()))
+    if date_from is not None:
+        stmt = stmt.where(V.allowed_at >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(V.allowed_at < date_to)
+    return stmt
+
+
+@app.get("/api/visitors", response_model=schemas.Page[schemas.VisitorOut], tags=["visitors"])
+async def list_visitors(
+    request: Request,
+    response: Response,
+    resident_id: Optional[int] = Query(None),
+    unit_id: Optional[int] = Query(None),
+    date_from: Optional[schemas.UTCDateTime] = Query(None, alias="from"),
+    date_to: Optional[schemas.UTCDateTime] = Query(None, alias="to"),
+    archived: bool = Query(False, description="Buscar en las visitas archivadas (más lento)"),
+    fields: Optional[str] = Query(None, description="Campos a devolver, separados por coma (por defecto todos)"),
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(require_role("admin")),
+):
+    not_modified = await versions.conditional(request, response, db, "visitors", "units")
+    if not_modified:
+        return not_modified
+    if archived:
+        names = parse_fields(fields, schemas.VisitorOut.model_fields)
+        result = await retention.query_archive(db, page, resident_id, unit_id, date_from, date_to)
+        result["items"] = [{k: r[k] for k in names} for r in result["items"]]
+        return page_response(result, response)
+    V = models.VisitorLog
+    stmt = _filter_visitors(select(V), resident_id, unit_id, date_from, date_to)
+    sort_columns = {"id": V.id, "allowed_at": V.allowed_at}
+    result = await paginate(db, stmt, V, sort_columns, page, schemas.VisitorOut, fields)
+    return page_response(result, response)
+
+
+@app.get("/api/visitors/export", tags=["visitors"])
+async def export_visitors(
+    format: Literal["csv", "ndjson"] = Query("csv"),
+    resident_id: Optional[int] = Query(None),
+    unit_id: Optional[int] = Query(None),
+    date_from: Optional[schemas.UTCDateTime] = Query(None, alias="from"),
+    date_to: Optional[schemas.UTCDateTime] = Query(None, alias="to"),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(require_role("admin")),
+):
+    V = models.VisitorLog
+    stmt = select(
+        V.id, V.resident_id, V.visitor_name, V.id_number, V.allowed_at, V.notes
+    ).order_by(V.id)
+    stmt = _filter_visitors(stmt, resident_id, unit_id, date_from, date_to)
+    return stream_export(db, stmt, format, "visitors")
 
 
 # -------------------- PAYMENTS (mock) --------------------
 @app.post("/api/payments", response_model=schemas.PaymentOut, tags=["payments"])
-def create_payment(
-    p_in: schemas.PaymentIn, db: Session = Depends(get_db), user=Depends(get_current_user)
+async def create_payment(
+    p_in: schemas.PaymentIn, db: AsyncSession = Depends(get_db), user=Depends(get_current_user)
 ):
-    payment = models.Payment(
-        **p_in.dict(), receipt=f"RCPT-{int(datetime.utcnow().timestamp())}"
-    )
+    if p_in.unit_id is not None and not await purge.live(db, models.Unit, p_in.unit_id):
+        raise HTTPException(status_code=404, detail="Unidad no encontrada")
+    now = datetime.utcnow()
+    (receipt,) = await sequences.next_receipts(db)
+    payment = models.Payment(**p_in.dict(), paid_at=now, receipt=receipt)
     db.add(payment)
-    db.commit()
-    db.refresh(payment)
+    await db.flush()
+    events.emit(db, "payments", "created", payment, payment.user_id)
+    await summaries.payment_added(db, payment.user_id, payment.unit_id, payment.amount, now)
+    await versions.bump(db, "payments")
+    await db.commit()
+    await db.refresh(payment)
     return payment
 
 
-@app.get("/api/payments", response_model=List[schemas.PaymentOut], tags=["payments"])
-def list_payments(db: Session = Depends(get_db), user=Depends(get_current_user)):
-    return db.query(models.Payment).all()
+@app.post("/api/payments/bulk", response_model=schemas.BulkResult, tags=["payments"], openapi_extra=BULK_BODY)
+async def bulk_create_payments(
+    request: Request,
+    mode: BulkMode = Query("skip_invalid"),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(require_role("admin")),
+):
+    return await bulk.import_payments(db, await bulk.read_rows(request), mode)
+
+
+def _filter_payments(stmt, user_id, unit_id, date_from, date_to):
+    P = models.Payment
+    if user_id is not None:
+        stmt = stmt.where(P.user_id == user_id)
+    if unit_id is not None:
+        stmt = stmt.where(P.unit_id == unit_id)
+    if date_from is not None:
+        stmt = stmt.where(P.paid_at >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(P.paid_at < date_to)
+    return stmt
+
+
+@app.get("/api/payments", response_model=schemas.Page[schemas.PaymentOut], tags=["payments"])
+async def list_payments(
+    request: Request,
+    response: Response,
+    user_id: Optional[int] = Query(None),
+    unit_id: Optional[int] = Query(None),
+    date_from: Optional[schemas.UTCDateTime] = Query(None, alias="from"),
+    date_to: Optional[schemas.UTCDateTime] = Query(None, alias="to"),
+    fields: Optional[str] = Query(None, description="Campos a devolver, separados por coma (por defecto todos)"),
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    not_modified = await versions.conditional(request, response, db, "payments")
+    if not_modified:
+        return not_modified
+    P = models.Payment
+    stmt = _filter_payments(select(P), user_id, unit_id, date_from, date_to)
+    sort_columns = {"id": P.id, "paid_at": P.paid_at}
+    result = await paginate(db, stmt, P, sort_columns, page, schemas.PaymentOut, fields)
+    return page_response(result, response)
+
+
+@app.get("/api/payments/export", tags=["payments"])
+async def export_payments(
+    format: Literal["csv", "ndjson"] = Query("csv"),
+    user_id: Optional[int] = Query(None),
+    unit_id: Optional[int] = Query(None),
+    date_from: Optional[schemas.UTCDateTime] = Query(None, alias="from"),
+    date_to: Optional[schemas.UTCDateTime] = Query(None, alias="to"),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(require_role("admin")),
+):
+    P = models.Payment
+    stmt = select(
+        P.id, P.user_id, P.unit_id, P.amount, P.method, P.paid_at, P.receipt
+    ).order_by(P.id)
+    stmt = _filter_payments(stmt, user_id, unit_id, date_from, date_to)
+    return stream_export(db, stmt, format, "payments")
+
+
+@app.put("/api/payments/{payment_id}", response_model=schemas.PaymentOut, tags=["payments"])
+async def update_payment(
+    payment_id: int, body: PaymentUpdate, db: AsyncSession = Depends(get_db), user=Depends(require_role("admin"))
+):
+    p = await db.get(models.Payment, payment_id)
+    if not p:
+        raise HTTPException(status_code=404, detail="Pago no encontrado")
+    changes = body.model_dump(exclude_unset=True)
+    if changes.get("amount") is None:
+        changes.pop("amount", None)
+    if changes.get("unit_id") is not None and not await purge.live(db, models.Unit, changes["unit_id"]):
+        raise HTTPException(status_code=404, detail="Unidad no encontrada")
+    # Monto y unidad entran en los resúmenes: se resta el pago viejo y se suma el nuevo
+    await summaries.payment_added(db, p.user_id, p.unit_id, p.amount, p.paid_at, sign=-1)
+    for name, value in changes.items():
+        setattr(p, name, value)
+    await summaries.payment_added(db, p.user_id, p.unit_id, p.amount, p.paid_at)
+    events.emit(db, "payments", "updated", p, p.user_id)
+    await versions.bump(db, "payments")
+    await db.commit()
+    await db.refresh(p)
+    return p
 
 
 @app.delete("/api/payments/{payment_id}", status_code=204, tags=["payments"])
-def delete_payment(
-    payment_id: int, db: Session = Depends(get_db), user=Depends(require_role("admin"))
+async def delete_payment(
+    payment_id: int, db: AsyncSession = Depends(get_db), user=Depends(require_role("admin"))
 ):
-    p = db.query(models.Payment).get(payment_id)
+    p = await db.get(models.Payment, payment_id)
     if not p:
         raise HTTPException(status_code=404, detail="Pago no encontrado")
-    db.delete(p)
-    db.commit()
+    await db.delete(p)
+    events.emit(db, "payments", "deleted", p, p.user_id)
+    await summaries.payment_added(db, p.user_id, p.unit_id, p.amount, p.paid_at, sign=-1)
+    await versions.bump(db, "payments")
+    await db.commit()
     return Response(status_code=204)
 
+
+
+# -------------------- FACTURACIÓN --------------------
+@app.post("/api/billing/runs", response_model=schemas.BillingRunOut, tags=["billing"])
+async def run_billing(
+    run_in: schemas.BillingRunIn, db: AsyncSession = Depends(get_db), user=Depends(require_role("admin"))
+):
+    return await billing.run_billing(db, run_in.period or billing.current_period())
+
+
+@app.get("/api/charges", response_model=schemas.Page[schemas.ChargeOut], tags=["billing"])
+async def list_charges(
+    request: Request,
+    response: Response,
+    user_id: Optional[int] = Query(None),
+    unit_id: Optional[int] = Query(None),
+    period: Optional[str] = Query(None, pattern=r"^\d{4}-(0[1-9]|1[0-2])$"),
+    fields: Optional[str] = Query(None, description="Campos a devolver, separados por coma (por defecto todos)"),
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    not_modified = await versions.conditional(request, response, db, "charges")
+    if not_modified:
+        return not_modified
+    C = models.Charge
+    if user.role != "admin":
+        user_id = user.id  # cada residente ve solo sus expensas
+    stmt = select(C)
+    if user_id is not None:
+        stmt = stmt.where(C.user_id == user_id)
+    if unit_id is not None:
+        stmt = stmt.where(C.unit_id == unit_id)
+    if period is not None:
+        stmt = stmt.where(C.period == period)
+    result = await paginate(db, stmt, C, {"id": C.id}, page, schemas.ChargeOut, fields)
+    return page_response(result, response)
+
+
+# -------------------- TRABAJOS EN SEGUNDO PLANO --------------------
+@app.get("/api/jobs/{job_id}", response_model=schemas.PurgeJobOut, tags=["ops"])
+async def get_job(job_id: int, db: AsyncSession = Depends(get_db), user=Depends(require_role("admin"))):
+    job = await db.get(models.PurgeJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+# -------------------- BÚSQUEDA --------------------
+@app.get("/api/search", tags=["search"])
+async def search_text(
+    request: Request,
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200, description="Palabras (todas obligatorias, por prefijo)"),
+    kind: Literal["tickets", "visitors"] = Query("tickets", alias="type"),
+    limit: int = Query(20, ge=1, le=100),
+    after: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    # Mismos permisos que los listados: tickets cualquier usuario, visitas solo admin
+    if kind == "visitors" and getattr(user, "role", "") != "admin":
+        raise HTTPException(status_code=403, detail="Forbidden")
+    target = search.TARGETS[kind]
+    not_modified = await versions.conditional(request, response, db, target.model.__tablename__)
+    if not_modified:
+        return not_modified
+    return page_response(await search.search(db, kind, q, limit, after), response)
+
+
+# -------------------- LOTES --------------------
+@app.post("/api/batch", response_model=schemas.BatchOut, tags=["batch"])
+async def run_batch(
+    batch_in: schemas.BatchIn,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    # La sesión de la autenticación no se usa más: cada sub-petición (o el lote
+    # transaccional) tiene la suya, y así no queda una conexión retenida
+    await db.close()
+    return FastJSONResponse(await batch.run(request.app, request.scope, batch_in))
+
+
+# -------------------- MÉTRICAS --------------------
+@app.get("/metrics", response_class=PlainTextResponse, tags=["ops"])
+async def prometheus_metrics(request: Request):
+    allowed = metrics.authorized(request.headers.get("authorization"))
+    if allowed is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not allowed:
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(metrics.render(database.engine), media_type="text/plain; version=0.0.4")
+
+
+# -------------------- EVENTOS (SSE) --------------------
+@app.get("/api/events", tags=["events"])
+async def event_stream(
+    request: Request,
+    since: Optional[int] = Query(None, description="id del último evento recibido"),
+    topics: Optional[str] = Query(None, description="reservations,tickets,payments"),
+    user=Depends(get_stream_user),
+):
+    if since is None and request.headers.get("last-event-id", "").isdigit():
+        since = int(request.headers["last-event-id"])
+    wanted = {t for t in topics.split(",") if t} if topics else None
+    if wanted and not wanted <= set(events.TOPICS):
+        raise HTTPException(status_code=400, detail=f"Unknown topic, use {', '.join(events.TOPICS)}")
+    return StreamingResponse(
+        events.stream(request, user, since, wanted),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# -------------------- DASHBOARD (resúmenes) --------------------
+@app.get("/api/summary/payments", tags=["dashboard"])
+async def summary_payments(
+    unit_id: Optional[int] = Query(None),
+    month_from: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$"),
+    month_to: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$"),
+    group: Literal["unit", "month"] = Query("unit", description="month: suma todas las unidades"),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(require_role("admin")),
+):
+    if group == "month" and unit_id is None:
+        return await summaries.payments_by_month(db, month_from, month_to)
+    return await summaries.payments_by_unit_month(db, unit_id, month_from, month_to)
+
+
+@app.get("/api/summary/owners", tags=["dashboard"])
+async def summary_owners(
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(require_role("admin")),
+):
+    return await summaries.owner_balances(db, limit)
+
+
+@app.get("/api/summary/tickets", tags=["dashboard"])
+async def summary_tickets(db: AsyncSession = Depends(get_db), user=Depends(require_role("admin"))):
+    return await summaries.tickets_overview(db)
+
+
+@app.get("/api/summary/reservations", tags=["dashboard"])
+async def summary_reservations(
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(require_role("admin")),
+):
+    # Por defecto: últimos 30 días
+    date_to = date_to or datetime.utcnow().date() + timedelta(days=1)
+    date_from = date_from or date_to - timedelta(days=30)
+    if date_to <= date_from:
+        raise HTTPException(status_code=400, detail="'to' must be after 'from'")
+    return await summaries.amenity_utilization(db, date_from, date_to)
+
+
+@app.post("/api/summary/rebuild", tags=["dashboard"])
+async def summary_rebuild(db: AsyncSession = Depends(get_db), user=Depends(require_role("admin"))):
+    return await summaries.rebuild(db)
@@ -0,0 +1,249 @@
+"""Métricas por petición: latencia por ruta, consultas SQL, pool y `/metrics` (Prometheus).
+
+Sin dependencias: histogramas y contadores simples que se exponen en el
+formato de texto de Prometheus. Todo corre en el hilo del event loop (los
+eventos del motor async se ejecutan en el greenlet de la petición), así que
+no hace falta lock.
+"""
+import hmac
+import logging
+import os
+import re
+import time
+from collections import Counter as _Tally, defaultdict
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+
+log = logging.getLogger("village.metrics")
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "10"))  # mismo SELECT repetido en una petición
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")  # /metrics pide Authorization: Bearer <token>
+# Sin token, /metrics no existe (404) salvo que se abra explícitamente (red interna)
+METRICS_PUBLIC = os.getenv("METRICS_PUBLIC", "false").lower() in ("1", "true", "yes")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+
+def authorized(authorization: Optional[str]) -> Optional[bool]:
+    """None si /metrics está apagado; si no, si la cabecera Authorization sirve."""
+    if METRICS_TOKEN:
+        return hmac.compare_digest((authorization or "").encode(), f"Bearer {METRICS_TOKEN}".encode())
+    return True if METRICS_PUBLIC else None
+
+
+# -------------------- primitivas --------------------
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labels)
+        self.values = defaultdict(float)
+
+    def inc(self, *labels, amount=1.0):
+        self.values[labels] += amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in sorted(self.values.items()):
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value}"
+
+
+class Gauge:
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labels)
+        self.values = {}
+
+    def set(self, value, *labels):
+        self.values[labels] = value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        for labels, value in sorted(self.values.items()):
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value}"
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self.series = {}  # labels -> [cuentas por bucket..., suma, total]
+
+    def observe(self, value, *labels):
+        s = self.series.get(labels)
+        if s is None:
+            s = self.series[labels] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                s[i] += 1
+                break
+        s[-2] += value
+        s[-1] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        names = self.labelnames + ("le",)
+        for labels, s in sorted(self.series.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets, s):
+                cumulative += n
+                yield f"{self.name}_bucket{_labels(names, labels + (bound,))} {cumulative}"
+            yield f"{self.name}_bucket{_labels(names, labels + ('+Inf',))} {s[-1]}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {s[-2]}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {s[-1]}"
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Latencia de las peticiones HTTP", ("method", "route", "status")
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "Consultas SQL por petición", ("route",), QUERY_COUNT_BUCKETS
+)
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_seconds", "Tiempo en la base por petición", ("route",)
+)
+QUERY_LATENCY = Histogram("db_query_duration_seconds", "Duración de cada sentencia SQL", ("operation",))
+SLOW_QUERIES = Counter("db_slow_queries_total", "Sentencias más lentas que SLOW_QUERY_MS", ("operation",))
+N_PLUS_ONE = Counter("http_n_plus_one_total", "Peticiones con el mismo SELECT repetido (posible N+1)", ("route",))
+POOL_CHECKOUT = Histogram("db_pool_checkout_seconds", "Espera para obtener una conexión del pool")
+STARTUP = Gauge("process_startup_seconds", "Arranque en frío del worker por fase (import, lifespan, total)", ("phase",))
+
+ALL = (REQUEST_LATENCY, REQUEST_QUERIES, REQUEST_DB_TIME, QUERY_LATENCY, SLOW_QUERIES, N_PLUS_ONE, POOL_CHECKOUT, STARTUP)
+
+
+# -------------------- estado por petición --------------------
+class RequestStats:
+    __slots__ = ("queries", "db_time", "pool_wait", "statements")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.pool_wait = 0.0
+        self.statements = _Tally()
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def observe_checkout(seconds: float):
+    """Llamado por el pool de database.py en cada checkout."""
+    POOL_CHECKOUT.observe(seconds)
+    stats = _current.get()
+    if stats is not None:
+        stats.pool_wait += seconds
+
+
+_OPERATION = re.compile(r"\s*(\w+)")
+
+
+def instrument_engine(engine):
+    """Cuenta y cronometra cada sentencia del motor (sync_engine en el caso async)."""
+    target = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(target, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(target, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        m = _OPERATION.match(statement)
+        operation = m.group(1).upper() if m else "OTHER"
+        QUERY_LATENCY.observe(elapsed, operation)
+        if elapsed * 1000 >= SLOW_QUERY_MS:
+            SLOW_QUERIES.inc(operation)
+            log.warning("slow query %.0f ms: %s", elapsed * 1000, " ".join(statement.split())[:300])
+        stats = _current.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += elapsed
+            if operation == "SELECT":
+                stats.statements[statement] += 1
+
+    @event.listens_for(target, "handle_error")
+    def _error(context):
+        starts = context.connection.info.get("query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+
+def pool_gauges(engine) -> list:
+    pool = engine.pool
+    if not hasattr(pool, "checkedout"):
+        return []  # SQLite en memoria (StaticPool)
+    lines = []
+    for name, value, help in (
+        ("db_pool_size", pool.size(), "Conexiones permanentes del pool"),
+        ("db_pool_checked_out", pool.checkedout(), "Conexiones en uso"),
+        # overflow() es negativo mientras el pool no abrió todas sus conexiones
+        ("db_pool_overflow", max(0, pool.overflow()), "Conexiones extra abiertas sobre pool_size"),
+    ):
+        lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge", f"{name} {value}"]
+    return lines
+
+
+def render(engine=None) -> str:
+    lines = []
+    for metric in ALL:
+        lines += metric.render()
+    if engine is not None:
+        lines += pool_gauges(engine)
+    return "\n".join(lines) + "\n"
+
+
+# -------------------- middleware --------------------
+class MetricsMiddleware:
+    """ASGI puro (no BaseHTTPMiddleware): no rompe el streaming ni el contexto de la petición."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timing = (
+                    f"app;dur={(time.perf_counter() - started) * 1000:.1f}, "
+                    f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries", '
+                    f"pool;dur={stats.pool_wait * 1000:.1f}"
+                )
+                message.setdefault("headers", []).append((b"server-timing", timing.encode()))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            label = getattr(route, "path", None) or "other"
+            REQUEST_LATENCY.observe(time.perf_counter() - started, scope["method"], label, status)
+            REQUEST_QUERIES.observe(stats.queries, label)
+            REQUEST_DB_TIME.observe(stats.db_time, label)
+            repeated = [(sql, n) for sql, n in stats.statements.items() if n >= N_PLUS_ONE_THRESHOLD]
+            if repeated:
+                N_PLUS_ONE.inc(label)
+                sql, n = max(repeated, key=lambda x: x[1])
+                log.warning("posible N+1 en %s %s: %d veces %s", scope["method"], label, n, " ".join(sql.split())[:200])
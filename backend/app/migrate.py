@@ -0,0 +1,196 @@
+"""Migraciones versionadas del esquema.
+
+    python -m app.migrate            # aplica las pendientes (una vez por despliegue)
+    python -m app.migrate status     # versión actual y migraciones pendientes
+    python -m app.migrate --tenant X # solo un condominio (por defecto, todos)
+
+Cada migración es un módulo `app/migrations/vNNNN_nombre.py` con
+`async def upgrade(conn)`. Se aplican en orden y cada una queda registrada en
+`schema_version`. Los workers no migran: al arrancar solo comparan la versión
+de la base con la última migración conocida (`check`, un SELECT).
+"""
+import asyncio
+import importlib
+import logging
+import os
+import re
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, select, text
+from sqlalchemy.exc import DBAPIError
+
+logger = logging.getLogger("village.migrate")  # `log` es el parámetro de upgrade()
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent / "migrations"
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "false").lower() in ("1", "true", "yes")  # solo desarrollo
+LOCK_NAME = "village_migrate"
+LOCK_TIMEOUT = 60  # segundos esperando a otro proceso que esté migrando (MySQL)
+
+# Fuera de Base.metadata: create_all de los modelos no la toca
+_meta = MetaData()
+schema_version = Table(
+    "schema_version",
+    _meta,
+    Column("version", Integer, primary_key=True),
+    Column("name", String(100), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+_FILENAME = re.compile(r"^v(\d{4})_(\w+)\.py$")
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+
+    @property
+    def module(self) -> str:
+        return f"{__package__}.migrations.v{self.version:04d}_{self.name}"
+
+
+class SchemaOutdated(RuntimeError):
+    pass
+
+
+def discover() -> List[Migration]:
+    """Migraciones conocidas por este código (solo lista el directorio, no importa nada)."""
+    found = []
+    for path in MIGRATIONS_DIR.glob("v*.py"):
+        m = _FILENAME.match(path.name)
+        if m:
+            found.append(Migration(int(m.group(1)), m.group(2)))
+    return sorted(found)
+
+
+def latest_version() -> int:
+    known = discover()
+    return known[-1].version if known else 0
+
+
+async def current_version(conn) -> int:
+    """Versión aplicada en la base; 0 si nunca se migró."""
+    try:
+        return (await conn.execute(select(func.max(schema_version.c.version)))).scalar() or 0
+    except DBAPIError:
+        await conn.rollback()  # la tabla no existe todavía
+        return 0
+
+
+# -------------------- aplicar --------------------
+async def _lock(conn) -> bool:
+    # MySQL ejecuta el DDL fuera de transacción: el lock evita dos despliegues migrando a la vez.
+    # En SQLite las escrituras ya se serializan y las migraciones son idempotentes.
+    if conn.dialect.name != "mysql":
+        return True
+    got = (await conn.execute(text("SELECT GET_LOCK(:n, :t)"), {"n": LOCK_NAME, "t": LOCK_TIMEOUT})).scalar()
+    await conn.commit()
+    return got == 1
+
+
+async def _unlock(conn):
+    if conn.dialect.name == "mysql":
+        await conn.execute(text("SELECT RELEASE_LOCK(:n)"), {"n": LOCK_NAME})
+        await conn.commit()
+
+
+async def upgrade(engine, log=print) -> List[Migration]:
+    """Aplica en orden las migraciones pendientes; devuelve las aplicadas."""
+    applied = []
+    async with engine.connect() as conn:
+        if not await _lock(conn):
+            raise RuntimeError(f"otro proceso tiene el lock {LOCK_NAME!r} hace más de {LOCK_TIMEOUT}s")
+        try:
+            await conn.run_sync(_meta.create_all)
+            await conn.commit()
+            current = await current_version(conn)
+            for migration in discover():
+                if migration.version <= current:
+                    continue
+                log(f"[migrate] v{migration.version:04d} {migration.name}...")
+                module = importlib.import_module(migration.module)
+                await module.upgrade(conn)
+                await conn.execute(
+                    schema_version.insert().values(
+                        version=migration.version, name=migration.name, applied_at=datetime.utcnow()
+                    )
+                )
+                await conn.commit()
+                applied.append(migration)
+        finally:
+            await _unlock(conn)
+    return applied
+
+
+# -------------------- arranque de los workers --------------------
+async def check(engine) -> Optional[int]:
+    """Chequeo barato al arrancar: versión de la base vs. la última migración.
+
+    Lanza SchemaOutdated si faltan migraciones. Si la base no responde solo
+    avisa (devuelve None): el worker arranca y el pool reintenta en la primera
+    petición, en vez de tumbar el despliegue por una caída breve.
+    """
+    latest = latest_version()
+    try:
+        conn = await engine.connect()
+    except (DBAPIError, OSError) as e:
+        logger.warning("base no disponible al arrancar, se omite el chequeo de esquema: %r", e)
+        return None
+    try:
+        current = await current_version(conn)
+    finally:
+        await conn.close()
+    if current < latest:
+        raise SchemaOutdated(
+            f"esquema en v{current:04d}, el código espera v{latest:04d}: ejecuta `python -m app.migrate`"
+        )
+    if current > latest:
+        # Despliegue escalonado: la base ya va por delante de este código
+        logger.warning("esquema en v%04d, más nuevo que este código (v%04d)", current, latest)
+    return current
+
+
+async def upgrade_tenants(tenants=None, log=print) -> int:
+    """Migra la base de cada condominio (una vez por URL, aunque dos la compartan)."""
+    from .database import TENANTS, tenant_engine
+
+    seen, total = set(), 0
+    for tenant in tenants or TENANTS:
+        engine = tenant_engine(tenant)
+        if engine.url in seen:
+            continue
+        seen.add(engine.url)
+        applied = await upgrade(engine, log=lambda msg, t=tenant: log(f"{msg} ({t})"))
+        total += len(applied)
+    return total
+
+
+async def _main(argv):
+    from .database import TENANTS, dispose_engine, tenant_engine
+
+    tenants = [argv.pop(argv.index("--tenant") + 1)] if "--tenant" in argv else list(TENANTS)
+    if "--tenant" in argv:
+        argv.remove("--tenant")
+    try:
+        if len(argv) > 1 and argv[1] == "status":
+            for tenant in tenants:
+                async with tenant_engine(tenant).connect() as conn:
+                    current = await current_version(conn)
+                print(f"{tenant}: versión actual v{current:04d}")
+                for m in discover():
+                    print(f"  v{m.version:04d} {m.name}{'' if m.version <= current else '  (pendiente)'}")
+            return 0
+        if len(argv) > 1:
+            print("uso: python -m app.migrate [status] [--tenant SLUG]")
+            return 2
+        applied = await upgrade_tenants(tenants)
+        print(f"migraciones aplicadas: {applied}" if applied else "el esquema ya estaba al día")
+        return 0
+    finally:
+        await dispose_engine()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv)))
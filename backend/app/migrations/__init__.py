@@ -0,0 +1,64 @@
+"""Migraciones del esquema (ver app/migrate.py).
+
+Convención: `vNNNN_nombre.py` con `async def upgrade(conn)`. Cada migración
+debe ser idempotente: en MySQL el DDL no es transaccional y una migración
+cortada a la mitad se vuelve a ejecutar completa. Para eso están estos helpers.
+"""
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateColumn
+
+
+def _columns(sync_conn, table: str) -> set:
+    return {c["name"] for c in inspect(sync_conn).get_columns(table)}
+
+
+async def add_column(conn, table: str, column):
+    """ALTER TABLE ... ADD COLUMN solo si la columna no existe."""
+
+    def run(sync_conn):
+        if column.name in _columns(sync_conn, table):
+            return
+        ddl = CreateColumn(column).compile(dialect=sync_conn.dialect)
+        sync_conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {ddl}")
+
+    await conn.run_sync(run)
+
+
+async def create_tables(conn, *tables):
+    """CREATE TABLE de las tablas (objetos Table) que falten."""
+    await conn.run_sync(lambda c: [t.create(c, checkfirst=True) for t in tables])
+
+
+async def create_indexes(conn, *tables):
+    """Crea los índices declarados en las tablas que todavía no existen en la base.
+
+    Omite los que usan columnas que aún no están: los crea la migración que
+    agrega esas columnas.
+    """
+
+    def run(sync_conn):
+        insp = inspect(sync_conn)
+        for table in tables:
+            existing = {ix["name"] for ix in insp.get_indexes(table.name)}
+            columns = _columns(sync_conn, table.name)
+            for index in table.indexes:
+                if index.name not in existing and all(c.name in columns for c in index.columns):
+                    index.create(sync_conn)
+
+    await conn.run_sync(run)
+
+
+async def drop_indexes(conn, table: str, *names):
+    """DROP INDEX de los índices que todavía existan."""
+
+    def run(sync_conn):
+        existing = {ix["name"] for ix in inspect(sync_conn).get_indexes(table)}
+        for name in names:
+            if name not in existing:
+                continue
+            if sync_conn.dialect.name == "mysql":
+                sync_conn.exec_driver_sql(f"DROP INDEX {name} ON {table}")
+            else:
+                sync_conn.exec_driver_sql(f"DROP INDEX {name}")
+
+    await conn.run_sync(run)
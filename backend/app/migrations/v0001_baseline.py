@@ -0,0 +1,152 @@
+"""Esquema base: las tablas e índices tal como estaban al introducir las migraciones.
+
+Copia congelada de los modelos de ese momento, no `models.Base`: los cambios
+posteriores del esquema van en su propia migración y esta no debe verlos (en
+una base nueva, v0001 seguida de las demás tiene que dar el mismo esquema que
+una base vieja migrada paso a paso). No editar.
+
+En una base creada antes con `create_all` al arrancar, crea solo lo que falte y
+la deja registrada en v0001.
+"""
+from sqlalchemy import Boolean, Column, Date, DateTime, Float, ForeignKey, Index, Integer, MetaData, String, Table, Text
+
+from . import create_indexes, create_tables
+
+_meta = MetaData()
+
+users = Table(
+    "users",
+    _meta,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("name", String(100), nullable=False, index=True),
+    Column("email", String(120), unique=True, index=True, nullable=False),
+    Column("hashed_password", String(255), nullable=False),
+    Column("role", String(20), index=True),
+    Column("is_active", Boolean, index=True),
+)
+
+units = Table(
+    "units",
+    _meta,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("code", String(50), unique=True, index=True, nullable=False),
+    Column("owner_id", Integer, ForeignKey("users.id"), nullable=True, index=True),
+    Column("area_m2", Float),
+)
+
+amenities = Table(
+    "amenities",
+    _meta,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("name", String(100), nullable=False),
+)
+
+reservations = Table(
+    "reservations",
+    _meta,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("amenity_id", Integer, ForeignKey("amenities.id"), nullable=False),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False, index=True),
+    Column("start_at", DateTime, nullable=False, index=True),
+    Column("end_at", DateTime, nullable=False),
+    Column("status", String(20), index=True),
+    Column("created_at", DateTime),
+    Index("ix_reservations_amenity_span", "amenity_id", "start_at", "end_at"),
+)
+
+maintenance_tickets = Table(
+    "maintenance_tickets",
+    _meta,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False, index=True),
+    Column("unit_id", Integer, ForeignKey("units.id"), nullable=True, index=True),
+    Column("title", String(120), nullable=False),
+    Column("description", Text, nullable=False),
+    Column("status", String(20), index=True),
+    Column("created_at", DateTime, index=True),
+)
+
+visitors = Table(
+    "visitors",
+    _meta,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("resident_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("visitor_name", String(120), nullable=False),
+    Column("id_number", String(60), nullable=True),
+    Column("allowed_at", DateTime, index=True),
+    Column("notes", Text),
+    Index("ix_visitors_resident_allowed", "resident_id", "allowed_at"),
+)
+
+payments = Table(
+    "payments",
+    _meta,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("unit_id", Integer, ForeignKey("units.id"), nullable=True),
+    Column("amount", Float, nullable=False),
+    Column("method", String(30)),
+    Column("paid_at", DateTime, index=True),
+    Column("receipt", String(120), nullable=True),
+    Index("ix_payments_user_paid", "user_id", "paid_at"),
+    Index("ix_payments_unit_paid", "unit_id", "paid_at"),
+)
+
+payment_monthly_summary = Table(
+    "payment_monthly_summary",
+    _meta,
+    Column("unit_id", Integer, primary_key=True),
+    Column("month", String(7), primary_key=True),
+    Column("total", Float, nullable=False),
+    Column("count", Integer, nullable=False),
+)
+
+owner_balances = Table(
+    "owner_balances",
+    _meta,
+    Column("user_id", Integer, primary_key=True),
+    Column("paid", Float, nullable=False),
+    Column("charged", Float, nullable=False),
+    Column("payments", Integer, nullable=False),
+)
+
+ticket_status_daily = Table(
+    "ticket_status_daily",
+    _meta,
+    Column("status", String(20), primary_key=True),
+    Column("day", Date, primary_key=True),
+    Column("count", Integer, nullable=False),
+)
+
+amenity_usage_daily = Table(
+    "amenity_usage_daily",
+    _meta,
+    Column("amenity_id", Integer, primary_key=True),
+    Column("day", Date, primary_key=True),
+    Column("reservations", Integer, nullable=False),
+    Column("booked_minutes", Float, nullable=False),
+)
+
+table_versions = Table(
+    "table_versions",
+    _meta,
+    Column("table_name", String(64), primary_key=True),
+    Column("version", Integer, nullable=False),
+)
+
+events_outbox = Table(
+    "events_outbox",
+    _meta,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("topic", String(30), nullable=False),
+    Column("action", String(10), nullable=False),
+    Column("user_id", Integer, nullable=True),
+    Column("payload", Text, nullable=False),
+    Column("created_at", DateTime, index=True),
+)
+
+
+async def upgrade(conn):
+    tables = _meta.sorted_tables
+    await create_tables(conn, *tables)
+    await create_indexes(conn, *tables)
@@ -0,0 +1,50 @@
+"""Reservas recurrentes: tabla reservation_series y reservations.series_id.
+
+DDL congelado (ver v0001): no usa los modelos.
+"""
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, MetaData, String, Table, inspect
+
+from . import add_column, create_indexes, create_tables
+
+_meta = MetaData()
+
+# Solo las columnas que referencian las FKs
+Table("users", _meta, Column("id", Integer, primary_key=True))
+Table("amenities", _meta, Column("id", Integer, primary_key=True))
+
+reservation_series = Table(
+    "reservation_series",
+    _meta,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("amenity_id", Integer, ForeignKey("amenities.id"), nullable=False),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False, index=True),
+    Column("rule", String(200), nullable=False),
+    Column("created_at", DateTime),
+)
+
+reservations = Table(
+    "reservations",
+    _meta,
+    Column("id", Integer, primary_key=True),
+    Column("series_id", Integer, nullable=True, index=True),
+)
+
+
+async def upgrade(conn):
+    await create_tables(conn, reservation_series)
+    await create_indexes(conn, reservation_series)
+    await add_column(conn, "reservations", Column("series_id", Integer, nullable=True))
+    await create_indexes(conn, reservations)
+
+    # SQLite no agrega FKs con ALTER TABLE; en MySQL sí
+    def add_fk(sync_conn):
+        if sync_conn.dialect.name != "mysql":
+            return
+        fks = inspect(sync_conn).get_foreign_keys("reservations")
+        if not any(fk["constrained_columns"] == ["series_id"] for fk in fks):
+            sync_conn.exec_driver_sql(
+                "ALTER TABLE reservations ADD CONSTRAINT fk_reservations_series "
+                "FOREIGN KEY (series_id) REFERENCES reservation_series (id)"
+            )
+
+    await conn.run_sync(add_fk)
@@ -0,0 +1,51 @@
+"""Índices de texto completo para /api/search.
+
+- SQLite: tablas FTS5 con contenido externo (`tickets_fts`, `visitors_fts`)
+  sincronizadas por triggers. Así cualquier escritura queda indexada en la
+  misma transacción: handlers, cargas masivas y el archivado de visitas.
+- MySQL: índices FULLTEXT sobre las mismas columnas; InnoDB los mantiene solo.
+"""
+from sqlalchemy import inspect
+
+# tabla FTS -> (tabla base, columnas indexadas)
+FTS = {
+    "tickets_fts": ("maintenance_tickets", ("title", "description")),
+    "visitors_fts": ("visitors", ("visitor_name", "id_number")),
+}
+
+
+def _sqlite(sync_conn):
+    for fts, (table, columns) in FTS.items():
+        cols = ", ".join(columns)
+        new = ", ".join(f"new.{c}" for c in columns)
+        old = ", ".join(f"old.{c}" for c in columns)
+        statements = [
+            # remove_diacritics: "rodriguez" encuentra "Rodríguez"
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, content='{table}', "
+            f"content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); END",
+            # Solo si cambia el texto: los cambios de estado no tocan el índice
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); "
+            f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END",
+            # Indexa lo que ya había (idempotente)
+            f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+        ]
+        for sql in statements:
+            sync_conn.exec_driver_sql(sql)
+
+
+def _mysql(sync_conn):
+    insp = inspect(sync_conn)
+    for fts, (table, columns) in FTS.items():
+        name = f"ft_{table}"
+        if any(ix["name"] == name for ix in insp.get_indexes(table)):
+            continue
+        sync_conn.exec_driver_sql(f"ALTER TABLE {table} ADD FULLTEXT INDEX {name} ({', '.join(columns)})")
+
+
+async def upgrade(conn):
+    await conn.run_sync(_mysql if conn.dialect.name == "mysql" else _sqlite)
@@ -0,0 +1,48 @@
+"""Facturación: tabla charges y la secuencia de recibos (tabla sequences).
+
+DDL congelado (ver v0001): no usa los modelos.
+"""
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, Integer, MetaData, String, Table, UniqueConstraint, insert, select
+
+from . import create_indexes, create_tables
+
+# Secuencias que existían al crear la tabla (las nuevas las siembra su propia migración)
+SEQUENCES = ("receipts",)
+
+_meta = MetaData()
+
+Table("users", _meta, Column("id", Integer, primary_key=True))
+Table("units", _meta, Column("id", Integer, primary_key=True))
+
+charges = Table(
+    "charges",
+    _meta,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("unit_id", Integer, ForeignKey("units.id"), nullable=False),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=True),
+    Column("period", String(7), nullable=False),
+    Column("concept", String(30), nullable=False),
+    Column("area_m2", Float, nullable=False),
+    Column("amount", Float, nullable=False),
+    Column("created_at", DateTime),
+    UniqueConstraint("period", "concept", "unit_id", name="uq_charges_period_unit"),
+    Index("ix_charges_user_period", "user_id", "period"),
+    Index("ix_charges_unit_period", "unit_id", "period"),
+)
+
+sequences = Table(
+    "sequences",
+    _meta,
+    Column("name", String(30), primary_key=True),
+    Column("next_value", Integer, nullable=False),
+)
+
+
+async def upgrade(conn):
+    await create_tables(conn, charges, sequences)
+    await create_indexes(conn, charges)
+    # Las secuencias arrancan en 1; la fila debe existir antes de reservar bloques
+    existing = set((await conn.execute(select(sequences.c.name))).scalars())
+    missing = [{"name": name, "next_value": 1} for name in SEQUENCES if name not in existing]
+    if missing:
+        await conn.execute(insert(sequences), missing)
@@ -0,0 +1,40 @@
+"""Borrado lógico: columna deleted_at en users, units y amenities, y la tabla purge_jobs.
+
+DDL congelado (ver v0001): no usa los modelos. Los índices de deleted_at los
+quita después v0006.
+"""
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, Text
+
+from . import add_column, create_indexes, create_tables
+
+SOFT_DELETE = ("users", "units", "amenities")
+
+_meta = MetaData()
+
+# Solo la columna nueva: lo que hace falta para su índice
+soft = [Table(name, _meta, Column("deleted_at", DateTime, nullable=True, index=True)) for name in SOFT_DELETE]
+
+purge_jobs = Table(
+    "purge_jobs",
+    _meta,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("kind", String(20), nullable=False),
+    Column("target_id", Integer, nullable=False),
+    Column("status", String(20), nullable=False, index=True),
+    Column("step", Integer, nullable=False),
+    Column("processed", Integer, nullable=False),
+    Column("result", String(20), nullable=True),
+    Column("error", Text, nullable=True),
+    Column("created_at", DateTime),
+    Column("started_at", DateTime, nullable=True),
+    Column("updated_at", DateTime, nullable=True),
+    Column("finished_at", DateTime, nullable=True),
+)
+
+
+async def upgrade(conn):
+    for table in soft:
+        await add_column(conn, table.name, Column("deleted_at", DateTime, nullable=True))
+        await create_indexes(conn, table)
+    await create_tables(conn, purge_jobs)
+    await create_indexes(conn, purge_jobs)
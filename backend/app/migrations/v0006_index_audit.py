@@ -0,0 +1,43 @@
+"""Auditoría de índices (ver tests/test_plans.py).
+
+- Fuera los `ix_<tabla>_id`: duplican la clave primaria y solo cuestan en cada alta.
+- Fuera los `ix_*_deleted_at`: casi todo es NULL; con ellos el planificador
+  ordenaba la tabla entera para servir la primera página de /api/users y /api/units.
+- Índice para reservation_series.amenity_id, que filtra la limpieza de una amenidad.
+
+DDL congelado (ver v0001): no usa los modelos.
+"""
+from sqlalchemy import Column, Index, Integer, MetaData, Table
+
+from . import create_indexes, drop_indexes
+
+PK_DUPLICATES = (
+    "users",
+    "units",
+    "amenities",
+    "reservations",
+    "reservation_series",
+    "maintenance_tickets",
+    "visitors",
+    "payments",
+    "events_outbox",
+    "charges",
+    "purge_jobs",
+)
+
+_meta = MetaData()
+
+reservation_series = Table(
+    "reservation_series",
+    _meta,
+    Column("amenity_id", Integer),
+    Index("ix_reservation_series_amenity_id", "amenity_id"),
+)
+
+
+async def upgrade(conn):
+    for table in PK_DUPLICATES:
+        await drop_indexes(conn, table, f"ix_{table}_id")
+    for table in ("users", "units", "amenities"):
+        await drop_indexes(conn, table, f"ix_{table}_deleted_at")
+    await create_indexes(conn, reservation_series)
@@ -0,0 +1,21 @@
+"""Índice (id_number, allowed_at) en visitors para GET /api/visitors/check.
+
+DDL congelado (ver v0001): no usa los modelos.
+"""
+from sqlalchemy import Column, DateTime, Index, MetaData, String, Table
+
+from . import create_indexes
+
+_meta = MetaData()
+
+visitors = Table(
+    "visitors",
+    _meta,
+    Column("id_number", String(60)),
+    Column("allowed_at", DateTime),
+    Index("ix_visitors_id_number_allowed", "id_number", "allowed_at"),
+)
+
+
+async def upgrade(conn):
+    await create_indexes(conn, visitors)
@@ -0,0 +1,34 @@
+"""Libera el email y el código de los usuarios y unidades ya borrados (ver purge.released).
+
+Tablas congeladas (ver v0001): no usa los modelos.
+"""
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, cast, func, literal, update
+
+_meta = MetaData()
+
+users = Table(
+    "users",
+    _meta,
+    Column("id", Integer, primary_key=True),
+    Column("email", String(120)),
+    Column("deleted_at", DateTime),
+)
+
+units = Table(
+    "units",
+    _meta,
+    Column("id", Integer, primary_key=True),
+    Column("code", String(50)),
+    Column("deleted_at", DateTime),
+)
+
+
+async def upgrade(conn):
+    for table, name in ((users, "email"), (units, "code")):
+        column = table.c[name]
+        value = literal("~") + cast(table.c.id, String) + literal("~") + column
+        await conn.execute(
+            update(table)
+            .where(table.c.deleted_at.isnot(None), column.notlike("~%"))
+            .values({name: func.substr(value, 1, column.type.length)})
+        )
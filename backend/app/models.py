@@ -1,68 +1,192 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Text, Float
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Date, DateTime, Text, Float, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
 
 class User(Base):
     __tablename__ = "users"
-    id = Column(Integer, primary_key=True, index=True)
-    name = Column(String(100), nullable=False)
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100), nullable=False, index=True)
     email = Column(String(120), unique=True, index=True, nullable=False)
     hashed_password = Column(String(255), nullable=False)
-    role = Column(String(20), default="resident")  # 'admin' | 'resident'
-    is_active = Column(Boolean, default=True)
+    role = Column(String(20), default="resident", index=True)  # 'admin' | 'resident'
+    is_active = Column(Boolean, default=True, index=True)
+    # Borrado lógico (ver purge.py). Sin índice: casi todas las filas tienen NULL y el
+    # filtro `deleted_at IS NULL` rinde más recorriendo por id que por este índice
+    deleted_at = Column(DateTime, nullable=True)
 
     units = relationship("Unit", back_populates="owner")
 
 class Unit(Base):
     __tablename__ = "units"
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     code = Column(String(50), unique=True, index=True, nullable=False)  # e.g., 'Torre A - 302'
-    owner_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
     area_m2 = Column(Float, default=0.0)
+    deleted_at = Column(DateTime, nullable=True)
 
     owner = relationship("User", back_populates="units")
 
 class Amenity(Base):
     __tablename__ = "amenities"
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     name = Column(String(100), nullable=False)  # e.g., 'Salón Social', 'Gimnasio'
+    deleted_at = Column(DateTime, nullable=True)
 
 class Reservation(Base):
     __tablename__ = "reservations"
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     amenity_id = Column(Integer, ForeignKey("amenities.id"), nullable=False)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    start_at = Column(DateTime, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    start_at = Column(DateTime, nullable=False, index=True)
     end_at = Column(DateTime, nullable=False)
-    status = Column(String(20), default="pending")  # pending|approved|cancelled
+    status = Column(String(20), default="pending", index=True)  # pending|approved|cancelled
     created_at = Column(DateTime, default=datetime.utcnow)
+    series_id = Column(Integer, ForeignKey("reservation_series.id"), nullable=True, index=True)
+
+    __table_args__ = (
+        # Cubre el chequeo de solapamiento y el barrido de disponibilidad
+        Index("ix_reservations_amenity_span", "amenity_id", "start_at", "end_at"),
+    )
+
+class ReservationSeries(Base):
+    """Reserva recurrente: la regla queda en texto RRULE, las ocurrencias son Reservation."""
+    __tablename__ = "reservation_series"
+    id = Column(Integer, primary_key=True)
+    amenity_id = Column(Integer, ForeignKey("amenities.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    rule = Column(String(200), nullable=False)  # p. ej. FREQ=WEEKLY;INTERVAL=1;BYDAY=TU;COUNT=10
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Limpieza al borrar la amenidad (purge.py)
+        Index("ix_reservation_series_amenity_id", "amenity_id"),
+    )
 
 class MaintenanceTicket(Base):
     __tablename__ = "maintenance_tickets"
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    unit_id = Column(Integer, ForeignKey("units.id"), nullable=True)
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    unit_id = Column(Integer, ForeignKey("units.id"), nullable=True, index=True)
     title = Column(String(120), nullable=False)
     description = Column(Text, nullable=False)
-    status = Column(String(20), default="open")  # open|in_progress|closed
-    created_at = Column(DateTime, default=datetime.utcnow)
+    status = Column(String(20), default="open", index=True)  # open|in_progress|closed
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
 
 class VisitorLog(Base):
     __tablename__ = "visitors"
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     resident_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     visitor_name = Column(String(120), nullable=False)
     id_number = Column(String(60), nullable=True)
-    allowed_at = Column(DateTime, default=datetime.utcnow)
+    allowed_at = Column(DateTime, default=datetime.utcnow, index=True)
     notes = Column(Text, default="")
 
+    __table_args__ = (
+        # Filtro por residente + orden/rango por fecha
+        Index("ix_visitors_resident_allowed", "resident_id", "allowed_at"),
+        # Consulta de portería: documento + autorización más reciente (gate.py)
+        Index("ix_visitors_id_number_allowed", "id_number", "allowed_at"),
+    )
+
 class Payment(Base):
     __tablename__ = "payments"
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     unit_id = Column(Integer, ForeignKey("units.id"), nullable=True)
     amount = Column(Float, nullable=False)
     method = Column(String(30), default="card")  # mock method
-    paid_at = Column(DateTime, default=datetime.utcnow)
+    paid_at = Column(DateTime, default=datetime.utcnow, index=True)
     receipt = Column(String(120), nullable=True)  # mock receipt code
+
+    __table_args__ = (
+        # Filtro por usuario/unidad + orden/rango por fecha de pago
+        Index("ix_payments_user_paid", "user_id", "paid_at"),
+        Index("ix_payments_unit_paid", "unit_id", "paid_at"),
+    )
+
+class Charge(Base):
+    """Expensa de una unidad en un período; la genera la facturación (billing.py)."""
+    __tablename__ = "charges"
+    id = Column(Integer, primary_key=True)
+    unit_id = Column(Integer, ForeignKey("units.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # dueño al facturar
+    period = Column(String(7), nullable=False)  # 'YYYY-MM'
+    concept = Column(String(30), nullable=False, default="dues")
+    area_m2 = Column(Float, nullable=False, default=0.0)  # área con la que se calculó
+    amount = Column(Float, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Una expensa por unidad, período y concepto: repetir la corrida no duplica
+        UniqueConstraint("period", "concept", "unit_id", name="uq_charges_period_unit"),
+        Index("ix_charges_user_period", "user_id", "period"),
+        Index("ix_charges_unit_period", "unit_id", "period"),
+    )
+
+class SequenceCounter(Base):
+    """Siguiente valor libre de cada secuencia (sequences.py reserva bloques)."""
+    __tablename__ = "sequences"
+    name = Column(String(30), primary_key=True)
+    next_value = Column(Integer, nullable=False, default=1)
+
+class PurgeJob(Base):
+    """Limpieza en segundo plano de lo que referencia a un registro borrado."""
+    __tablename__ = "purge_jobs"
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(20), nullable=False)  # 'unit' | 'user' | 'amenity'
+    target_id = Column(Integer, nullable=False)
+    status = Column(String(20), nullable=False, default="pending", index=True)  # pending|running|done|failed
+    step = Column(Integer, nullable=False, default=0)  # paso del plan en curso
+    processed = Column(Integer, nullable=False, default=0)  # filas soltadas/borradas
+    result = Column(String(20), nullable=True)  # 'deleted' | 'tombstone'
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, nullable=True)  # latido del worker que lo procesa
+    finished_at = Column(DateTime, nullable=True)
+
+
+# ---------- RESÚMENES (se actualizan en cada escritura) ----------
+class PaymentMonthlySummary(Base):
+    __tablename__ = "payment_monthly_summary"
+    unit_id = Column(Integer, primary_key=True)  # 0 = pago sin unidad
+    month = Column(String(7), primary_key=True)  # 'YYYY-MM'
+    total = Column(Float, nullable=False, default=0.0)
+    count = Column(Integer, nullable=False, default=0)
+
+class OwnerBalance(Base):
+    __tablename__ = "owner_balances"
+    user_id = Column(Integer, primary_key=True)
+    paid = Column(Float, nullable=False, default=0.0)
+    charged = Column(Float, nullable=False, default=0.0)
+    payments = Column(Integer, nullable=False, default=0)
+
+class TicketStatusDaily(Base):
+    __tablename__ = "ticket_status_daily"
+    status = Column(String(20), primary_key=True)
+    day = Column(Date, primary_key=True)  # día de creación
+    count = Column(Integer, nullable=False, default=0)
+
+class AmenityUsageDaily(Base):
+    __tablename__ = "amenity_usage_daily"
+    amenity_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)  # día de inicio de la reserva
+    reservations = Column(Integer, nullable=False, default=0)
+    booked_minutes = Column(Float, nullable=False, default=0.0)
+
+# ---------- VERSIONES (ETag) ----------
+class TableVersion(Base):
+    __tablename__ = "table_versions"
+    table_name = Column(String(64), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+# ---------- EVENTOS (outbox para varios workers) ----------
+class OutboxEvent(Base):
+    __tablename__ = "events_outbox"
+    id = Column(Integer, primary_key=True)
+    topic = Column(String(30), nullable=False)
+    action = Column(String(10), nullable=False)
+    user_id = Column(Integer, nullable=True)  # dueño del registro; NULL = solo admins
+    payload = Column(Text, nullable=False)  # JSON
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
@@ -0,0 +1,162 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from typing import Iterable, List, Literal, Optional
+
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import DateTime, and_, or_
+
+try:
+    import orjson
+except ImportError:  # sin orjson se usa json de la stdlib (más lento)
+    orjson = None
+
+# Límites de página para los listados
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+def encode_cursor(sort: str, order: str, value, row_id: int) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([sort, order, value, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, order: str, column):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        c_sort, c_order, value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        if isinstance(column.type, DateTime) and value is not None:
+            value = datetime.fromisoformat(value)
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    # Un cursor solo es válido con el mismo orden con el que se generó
+    if c_sort != sort or c_order != order:
+        raise HTTPException(status_code=400, detail="Cursor does not match sort order")
+    return value, int(row_id)
+
+
+class PageParams:
+    """Parámetros comunes de los listados: orden estable + cursor."""
+
+    def __init__(
+        self,
+        sort: str = Query("id"),
+        order: Literal["asc", "desc"] = Query("asc"),
+        limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+        after: Optional[str] = Query(None),
+    ):
+        self.sort = sort
+        self.order = order
+        self.limit = limit
+        self.after = after
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, default=_default, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def page_response(page: dict, response: Response) -> FastJSONResponse:
+    """Devuelve la página ya serializada, sin pasar por la validación de response_model.
+
+    Los headers que el endpoint dejó en `response` (ETag, Cache-Control) se copian.
+    """
+    return FastJSONResponse(page, headers=dict(response.headers))
+
+
+def parse_fields(fields: Optional[str], allowed: Iterable[str]) -> List[str]:
+    """`?fields=id,amount` -> columnas pedidas (siempre incluye id)."""
+    allowed = list(allowed)
+    if not fields:
+        return allowed
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in names if f not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}. Use: {', '.join(allowed)}",
+        )
+    return ["id"] + [f for f in names if f != "id"]
+
+
+def _after(column, id_col, desc: bool, value, last_id: int):
+    """Filas posteriores al cursor (value, last_id) en el orden (columna, id).
+
+    Las columnas que admiten NULL (paid_at, allowed_at, created_at) necesitan
+    su rama: `column > NULL` no es verdadero para ninguna fila. NULL cuenta
+    como el menor valor: primero en ASC, último en DESC.
+    """
+    if column is id_col:
+        return id_col < last_id if desc else id_col > last_id
+    if value is None:
+        # El cursor está entre los NULL: siguen los NULL con id posterior y, en ASC, todo lo demás
+        same = and_(column.is_(None), id_col < last_id if desc else id_col > last_id)
+        return same if desc else or_(same, column.isnot(None))
+    if desc:
+        cond = or_(column < value, and_(column == value, id_col < last_id))
+        return or_(cond, column.is_(None)) if column.nullable else cond
+    return or_(column > value, and_(column == value, id_col > last_id))
+
+
+async def paginate(db, stmt, model, sort_columns: dict, page: PageParams, schema, fields: Optional[str] = None):
+    """Keyset pagination sobre `stmt` ordenado por (columna, id).
+
+    Selecciona solo las columnas de `schema` (o las de `fields`) como tuplas: sin
+    instancias ORM ni identity map. Los items salen como dicts listos para
+    `page_response`.
+    """
+    sort, order, limit, after = page.sort, page.order, page.limit, page.after
+    if sort not in sort_columns:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid sort, use one of: {', '.join(sort_columns)}",
+        )
+    column = sort_columns[sort]
+    id_col = model.id
+    desc = order == "desc"
+
+    if after:
+        value, last_id = decode_cursor(after, sort, order, column)
+        stmt = stmt.where(_after(column, id_col, desc, value, last_id))
+
+    if column is id_col:
+        ordering = [id_col.desc() if desc else id_col.asc()]
+    else:
+        # SQLite y MySQL ya ponen los NULL primero en ASC y últimos en DESC, como
+        # asume _after; un NULLS FIRST/LAST explícito no existe en MySQL
+        ordering = (
+            [column.desc(), id_col.desc()] if desc else [column.asc(), id_col.asc()]
+        )
+
+    names = parse_fields(fields, schema.model_fields)
+    # La columna de orden hace falta para el cursor aunque no se haya pedido
+    selected = names if column.key in names else names + [column.key]
+    stmt = stmt.with_only_columns(*(getattr(model, n) for n in selected))
+
+    # Se pide una fila extra para saber si hay página siguiente
+    rows = (await db.execute(stmt.order_by(*ordering).limit(limit + 1))).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(sort, order, last[selected.index(column.key)], last.id)
+    # zip corta en len(names): la columna de orden extra no sale en la respuesta
+    return {"items": [dict(zip(names, row)) for row in rows], "next_cursor": next_cursor}
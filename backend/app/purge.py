@@ -0,0 +1,321 @@
+"""Borrado lógico de usuarios, unidades y amenidades, y su limpieza en segundo plano.
+
+El DELETE de la API solo marca `deleted_at` (los listados, las lecturas por id
+y las altas que los referencian ya no lo ven) y encola un PurgeJob: responde
+en milisegundos. El worker recorre después el plan de cada tipo por lotes de
+PURGE_BATCH filas, cada lote en una transacción corta y con una pausa entre
+lotes, así nunca deja bloqueadas las tablas de pagos o reservas:
+
+- unit: suelta tickets y pagos (unit_id = NULL).
+- user: suelta sus unidades (owner_id = NULL) y cancela sus reservas futuras.
+- amenity: cancela sus reservas futuras y borra las series que no tuvieron
+  ninguna ocurrencia pasada. Las reservas pasadas son historial: quedan, y
+  con ellas la lápida.
+
+Cada lote avisa en el feed de eventos (`updated`) por las reservas, tickets y
+pagos que tocó, en la misma transacción.
+
+Al terminar borra la fila si ya nada la referencia. Si quedan referencias
+históricas (expensas, pagos, tickets...), la fila queda como lápida. El email
+del usuario y el código de la unidad se liberan al marcar el borrado (ver
+released), así se pueden volver a dar de alta. El avance se consulta en
+GET /api/jobs/{id}.
+
+    python -m app.purge run [--tenant SLUG]    # procesa los pendientes y termina
+"""
+import asyncio
+import logging
+import os
+import sys
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional, Tuple
+
+from sqlalchemy import and_, delete, exists, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from . import events, models, summaries, versions
+from .database import TENANTS, current_tenant, on_commit, session_factory
+
+log = logging.getLogger("village.purge")
+
+PURGE_BATCH = int(os.getenv("PURGE_BATCH", "500"))
+PURGE_PAUSE = float(os.getenv("PURGE_PAUSE", "0.1"))  # respiro entre lotes
+PURGE_INTERVAL = float(os.getenv("PURGE_INTERVAL", "10"))  # segundos entre revisiones de la cola
+PURGE_STALE = 60  # un job "running" sin latido por este tiempo se retoma (worker caído)
+
+DETACH, CANCEL, PURGE = "detach", "cancel", "purge"
+
+
+class Step(NamedTuple):
+    model: type
+    column: str
+    action: str  # DETACH: columna = NULL; CANCEL: reservas futuras canceladas; PURGE: DELETE
+
+
+class Plan(NamedTuple):
+    model: type
+    steps: Tuple[Step, ...]
+    keeps: Tuple[Tuple[type, str], ...]  # referencias que se conservan: si hay, queda la lápida
+    unique: Optional[str] = None  # columna única que se libera al borrar
+
+
+R, T, P = models.Reservation, models.MaintenanceTicket, models.Payment
+TOPICS = {R: "reservations", T: "tickets", P: "payments"}  # modelos con eventos (events.TOPICS)
+PLANS = {
+    "unit": Plan(
+        models.Unit,
+        (Step(T, "unit_id", DETACH), Step(P, "unit_id", DETACH)),
+        ((models.Charge, "unit_id"),),
+        "code",
+    ),
+    "user": Plan(
+        models.User,
+        (Step(models.Unit, "owner_id", DETACH), Step(R, "user_id", CANCEL)),
+        (
+            (P, "user_id"),
+            (T, "user_id"),
+            (R, "user_id"),
+            (models.ReservationSeries, "user_id"),
+            (models.VisitorLog, "resident_id"),
+            (models.Charge, "user_id"),
+        ),
+        "email",
+    ),
+    "amenity": Plan(
+        models.Amenity,
+        (Step(R, "amenity_id", CANCEL), Step(models.ReservationSeries, "amenity_id", PURGE)),
+        ((R, "amenity_id"), (models.ReservationSeries, "amenity_id")),
+    ),
+}
+
+_wake = asyncio.Event()
+
+
+def wake():
+    """Avisa al worker de este proceso que hay un job nuevo (los demás lo ven al revisar)."""
+    _wake.set()
+
+
+async def live(db, model, obj_id: int):
+    """La fila por id, o None si no existe o está borrada."""
+    obj = await db.get(model, obj_id)
+    return obj if obj is not None and obj.deleted_at is None else None
+
+
+def released(obj_id: int, value: str, length: int) -> str:
+    """Valor que ocupa la columna única de una fila borrada: `~<id>~<valor original>`.
+
+    El id la hace única y el valor original queda a la vista en el historial
+    (pagos o expensas de una lápida).
+    """
+    return f"~{obj_id}~{value}"[:length]
+
+
+async def soft_delete(db, kind: str, obj) -> models.PurgeJob:
+    obj.deleted_at = datetime.utcnow()
+    plan = PLANS[kind]
+    if plan.unique:
+        column = getattr(plan.model, plan.unique)
+        setattr(obj, plan.unique, released(obj.id, getattr(obj, plan.unique), column.type.length))
+    job = models.PurgeJob(kind=kind, target_id=obj.id, status="pending", step=0, processed=0)
+    db.add(job)
+    await versions.bump(db, plan.model.__tablename__)
+    on_commit(db, wake)
+    await db.commit()
+    return job
+
+
+# -------------------- worker --------------------
+def _where(step: Step, target_id: int):
+    M = step.model
+    now = datetime.utcnow()
+    cond = [getattr(M, step.column) == target_id]
+    if step.action == CANCEL:
+        cond += [M.start_at >= now, M.status != "cancelled"]
+    elif M is models.ReservationSeries:
+        # Una serie con ocurrencias pasadas es historial: queda
+        cond.append(~exists().where(R.series_id == M.id, R.start_at < now))
+    return cond
+
+
+async def _run_step(db, step: Step, target_id: int) -> int:
+    """Un lote del paso; devuelve cuántas filas tocó."""
+    M = step.model
+    extra = (M.amenity_id, M.start_at, M.end_at) if step.action == CANCEL else ()
+    # Sin ORDER BY: el orden de los lotes da igual y ordenar obligaría a leer (y
+    # ordenar) todas las filas que faltan en cada lote en vez de las primeras
+    rows = (await db.execute(select(M.id, *extra).where(*_where(step, target_id)).limit(PURGE_BATCH))).all()
+    if not rows:
+        return 0
+    ids = [r[0] for r in rows]
+    if step.action == DETACH:
+        await db.execute(update(M).where(M.id.in_(ids)).values({step.column: None}))
+    elif step.action == CANCEL:
+        await db.execute(update(M).where(M.id.in_(ids)).values(status="cancelled"))
+        by_amenity = defaultdict(list)
+        for _, amenity_id, start_at, end_at in rows:
+            by_amenity[amenity_id].append((start_at, end_at))
+        for amenity_id, spans in by_amenity.items():
+            await summaries.reservations_added(db, amenity_id, spans, sign=-1)
+    else:
+        if M is models.ReservationSeries:
+            # Sus ocurrencias (todas futuras y ya canceladas) quedan sueltas
+            loose = (await db.execute(select(R.id).where(R.series_id.in_(ids)))).scalars().all()
+            await db.execute(update(R).where(R.id.in_(loose)).values(series_id=None))
+            await versions.bump(db, R.__tablename__)
+            await _emit_updated(db, R, loose)
+        await db.execute(delete(M).where(M.id.in_(ids)))
+    await versions.bump(db, M.__tablename__)
+    if step.action != PURGE:
+        await _emit_updated(db, M, ids)
+    return len(ids)
+
+
+async def _emit_updated(db, M, ids):
+    """Eventos `updated` de las filas del lote (se publican con su commit)."""
+    if M not in TOPICS or not ids:
+        return
+    # populate_existing: las filas ya cargadas en la sesión traen los valores del UPDATE
+    rows = (await db.execute(select(M).where(M.id.in_(ids)).execution_options(populate_existing=True))).scalars()
+    for row in rows:
+        events.emit(db, TOPICS[M], "updated", row, row.user_id)
+
+
+async def _finish(db, job: models.PurgeJob, plan: Plan) -> bool:
+    """Cierra el job; False si aparecieron referencias nuevas y hay que repasar el plan."""
+    for step in plan.steps:
+        # Un alta que se coló entre el último lote y ahora
+        if await db.scalar(select(exists().where(*_where(step, job.target_id)))):
+            job.step = 0
+            return False
+
+    if job.kind == "unit":
+        await summaries.unit_detached(db, job.target_id)
+
+    job.result = "tombstone"
+    referenced = False
+    for model, column in plan.keeps:
+        if await db.scalar(select(exists().where(getattr(model, column) == job.target_id))):
+            referenced = True
+            break
+    if not referenced:
+        try:
+            async with db.begin_nested():
+                await db.execute(delete(plan.model).where(plan.model.id == job.target_id))
+            job.result = "deleted"
+        except IntegrityError:
+            pass  # una FK que el plan no cubre: queda la lápida
+    await versions.bump(db, plan.model.__tablename__)
+    return True
+
+
+async def run_job(factory, job_id: int):
+    J = models.PurgeJob
+    while True:
+        async with factory() as db:
+            job = await db.get(J, job_id)
+            plan = PLANS[job.kind]
+            now = datetime.utcnow()
+            if job.step < len(plan.steps):
+                moved = await _run_step(db, plan.steps[job.step], job.target_id)
+                job.processed += moved
+                if moved < PURGE_BATCH:
+                    job.step += 1
+                job.updated_at = now
+                await db.commit()
+            else:
+                done = await _finish(db, job, plan)
+                job.updated_at = now
+                if done:
+                    job.status, job.finished_at = "done", now
+                await db.commit()
+                if done:
+                    return
+        await asyncio.sleep(PURGE_PAUSE)
+
+
+async def _claim(db, job_id: int) -> bool:
+    """Toma el job para este proceso; con varios workers solo uno lo logra."""
+    J = models.PurgeJob
+    now = datetime.utcnow()
+    result = await db.execute(
+        update(J)
+        .where(J.id == job_id, _claimable(now))
+        .values(status="running", started_at=now, updated_at=now)
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+
+def _claimable(now: datetime):
+    J = models.PurgeJob
+    stale = now - timedelta(seconds=PURGE_STALE)
+    return or_(J.status == "pending", and_(J.status == "running", J.updated_at < stale))
+
+
+async def run_pending(factory) -> int:
+    """Procesa los jobs pendientes (o abandonados) de un condominio."""
+    J = models.PurgeJob
+    async with factory() as db:
+        ids = (await db.execute(select(J.id).where(_claimable(datetime.utcnow())).order_by(J.id))).scalars().all()
+    done = 0
+    for job_id in ids:
+        async with factory() as db:
+            if not await _claim(db, job_id):
+                continue
+        try:
+            await run_job(factory, job_id)
+            done += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            async with factory() as db:
+                await db.execute(
+                    update(J).where(J.id == job_id).values(status="failed", error=repr(e), finished_at=datetime.utcnow())
+                )
+                await db.commit()
+            log.exception("job %d: error", job_id)
+    return done
+
+
+async def run_forever():
+    """Revisa la cola de cada condominio cada PURGE_INTERVAL, o antes si llega un job."""
+    global _wake
+    _wake = asyncio.Event()  # del loop de este arranque (la app puede arrancar más de una vez, p. ej. en los tests)
+    while True:
+        _wake.clear()
+        for tenant in TENANTS:
+            current_tenant.set(tenant)  # contexto propio de esta tarea: no afecta peticiones
+            try:
+                done = await run_pending(session_factory(tenant))
+                if done:
+                    log.info("%s: %d jobs terminados", tenant, done)
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # reintentar en la próxima revisión
+                log.exception("%s: error al revisar la cola", tenant)
+        try:
+            await asyncio.wait_for(_wake.wait(), PURGE_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def _main(argv):
+    from .database import dispose_engine
+
+    if len(argv) < 2 or argv[1] != "run":
+        print("uso: python -m app.purge run [--tenant SLUG]")
+        return 2
+    tenants = [argv[argv.index("--tenant") + 1]] if "--tenant" in argv else list(TENANTS)
+    try:
+        for tenant in tenants:
+            current_tenant.set(tenant)
+            print(f"{tenant}: {await run_pending(session_factory(tenant))} jobs terminados")
+    finally:
+        await dispose_engine()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv)))
@@ -0,0 +1,262 @@
+"""Retención del registro de visitas: lo viejo pasa a archivos NDJSON comprimidos.
+
+Las visitas con `allowed_at` anterior a VISITOR_RETENTION_DAYS se mueven por
+lotes a ARCHIVE_DIR/visitors/AAAA-MM/<primer_id>-<último_id>.ndjson.gz.
+Cada lote usa una transacción corta (SELECT + DELETE por id) y hay una pausa
+entre lotes, así la tabla nunca queda bloqueada mucho tiempo.
+
+Cada lote es exactamente-una-vez: se escribe como `.part`, luego se borran las
+filas y, tras el commit, se renombra. Si el proceso muere a mitad, `_recover`
+decide con la base qué `.part` descartar y cuáles completar.
+
+    python -m app.retention archive            # una pasada completa
+    python -m app.retention archive --days 90
+"""
+import asyncio
+import gzip
+import heapq
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import delete, select
+
+from . import models, versions
+from .database import DEFAULT_TENANT, TENANTS, current_tenant, session_factory
+from .pagination import decode_cursor, encode_cursor
+
+log = logging.getLogger("village.retention")
+
+try:
+    import fcntl  # lock entre workers (no existe en Windows)
+except ImportError:
+    fcntl = None
+
+VISITOR_RETENTION_DAYS = int(os.getenv("VISITOR_RETENTION_DAYS", "365"))  # 0 = no archivar
+ARCHIVE_DIR = Path(os.getenv("ARCHIVE_DIR", Path(__file__).resolve().parents[1] / "archive"))
+ARCHIVE_BATCH = int(os.getenv("ARCHIVE_BATCH", "5000"))
+ARCHIVE_INTERVAL = float(os.getenv("ARCHIVE_INTERVAL", "3600"))  # segundos entre pasadas
+ARCHIVE_PAUSE = 0.05  # respiro entre lotes para no acaparar la base
+
+FIELDS = ("id", "resident_id", "visitor_name", "id_number", "allowed_at", "notes")
+
+
+def _root() -> Path:
+    # El tenant por defecto conserva la ruta de siempre; los demás van en su carpeta
+    tenant = current_tenant.get()
+    return ARCHIVE_DIR / ("visitors" if tenant == DEFAULT_TENANT else f"{tenant}/visitors")
+
+
+def _row_dict(row) -> dict:
+    d = dict(zip(FIELDS, row))
+    d["allowed_at"] = d["allowed_at"].isoformat()
+    return d
+
+
+def _write_part(path: Path, rows: list):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        for r in rows:
+            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _read_file(path: Path):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+# -------------------- archivado --------------------
+async def _recover(db):
+    """Completa o descarta los `.part` de una pasada interrumpida."""
+    for part in _root().glob("*/*.ndjson.gz.part"):
+        ids = [r["id"] for r in _read_file(part)]
+        V = models.VisitorLog
+        still_there = (await db.execute(select(V.id).where(V.id.in_(ids)).limit(1))).first()
+        if still_there:
+            part.unlink()  # el DELETE no llegó a confirmarse: las filas siguen en la base
+        else:
+            part.rename(part.with_suffix(""))  # el DELETE se confirmó: el archivo es válido
+
+
+async def archive_batch(db, cutoff: datetime) -> int:
+    V = models.VisitorLog
+    rows = (
+        await db.execute(
+            select(*(getattr(V, f) for f in FIELDS))
+            .where(V.allowed_at < cutoff)
+            .order_by(V.allowed_at, V.id)
+            .limit(ARCHIVE_BATCH)
+        )
+    ).all()
+    if not rows:
+        await db.rollback()
+        return 0
+
+    by_month = {}
+    for row in rows:
+        by_month.setdefault(row.allowed_at.strftime("%Y-%m"), []).append(_row_dict(row))
+    parts = []
+    for month, items in by_month.items():
+        ids = [r["id"] for r in items]
+        part = _root() / month / f"{min(ids)}-{max(ids)}.ndjson.gz.part"
+        await asyncio.to_thread(_write_part, part, items)
+        parts.append(part)
+
+    await db.execute(delete(V).where(V.id.in_([r.id for r in rows])))
+    await versions.bump(db, "visitors")
+    await db.commit()
+    for part in parts:
+        part.rename(part.with_suffix(""))
+    return len(rows)
+
+
+class _ArchiveLock:
+    """flock sobre ARCHIVE_DIR: con varios workers solo uno archiva a la vez."""
+
+    def __enter__(self):
+        _root().mkdir(parents=True, exist_ok=True)
+        self.f = open(_root() / ".lock", "w")
+        if fcntl is None:
+            return True
+        try:
+            fcntl.flock(self.f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def __exit__(self, *exc):
+        self.f.close()  # libera el flock
+
+
+async def archive_old_visitors(session_factory, days: int = VISITOR_RETENTION_DAYS) -> Optional[int]:
+    """Una pasada completa; None si otro proceso ya está archivando."""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    total = 0
+    with _ArchiveLock() as acquired:
+        if not acquired:
+            return None
+        async with session_factory() as db:
+            await _recover(db)
+            await db.commit()
+        while True:
+            async with session_factory() as db:
+                moved = await archive_batch(db, cutoff)
+            total += moved
+            if moved < ARCHIVE_BATCH:
+                return total
+            await asyncio.sleep(ARCHIVE_PAUSE)
+
+
+async def run_forever():
+    """Una pasada por condominio cada ARCHIVE_INTERVAL."""
+    while True:
+        for tenant in TENANTS:
+            current_tenant.set(tenant)  # contexto propio de esta tarea: no afecta peticiones
+            try:
+                moved = await archive_old_visitors(session_factory(tenant))
+                if moved:
+                    log.info("%s: %d visitas archivadas en %s", tenant, moved, _root())
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # reintentar en la próxima pasada
+                log.exception("%s: error al archivar", tenant)
+        await asyncio.sleep(ARCHIVE_INTERVAL)
+
+
+# -------------------- consulta del archivo --------------------
+def _months(date_from: Optional[datetime], date_to: Optional[datetime]):
+    low = date_from.strftime("%Y-%m") if date_from else None
+    high = date_to.strftime("%Y-%m") if date_to else None
+    for d in sorted(p for p in _root().glob("????-??") if p.is_dir()):
+        if (low and d.name < low) or (high and d.name > high):
+            continue
+        yield d
+
+
+def _scan(resident_ids, date_from, date_to, sort, order, limit, after):
+    low = date_from.isoformat() if date_from else None
+    high = date_to.isoformat() if date_to else None
+
+    def key(r):
+        return (r["id"],) if sort == "id" else (r[sort], r["id"])
+
+    ref = None
+    if after:
+        value, last_id = after
+        if isinstance(value, datetime):
+            value = value.isoformat()  # en el archivo las fechas son ISO: se comparan como texto
+        ref = (last_id,) if sort == "id" else (value, last_id)
+
+    def rows():
+        for month in _months(date_from, date_to):
+            for path in sorted(month.glob("*.ndjson.gz")):
+                for r in _read_file(path):
+                    if resident_ids is not None and r["resident_id"] not in resident_ids:
+                        continue
+                    if (low and r["allowed_at"] < low) or (high and r["allowed_at"] >= high):
+                        continue
+                    if ref is not None and ((key(r) <= ref) if order == "asc" else (key(r) >= ref)):
+                        continue
+                    yield r
+
+    pick = heapq.nsmallest if order == "asc" else heapq.nlargest
+    return pick(limit + 1, rows(), key=key)
+
+
+async def query_archive(db, page, resident_id=None, unit_id=None, date_from=None, date_to=None) -> dict:
+    """Página de visitas archivadas, con los mismos filtros, orden y cursor que el listado."""
+    if page.sort not in ("id", "allowed_at"):
+        raise HTTPException(status_code=400, detail="Invalid sort, use one of: id, allowed_at")
+    resident_ids = None
+    if resident_id is not None:
+        resident_ids = {resident_id}
+    if unit_id is not None:
+        owner = (await db.execute(select(models.Unit.owner_id).where(models.Unit.id == unit_id))).scalar()
+        resident_ids = {owner} & resident_ids if resident_ids is not None else {owner}
+    after = None
+    if page.after:
+        column = models.VisitorLog.allowed_at if page.sort == "allowed_at" else models.VisitorLog.id
+        after = decode_cursor(page.after, page.sort, page.order, column)
+
+    rows = await asyncio.to_thread(
+        _scan, resident_ids, date_from, date_to, page.sort, page.order, page.limit, after
+    )
+    next_cursor = None
+    if len(rows) > page.limit:
+        rows = rows[: page.limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(page.sort, page.order, last[page.sort], last["id"])
+    return {"items": rows, "next_cursor": next_cursor}
+
+
+async def _main(argv):
+    from .database import dispose_engine
+
+    if len(argv) < 2 or argv[1] != "archive":
+        print("uso: python -m app.retention archive [--days N] [--tenant SLUG]")
+        return 2
+    days = int(argv[argv.index("--days") + 1]) if "--days" in argv else VISITOR_RETENTION_DAYS
+    if days <= 0:
+        print("VISITOR_RETENTION_DAYS=0: archivado desactivado")
+        return 2
+    tenants = [argv[argv.index("--tenant") + 1]] if "--tenant" in argv else list(TENANTS)
+    try:
+        for tenant in tenants:
+            current_tenant.set(tenant)
+            moved = await archive_old_visitors(session_factory(tenant), days)
+            print(f"{tenant}: " + ("otro proceso está archivando" if moved is None else f"{moved} visitas archivadas en {_root()}"))
+    finally:
+        await dispose_engine()  # sin esto el hilo de aiosqlite deja colgado el proceso
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv)))
@@ -1,6 +1,28 @@
 from pydantic import BaseModel, EmailStr, Field
-from datetime import datetime
-from typing import Optional, List
+from pydantic_core import core_schema
+from datetime import datetime, timezone
+from typing import Any, Dict, Generic, Literal, Optional, List, TypeVar
+
+T = TypeVar("T")
+
+
+def naive_utc(value: datetime) -> datetime:
+    """Fecha con zona (`...Z`, `-05:00`) -> UTC sin zona, como se guarda en la base."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class UTCDateTime(datetime):
+    """Fecha de entrada (cuerpo o query param) normalizada con naive_utc: se compara con columnas sin zona.
+
+    Es una clase y no un Annotated: FastAPI descarta los validadores de un
+    Annotated cuando el parámetro lleva `= Query(...)`.
+    """
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source, handler):
+        return core_schema.no_info_after_validator_function(naive_utc, handler(datetime))
 
 # ---------- AUTH ----------
 class UserCreate(BaseModel):
@@ -44,15 +66,46 @@ class AmenityOut(AmenityIn):
 class ReservationIn(BaseModel):
     amenity_id: int
     user_id: int
-    start_at: datetime
-    end_at: datetime
+    start_at: UTCDateTime
+    end_at: UTCDateTime
 
 class ReservationOut(ReservationIn):
     id: int
     status: str
+    series_id: Optional[int] = None
     class Config:
         from_attributes = True
 
+class SlotOut(BaseModel):
+    start_at: datetime
+    end_at: datetime
+
+class AvailabilityOut(BaseModel):
+    amenity_id: int
+    duration_minutes: int
+    slots: List[SlotOut]
+
+Weekday = Literal["MO", "TU", "WE", "TH", "FR", "SA", "SU"]
+
+class RecurrenceRule(BaseModel):
+    # Subconjunto de RRULE: diaria o semanal, termina por fecha (until) o cantidad (count)
+    freq: Literal["daily", "weekly"]
+    interval: int = Field(1, ge=1, le=52)
+    by_weekday: Optional[List[Weekday]] = None  # solo weekly; por defecto el día de start_at
+    until: Optional[UTCDateTime] = None
+    count: Optional[int] = Field(None, ge=1)
+
+class ReservationSeriesIn(ReservationIn):
+    # start_at/end_at son la primera ocurrencia
+    rule: RecurrenceRule
+    mode: Literal["all_or_nothing", "skip_conflicts"] = "all_or_nothing"
+
+class ReservationSeriesOut(BaseModel):
+    id: int
+    rule: str
+    created: List[ReservationOut]
+    conflicts: List[SlotOut]
+
 class TicketIn(BaseModel):
     user_id: int
     unit_id: Optional[int] = None
@@ -77,6 +130,24 @@ class VisitorOut(VisitorIn):
     class Config:
         from_attributes = True
 
+class GateResidentOut(BaseModel):
+    id: int
+    name: str
+
+class GateUnitOut(BaseModel):
+    id: int
+    code: str
+
+class GateCheckOut(BaseModel):
+    authorized: bool
+    visitor_id: Optional[int] = None
+    visitor_name: Optional[str] = None
+    id_number: Optional[str] = None
+    allowed_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None  # allowed_at + GATE_PASS_HOURS
+    resident: Optional[GateResidentOut] = None
+    units: List[GateUnitOut] = []
+
 class PaymentIn(BaseModel):
     user_id: int
     unit_id: Optional[int] = None
@@ -89,3 +160,76 @@ class PaymentOut(PaymentIn):
     receipt: Optional[str] = None
     class Config:
         from_attributes = True
+
+# ---------- FACTURACIÓN ----------
+class BillingRunIn(BaseModel):
+    period: Optional[str] = Field(None, pattern=r"^\d{4}-(0[1-9]|1[0-2])$")  # YYYY-MM, por defecto el mes actual
+
+class BillingRunOut(BaseModel):
+    period: str
+    charged: int
+    already_billed: int
+    total: float
+
+class ChargeOut(BaseModel):
+    id: int
+    unit_id: int
+    user_id: Optional[int] = None
+    period: str
+    concept: str
+    area_m2: float
+    amount: float
+    created_at: datetime
+    class Config:
+        from_attributes = True
+
+# ---------- BORRADO EN SEGUNDO PLANO ----------
+class PurgeJobOut(BaseModel):
+    id: int
+    kind: str
+    target_id: int
+    status: str  # pending | running | done | failed
+    processed: int  # filas soltadas, canceladas o borradas hasta ahora
+    result: Optional[str] = None  # deleted | tombstone (si quedan referencias históricas)
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    class Config:
+        from_attributes = True
+
+# ---------- CARGA MASIVA ----------
+class BulkRowError(BaseModel):
+    row: int
+    error: str
+
+class BulkResult(BaseModel):
+    inserted: int
+    errors: List[BulkRowError]
+
+# ---------- PAGINACIÓN ----------
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+# ---------- LOTES (/api/batch) ----------
+class BatchRequest(BaseModel):
+    id: Optional[str] = None  # lo elige el cliente y vuelve en la respuesta
+    method: Literal["GET", "POST", "PUT", "DELETE"] = "GET"
+    path: str = Field(..., pattern=r"^/api/")  # con query string si hace falta
+    body: Optional[Any] = None
+    if_none_match: Optional[str] = None  # ETag de una respuesta anterior (304)
+
+class BatchIn(BaseModel):
+    requests: List[BatchRequest] = Field(..., min_length=1, max_length=20)
+    transaction: bool = False  # todas las escrituras en una sola transacción
+
+class BatchItemOut(BaseModel):
+    id: Optional[str] = None
+    status: int
+    headers: Dict[str, str] = {}
+    body: Optional[Any] = None
+
+class BatchOut(BaseModel):
+    responses: List[BatchItemOut]
+    committed: Optional[bool] = None  # solo con transaction=true
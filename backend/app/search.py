@@ -0,0 +1,78 @@
+"""Búsqueda de texto completo en tickets y visitas (ver migración v0003_search).
+
+SQLite usa FTS5 (`bm25`) y MySQL `MATCH ... AGAINST` en modo booleano. Cada
+palabra de la consulta es obligatoria y se busca por prefijo ("rodr" encuentra
+"Rodríguez", "1032" un documento que empieza así). Los resultados salen por
+relevancia y se paginan con cursor sobre (score, id), como los listados.
+"""
+import re
+from typing import List, NamedTuple, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import Float, and_, bindparam, column, func, literal_column, or_, select, table
+from sqlalchemy.dialects.mysql import match
+
+from . import models, schemas
+from .pagination import decode_cursor, encode_cursor
+
+MAX_TERMS = 8
+
+
+class Target(NamedTuple):
+    model: type
+    fts: str  # tabla FTS5 en SQLite
+    columns: Tuple[str, ...]
+    weights: Tuple[float, ...]  # peso por columna en bm25 (SQLite)
+    schema: type
+
+
+TARGETS = {
+    "tickets": Target(models.MaintenanceTicket, "tickets_fts", ("title", "description"), (5.0, 1.0), schemas.TicketOut),
+    "visitors": Target(models.VisitorLog, "visitors_fts", ("visitor_name", "id_number"), (1.0, 1.0), schemas.VisitorOut),
+}
+
+
+def terms(q: str) -> List[str]:
+    words = re.findall(r"\w+", q.lower())[:MAX_TERMS]
+    if not words:
+        raise HTTPException(status_code=400, detail="Query must contain at least one word")
+    return words
+
+
+def _ranked(dialect: str, target: Target, words: List[str]):
+    """SELECT de las columnas del esquema + `score` (mayor = más relevante)."""
+    model = target.model
+    cols = [getattr(model, n) for n in target.schema.model_fields]
+    if dialect == "mysql":
+        score = match(*(getattr(model, c) for c in target.columns), against=" ".join(f"+{w}*" for w in words))
+        score = score.in_boolean_mode()
+        return select(*cols, score.label("score")).where(score)
+
+    fts = table(target.fts, column("rowid"))
+    name = literal_column(target.fts)  # FTS5 recibe la tabla misma en MATCH y bm25
+    # bm25 es menor cuanto más relevante: se invierte para ordenar igual que en MySQL
+    score = -func.bm25(name, *target.weights)
+    return (
+        select(*cols, score.label("score"))
+        .select_from(model)
+        .join(fts, fts.c.rowid == model.id)
+        .where(name.op("MATCH")(bindparam("fts_query", " AND ".join(f'"{w}"*' for w in words))))
+    )
+
+
+async def search(db, kind: str, q: str, limit: int, after=None) -> dict:
+    target = TARGETS[kind]
+    ranked = _ranked(db.get_bind().dialect.name, target, terms(q)).subquery("ranked")
+    score = ranked.c.score
+    stmt = select(ranked)
+    if after:
+        value, last_id = decode_cursor(after, "score", "desc", literal_column("score", Float))
+        stmt = stmt.where(or_(score < value, and_(score == value, ranked.c.id < last_id)))
+    rows = (await db.execute(stmt.order_by(score.desc(), ranked.c.id.desc()).limit(limit + 1))).mappings().all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor("score", "desc", rows[-1]["score"], rows[-1]["id"])
+    items = [{**row, "score": round(row["score"], 4)} for row in rows]
+    return {"items": items, "next_cursor": next_cursor}
@@ -0,0 +1,69 @@
+"""Secuencias sin colisiones para códigos como los recibos (`RCPT-00000042`).
+
+En MySQL cada proceso reserva un bloque de SEQUENCE_BLOCK valores con un
+UPDATE atómico en una transacción corta y propia (hi/lo) y los reparte desde
+memoria: ningún valor se entrega dos veces, aunque varios workers inserten a
+la vez, y no hay un UPDATE por fila ni un lock retenido durante la petición.
+Un bloque que no se termina de usar deja un hueco, nunca un repetido.
+
+SQLite tiene un solo escritor: ahí el contador se sube dentro de la
+transacción de la petición (una conexión aparte se trabaría con ella) y un
+rollback lo devuelve junto con lo demás.
+"""
+import asyncio
+import os
+from typing import Dict, List
+
+from sqlalchemy import select, update
+
+from . import models
+from .database import current_tenant, tenant_engine
+
+SEQUENCE_BLOCK = int(os.getenv("SEQUENCE_BLOCK", "100"))
+SEQUENCES = ("receipts",)  # filas creadas por la migración v0004_billing
+
+_blocks: Dict[tuple, List[int]] = {}  # (tenant, nombre) -> [siguiente, tope exclusivo]
+_locks: Dict[tuple, asyncio.Lock] = {}
+
+
+async def _bump(conn, name: str, n: int) -> int:
+    """Sube el contador en n y devuelve el primer valor reservado."""
+    S = models.SequenceCounter
+    result = await conn.execute(update(S).where(S.name == name).values(next_value=S.next_value + n))
+    if result.rowcount != 1:
+        raise RuntimeError(f"secuencia {name!r} inexistente: ejecuta `python -m app.migrate`")
+    return (await conn.execute(select(S.next_value).where(S.name == name))).scalar() - n
+
+
+async def next_values(db, name: str, n: int = 1) -> List[int]:
+    """n valores nuevos de la secuencia, en orden."""
+    if n <= 0:
+        return []
+    if db.get_bind().dialect.name == "sqlite":
+        first = await _bump(db, name, n)
+        return list(range(first, first + n))
+
+    tenant = current_tenant.get()
+    key = (tenant, name)
+    values: List[int] = []
+    async with _locks.setdefault(key, asyncio.Lock()):
+        while len(values) < n:
+            block = _blocks.get(key)
+            if block is None or block[0] >= block[1]:
+                size = max(SEQUENCE_BLOCK, n - len(values))
+                async with tenant_engine(tenant).begin() as conn:
+                    first = await _bump(conn, name, size)
+                block = _blocks[key] = [first, first + size]
+            take = min(n - len(values), block[1] - block[0])
+            values.extend(range(block[0], block[0] + take))
+            block[0] += take
+    return values
+
+
+def receipt_code(value: int) -> str:
+    # 8 dígitos: no choca con los recibos viejos (RCPT-<timestamp de 10 dígitos>)
+    return f"RCPT-{value:08d}"
+
+
+async def next_receipts(db, n: int = 1) -> List[str]:
+    return [receipt_code(v) for v in await next_values(db, "receipts", n)]
@@ -0,0 +1,156 @@
+"""Reservas recurrentes: una regla estilo RRULE se expande en el servidor.
+
+Todas las ocurrencias se comparan contra las reservas existentes con una sola
+consulta (`availability.find_conflicts`) y se insertan en una transacción,
+bajo el mismo lock por amenidad que `create_reservation`.
+"""
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import delete, insert, select
+
+from . import availability, events, models, schemas, summaries, versions
+
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+# Tope de ocurrencias por serie (SQLite admite hasta 500 SELECT en un UNION ALL)
+MAX_OCCURRENCES = 200
+
+Span = Tuple[datetime, datetime]
+
+
+def to_rrule(rule: schemas.RecurrenceRule, start_at: datetime) -> str:
+    parts = [f"FREQ={rule.freq.upper()}", f"INTERVAL={rule.interval}"]
+    if rule.freq == "weekly":
+        parts.append("BYDAY=" + ",".join(_weekdays(rule, start_at)))
+    if rule.count:
+        parts.append(f"COUNT={rule.count}")
+    if rule.until:
+        parts.append(f"UNTIL={rule.until.strftime('%Y%m%dT%H%M%S')}")
+    return ";".join(parts)
+
+
+def _weekdays(rule, start_at: datetime) -> List[str]:
+    days = rule.by_weekday or [WEEKDAYS[start_at.weekday()]]
+    return sorted(set(days), key=WEEKDAYS.index)
+
+
+def _candidates(rule, start_at: datetime):
+    """Inicios en orden, sin fin: el corte por count/until lo hace `expand`."""
+    if rule.freq == "daily":
+        step = timedelta(days=rule.interval)
+        current = start_at
+        while True:
+            yield current
+            current += step
+    offsets = [WEEKDAYS.index(d) for d in _weekdays(rule, start_at)]
+    week = start_at - timedelta(days=start_at.weekday())  # lunes de la primera semana
+    while True:
+        for offset in offsets:
+            current = week + timedelta(days=offset)
+            if current >= start_at:
+                yield current
+        week += timedelta(weeks=rule.interval)
+
+
+def expand(rule: schemas.RecurrenceRule, start_at: datetime, end_at: datetime) -> List[Span]:
+    if end_at <= start_at:
+        raise HTTPException(status_code=400, detail="end_at must be after start_at")
+    if (rule.count is None) == (rule.until is None):
+        raise HTTPException(status_code=400, detail="Rule needs exactly one of count or until")
+    if rule.freq == "daily" and rule.by_weekday:
+        raise HTTPException(status_code=400, detail="by_weekday only applies to weekly rules")
+
+    duration = end_at - start_at
+    spans = []
+    for start in _candidates(rule, start_at):
+        if rule.until is not None and start > rule.until:
+            break
+        if len(spans) == rule.count or len(spans) > MAX_OCCURRENCES:
+            break
+        spans.append((start, start + duration))
+    if len(spans) > MAX_OCCURRENCES:
+        raise HTTPException(status_code=400, detail=f"Too many occurrences (max {MAX_OCCURRENCES})")
+    # Una ocurrencia más larga que la separación entre inicios se pisaría con la siguiente
+    if any(a[1] > b[0] for a, b in zip(spans, spans[1:])):
+        raise HTTPException(status_code=400, detail="Occurrences overlap each other")
+    return spans
+
+
+async def create_series(db, series_in: schemas.ReservationSeriesIn) -> dict:
+    spans = expand(series_in.rule, series_in.start_at, series_in.end_at)
+    rule = to_rrule(series_in.rule, series_in.start_at)
+
+    async with availability.booking_lock(db, series_in.amenity_id) as exists:
+        if not exists:
+            raise HTTPException(status_code=404, detail="Amenidad no encontrada")
+        clashing = await availability.find_conflicts(db, series_in.amenity_id, spans)
+        conflicts = [spans[i] for i in sorted(clashing)]
+        if conflicts and series_in.mode == "all_or_nothing":
+            await db.rollback()
+            raise HTTPException(
+                status_code=409,
+                detail={
+                    "error": "Time slots not available",
+                    "conflicts": [{"start_at": s.isoformat(), "end_at": e.isoformat()} for s, e in conflicts],
+                },
+            )
+        free = [span for i, span in enumerate(spans) if i not in clashing]
+        if not free:
+            await db.rollback()
+            raise HTTPException(status_code=409, detail="No occurrence is available")
+
+        series = models.ReservationSeries(amenity_id=series_in.amenity_id, user_id=series_in.user_id, rule=rule)
+        db.add(series)
+        await db.flush()
+        # Un executemany para todas las ocurrencias y una lectura para tener los ids
+        # (MySQL no tiene RETURNING: el ORM insertaría fila por fila)
+        R = models.Reservation
+        await db.execute(
+            insert(R),
+            [
+                {
+                    "amenity_id": series_in.amenity_id,
+                    "user_id": series_in.user_id,
+                    "start_at": s,
+                    "end_at": e,
+                    "status": "pending",
+                    "created_at": series.created_at,
+                    "series_id": series.id,
+                }
+                for s, e in free
+            ],
+        )
+        created = (
+            await db.execute(select(R).where(R.series_id == series.id).order_by(R.start_at))
+        ).scalars().all()
+        for r in created:
+            events.emit(db, "reservations", "created", r, r.user_id)
+        await summaries.reservations_added(db, series_in.amenity_id, free)
+        await versions.bump(db, "reservations")
+        await db.commit()
+
+    return {
+        "id": series.id,
+        "rule": rule,
+        "created": created,
+        "conflicts": [{"start_at": s, "end_at": e} for s, e in conflicts],
+    }
+
+
+async def cancel_series(db, series: models.ReservationSeries, since: datetime) -> int:
+    """Borra las ocurrencias que empiezan desde `since`; las pasadas quedan como historial."""
+    R = models.Reservation
+    rows = (
+        await db.execute(select(R).where(R.series_id == series.id, R.start_at >= since))
+    ).scalars().all()
+    for r in rows:
+        events.emit(db, "reservations", "deleted", r, r.user_id)
+    await db.execute(delete(R).where(R.id.in_([r.id for r in rows])))
+    active = [(r.start_at, r.end_at) for r in rows if r.status != "cancelled"]
+    await summaries.reservations_added(db, series.amenity_id, active, sign=-1)
+    removed = len(rows)
+    if removed:
+        await versions.bump(db, "reservations")
+    await db.commit()
+    return removed
@@ -0,0 +1,280 @@
+"""Tablas de resumen para el dashboard.
+
+Cada ruta de escritura llama a estas funciones dentro de su propia transacción,
+así los resúmenes nunca quedan desfasados del dato base. `rebuild` los
+recalcula desde cero (datos previos a esta versión o después de una corrección
+manual): `python -m app.summaries rebuild`.
+"""
+import asyncio
+import sys
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import delete, func, insert, select
+
+from . import models
+from .database import upsert_increment, upsert_increment_many
+
+NO_UNIT = 0  # clave de los pagos sin unidad en payment_monthly_summary
+
+TICKET_AGE_BUCKETS = ((7, "0-7d"), (30, "8-30d"), (90, "31-90d"))
+TICKET_AGE_OLDEST = ">90d"
+
+
+def _month(dt: datetime) -> str:
+    return dt.strftime("%Y-%m")
+
+
+# -------------------- escrituras --------------------
+async def payment_added(db, user_id: int, unit_id: Optional[int], amount: float, paid_at: datetime, sign: int = 1):
+    await upsert_increment(
+        db,
+        models.PaymentMonthlySummary,
+        {"unit_id": unit_id or NO_UNIT, "month": _month(paid_at)},
+        total=sign * amount,
+        count=sign,
+    )
+    await upsert_increment(db, models.OwnerBalance, {"user_id": user_id}, paid=sign * amount, payments=sign)
+
+
+async def payments_added(db, rows: Iterable[dict]):
+    """Versión agregada para cargas masivas: un upsert por grupo, no por fila."""
+    by_month, by_owner = defaultdict(lambda: [0.0, 0]), defaultdict(lambda: [0.0, 0])
+    for r in rows:
+        m = by_month[(r["unit_id"] or NO_UNIT, _month(r["paid_at"]))]
+        m[0] += r["amount"]
+        m[1] += 1
+        o = by_owner[r["user_id"]]
+        o[0] += r["amount"]
+        o[1] += 1
+    for (unit_id, month), (total, count) in by_month.items():
+        await upsert_increment(db, models.PaymentMonthlySummary, {"unit_id": unit_id, "month": month}, total=total, count=count)
+    for user_id, (paid, count) in by_owner.items():
+        await upsert_increment(db, models.OwnerBalance, {"user_id": user_id}, paid=paid, payments=count)
+
+
+async def charges_added(db, rows: Iterable[dict]):
+    """Expensas generadas por la facturación: suben `charged` de cada dueño."""
+    by_owner = defaultdict(float)
+    for r in rows:
+        if r["user_id"] is not None:  # unidad sin dueño: el cargo queda solo en la unidad
+            by_owner[r["user_id"]] += r["amount"]
+    await upsert_increment_many(
+        db, models.OwnerBalance, ["user_id"], [{"user_id": k, "charged": v} for k, v in by_owner.items()]
+    )
+
+
+async def unit_detached(db, unit_id: int):
+    """Los pagos de la unidad pasan a 'sin unidad'."""
+    S = models.PaymentMonthlySummary
+    rows = (await db.execute(select(S.month, S.total, S.count).where(S.unit_id == unit_id))).all()
+    for month, total, count in rows:
+        await upsert_increment(db, S, {"unit_id": NO_UNIT, "month": month}, total=total, count=count)
+    await db.execute(delete(S).where(S.unit_id == unit_id))
+
+
+async def ticket_added(db, status: str, created_at: datetime, sign: int = 1):
+    await upsert_increment(
+        db,
+        models.TicketStatusDaily,
+        {"status": status or "open", "day": created_at.date()},
+        count=sign,
+    )
+
+
+async def reservation_added(db, amenity_id: int, start_at: datetime, end_at: datetime, sign: int = 1):
+    minutes = (end_at - start_at).total_seconds() / 60
+    await upsert_increment(
+        db,
+        models.AmenityUsageDaily,
+        {"amenity_id": amenity_id, "day": start_at.date()},
+        reservations=sign,
+        booked_minutes=sign * minutes,
+    )
+
+
+async def reservations_added(db, amenity_id: int, spans, sign: int = 1):
+    """Versión agregada para series: un solo upsert con una fila por día."""
+    by_day = defaultdict(lambda: [0, 0.0])
+    for start_at, end_at in spans:
+        d = by_day[start_at.date()]
+        d[0] += sign
+        d[1] += sign * (end_at - start_at).total_seconds() / 60
+    await upsert_increment_many(
+        db,
+        models.AmenityUsageDaily,
+        ["amenity_id", "day"],
+        [{"amenity_id": amenity_id, "day": day, "reservations": n, "booked_minutes": m} for day, (n, m) in by_day.items()],
+    )
+
+
+# -------------------- lecturas --------------------
+async def payments_by_unit_month(db, unit_id=None, month_from=None, month_to=None):
+    S = models.PaymentMonthlySummary
+    stmt = select(S).where(S.count != 0).order_by(S.month, S.unit_id)
+    if unit_id is not None:
+        stmt = stmt.where(S.unit_id == unit_id)
+    if month_from:
+        stmt = stmt.where(S.month >= month_from)
+    if month_to:
+        stmt = stmt.where(S.month <= month_to)
+    return [
+        {"unit_id": r.unit_id or None, "month": r.month, "total": round(r.total, 2), "count": r.count}
+        for r in (await db.execute(stmt)).scalars()
+    ]
+
+
+async def payments_by_month(db, month_from=None, month_to=None):
+    """Como payments_by_unit_month sumando todas las unidades: una fila por mes."""
+    S = models.PaymentMonthlySummary
+    stmt = select(S.month, func.sum(S.total), func.sum(S.count)).group_by(S.month).order_by(S.month)
+    if month_from:
+        stmt = stmt.where(S.month >= month_from)
+    if month_to:
+        stmt = stmt.where(S.month <= month_to)
+    return [
+        {"month": month, "total": round(total or 0.0, 2), "count": int(count or 0)}
+        for month, total, count in (await db.execute(stmt)).all()
+        if count
+    ]
+
+
+async def owner_balances(db, limit: int = 100):
+    B, U = models.OwnerBalance, models.User
+    outstanding = B.charged - B.paid
+    stmt = (
+        select(B, U.name)
+        .join(U, U.id == B.user_id, isouter=True)
+        .order_by(outstanding.desc(), B.user_id)
+        .limit(limit)
+    )
+    return [
+        {
+            "user_id": b.user_id,
+            "name": name,
+            "paid": round(b.paid, 2),
+            "charged": round(b.charged, 2),
+            "outstanding": round(b.charged - b.paid, 2),
+            "payments": b.payments,
+        }
+        for b, name in (await db.execute(stmt)).all()
+    ]
+
+
+def _age_bucket(days: int) -> str:
+    for limit, label in TICKET_AGE_BUCKETS:
+        if days <= limit:
+            return label
+    return TICKET_AGE_OLDEST
+
+
+async def tickets_overview(db, today: Optional[date] = None):
+    today = today or datetime.utcnow().date()
+    S = models.TicketStatusDaily
+    by_status, by_age = defaultdict(int), defaultdict(lambda: defaultdict(int))
+    for status, day, count in (await db.execute(select(S.status, S.day, S.count))).all():
+        by_status[status] += count
+        by_age[status][_age_bucket((today - day).days)] += count
+    return {
+        "by_status": {k: v for k, v in by_status.items() if v},
+        "by_age": {k: {b: n for b, n in v.items() if n} for k, v in by_age.items() if by_status[k]},
+    }
+
+
+async def amenity_utilization(db, day_from: date, day_to: date):
+    """Minutos reservados / minutos del rango, por amenidad (day_to exclusivo)."""
+    S, A = models.AmenityUsageDaily, models.Amenity
+    window = max((day_to - day_from).days, 1) * 24 * 60
+    totals = defaultdict(lambda: [0, 0.0])
+    rows = await db.execute(
+        select(S.amenity_id, S.reservations, S.booked_minutes).where(
+            S.day >= day_from, S.day < day_to
+        )
+    )
+    for amenity_id, reservations, minutes in rows.all():
+        totals[amenity_id][0] += reservations
+        totals[amenity_id][1] += minutes
+    names = dict((await db.execute(select(A.id, A.name).where(A.deleted_at.is_(None)))).all())
+    return [
+        {
+            "amenity_id": amenity_id,
+            "name": name,
+            "reservations": totals[amenity_id][0],
+            "booked_minutes": round(totals[amenity_id][1], 1),
+            "utilization": round(totals[amenity_id][1] / window, 4),
+        }
+        for amenity_id, name in sorted(names.items())
+    ]
+
+
+# -------------------- reconstrucción --------------------
+async def rebuild(db):
+    """Recalcula todos los resúmenes desde las tablas base (lectura en bloques)."""
+    months, owners = defaultdict(lambda: [0.0, 0]), defaultdict(lambda: [0.0, 0.0, 0])
+    P = models.Payment
+    result = await db.stream(select(P.user_id, P.unit_id, P.amount, P.paid_at).execution_options(yield_per=5000))
+    async for user_id, unit_id, amount, paid_at in result:
+        m = months[(unit_id or NO_UNIT, _month(paid_at or datetime.utcnow()))]
+        m[0] += amount
+        m[1] += 1
+        o = owners[user_id]
+        o[0] += amount
+        o[2] += 1
+
+    tickets = defaultdict(int)
+    T = models.MaintenanceTicket
+    result = await db.stream(select(T.status, T.created_at).execution_options(yield_per=5000))
+    async for status, created_at in result:
+        tickets[(status or "open", (created_at or datetime.utcnow()).date())] += 1
+
+    usage = defaultdict(lambda: [0, 0.0])
+    R = models.Reservation
+    result = await db.stream(
+        select(R.amenity_id, R.start_at, R.end_at).where(R.status != "cancelled").execution_options(yield_per=5000)
+    )
+    async for amenity_id, start_at, end_at in result:
+        u = usage[(amenity_id, start_at.date())]
+        u[0] += 1
+        u[1] += (end_at - start_at).total_seconds() / 60
+
+    C = models.Charge
+    result = await db.execute(
+        select(C.user_id, func.sum(C.amount)).where(C.user_id.is_not(None)).group_by(C.user_id)
+    )
+    for user_id, charged in result.all():
+        owners[user_id][1] = charged
+
+    for model in (models.PaymentMonthlySummary, models.OwnerBalance, models.TicketStatusDaily, models.AmenityUsageDaily):
+        await db.execute(delete(model))
+    batches = [
+        (models.PaymentMonthlySummary, [{"unit_id": k[0], "month": k[1], "total": v[0], "count": v[1]} for k, v in months.items()]),
+        (models.OwnerBalance, [{"user_id": k, "paid": v[0], "charged": v[1], "payments": v[2]} for k, v in owners.items()]),
+        (models.TicketStatusDaily, [{"status": k[0], "day": k[1], "count": v} for k, v in tickets.items()]),
+        (models.AmenityUsageDaily, [{"amenity_id": k[0], "day": k[1], "reservations": v[0], "booked_minutes": v[1]} for k, v in usage.items()]),
+    ]
+    for model, values in batches:
+        for i in range(0, len(values), 1000):
+            await db.execute(insert(model), values[i : i + 1000])
+    await db.commit()
+    return {model.__tablename__: len(values) for model, values in batches}
+
+
+async def _main(argv):
+    from .database import TENANTS, dispose_engine, session_factory
+
+    if argv[1:2] != ["rebuild"]:
+        print("uso: python -m app.summaries rebuild [--tenant SLUG]")
+        return 2
+    tenants = [argv[argv.index("--tenant") + 1]] if "--tenant" in argv else list(TENANTS)
+    try:
+        for tenant in tenants:
+            async with session_factory(tenant)() as db:
+                print(tenant, await rebuild(db))
+    finally:
+        await dispose_engine()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv)))
@@ -0,0 +1,72 @@
+"""Resolución del condominio (tenant) de cada petición.
+
+Con token, el tenant es el claim `tid` del JWT. Sin token (login, registro),
+sale del header `X-Tenant` o de `?tenant=`, y si no viene se usa
+DEFAULT_TENANT. El middleware solo lee los claims para elegir la base (y, con
+`sub`, primario o réplica); la firma y que `tid` coincida los verifica
+`auth.principal_from_token`.
+"""
+import json
+from typing import Optional, Tuple
+from urllib.parse import parse_qs
+
+from jose import JWTError, jwt
+
+from .database import DEFAULT_TENANT, TENANTS, current_subject, current_tenant
+
+
+def _token(scope) -> Optional[str]:
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                return token
+    # EventSource no envía headers: ?token=
+    return parse_qs(scope.get("query_string", b"").decode()).get("token", [None])[0]
+
+
+def resolve(scope) -> Tuple[str, Optional[str]]:
+    """(tenant, sub del token o None)."""
+    token = _token(scope)
+    if token:
+        try:
+            claims = jwt.get_unverified_claims(token)
+            return claims.get("tid", DEFAULT_TENANT), claims.get("sub")
+        except JWTError:
+            pass  # token inválido: lo rechaza auth con 401
+    for name, value in scope["headers"]:
+        if name == b"x-tenant":
+            return value.decode("latin-1").strip(), None
+    query = parse_qs(scope.get("query_string", b"").decode())
+    return query.get("tenant", [DEFAULT_TENANT])[0], None
+
+
+class TenantMiddleware:
+    """ASGI puro: fija `current_tenant` para toda la petición (dependencias, streaming)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        # Solo la API depende del tenant (no el frontend estático, /docs ni /metrics)
+        if scope["type"] != "http" or not scope["path"].startswith("/api/"):
+            return await self.app(scope, receive, send)
+
+        tenant, subject = resolve(scope)
+        if tenant not in TENANTS:
+            body = json.dumps({"detail": f"Unknown tenant: {tenant}"}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 404,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        tenant_token = current_tenant.set(tenant)
+        subject_token = current_subject.set(subject)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_subject.reset(subject_token)
+            current_tenant.reset(tenant_token)
@@ -0,0 +1,46 @@
+import hashlib
+from typing import Optional
+
+from fastapi import Request, Response
+from sqlalchemy import select
+
+from . import models
+from .database import upsert_increment
+
+# El contenido depende del token: solo caché del navegador, siempre revalidando
+CACHE_CONTROL = "private, no-cache"
+
+
+async def bump(db, *tables: str):
+    """Sube la versión de cada tabla; llamar antes del commit de la escritura."""
+    for table in tables:
+        await upsert_increment(db, models.TableVersion, {"table_name": table}, version=1)
+
+
+async def _current(db, tables) -> str:
+    V = models.TableVersion
+    rows = dict(
+        (await db.execute(select(V.table_name, V.version).where(V.table_name.in_(tables)))).all()
+    )
+    return "-".join(f"{t}.{rows.get(t, 0)}" for t in tables)
+
+
+async def conditional(
+    request: Request, response: Response, db, *tables: str
+) -> Optional[Response]:
+    """ETag a partir de las versiones de `tables`, la URL (filtros, cursor) y el token.
+
+    Si coincide con If-None-Match devuelve un 304 listo para retornar, sin
+    haber leído ni serializado filas; si no, deja los headers en `response`.
+    """
+    # El token entra en la clave: un residente y un admin ven listas distintas
+    auth = request.headers.get("authorization", "")
+    key = f"{await _current(db, tables)}|{request.url.path}?{request.url.query}|{auth}"
+    etag = 'W/"' + hashlib.sha1(key.encode()).hexdigest()[:20] + '"'
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Authorization"}
+
+    inm = request.headers.get("if-none-match", "")
+    if etag in (tag.strip() for tag in inm.split(",")) or inm.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
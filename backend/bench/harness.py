@@ -0,0 +1,335 @@
+"""Recorre las rutas principales y reporta latencias, throughput y RSS en JSON.
+
+    python -m bench.seed --reset --scale 0.1
+    python -m bench.harness --spawn --out bench/results/actual.json
+    python -m bench.harness --spawn --baseline bench/results/base.json
+
+Con --spawn levanta su propio uvicorn (mismo DATABASE_URL) y mide el arranque
+en frío (hasta la primera respuesta) y el pico de RSS del proceso; sin él,
+apunta a --url (y --pid si se quiere el RSS).
+Con --baseline compara contra una corrida guardada y sale con código 1 si
+algún escenario empeora más que --tolerance.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import httpx
+
+from .seed import ADMIN_EMAIL, FIRST_NAMES, LAST_NAMES, PASSWORD, TICKET_TITLES
+from .throughput import measure
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+
+# -------------------- escenarios --------------------
+class Context:
+    def __init__(self, client, headers, users, units, amenities, rng):
+        self.client = client
+        self.headers = headers  # admin
+        self.users = users  # (min_id, max_id) de usuarios existentes
+        self.units = units
+        self.amenities = amenities
+        self.rng = rng
+
+    def user_id(self):
+        return self.rng.randint(*self.users)
+
+    def get(self, path, **params):
+        return self.client.get(path, params=params, headers=self.headers)
+
+
+def _list(path, filter_key=None):
+    # Mitad primera página sin filtros, mitad filtrada por un usuario al azar
+    async def scenario(ctx):
+        def call():
+            if filter_key and ctx.rng.random() < 0.5:
+                return ctx.get(path, limit=50, **{filter_key: ctx.user_id()})
+            return ctx.get(path, limit=50)
+        return call, ()
+    return scenario
+
+
+def _get(path):
+    async def scenario(ctx):
+        return (lambda: ctx.get(path)), ()
+    return scenario
+
+
+async def login(ctx):
+    def call():
+        i = ctx.user_id()
+        email = ADMIN_EMAIL if i == 1 else f"user{i}@bench.example.com"
+        return ctx.client.post("/api/auth/login", json={"email": email, "password": PASSWORD})
+    # 503 = pool de hash lleno (control de admisión), 401 = usuario inactivo del seed
+    return call, (503, 401)
+
+
+async def availability(ctx):
+    start = datetime.utcnow().replace(microsecond=0, second=0, minute=0)
+
+    def call():
+        return ctx.get(
+            f"/api/amenities/{ctx.rng.choice(ctx.amenities)}/availability",
+            **{"from": start.isoformat(), "to": (start + timedelta(days=7)).isoformat(), "duration": 60},
+        )
+    return call, ()
+
+
+async def search(ctx):
+    # Palabras del vocabulario de bench.seed: prefijos de nombres y títulos de tickets
+    words = [w[:4] for w in LAST_NAMES + FIRST_NAMES]
+
+    def call():
+        if ctx.rng.random() < 0.5:
+            return ctx.get("/api/search", q=ctx.rng.choice(TICKET_TITLES), type="tickets")
+        return ctx.get("/api/search", q=ctx.rng.choice(words), type="visitors")
+    return call, ()
+
+
+async def batch(ctx):
+    # Lo que pide la página de unidades, en un solo viaje (comparar con list_units + list_users)
+    body = {"requests": [{"path": "/api/units?limit=50"}, {"path": "/api/users?limit=50"}, {"path": "/api/auth/me"}]}
+
+    def call():
+        return ctx.client.post("/api/batch", json=body, headers=ctx.headers)
+    return call, ()
+
+
+async def create_reservation(ctx):
+    # Todas las tareas compiten por 48 h de una sola amenidad: la mayoría choca (400)
+    base = datetime(2100, 1, 1) + timedelta(days=ctx.rng.randint(0, 300) * 2)
+    amenity = ctx.amenities[0]
+
+    def call():
+        start = base + timedelta(minutes=30 * ctx.rng.randint(0, 95))
+        body = {
+            "amenity_id": amenity,
+            "user_id": ctx.user_id(),
+            "start_at": start.isoformat(),
+            "end_at": (start + timedelta(hours=1)).isoformat(),
+        }
+        return ctx.client.post("/api/reservations", json=body, headers=ctx.headers)
+    return call, (400,)
+
+
+async def gate_check(ctx, count=200):
+    # Hora pico en portería: documentos autorizados (consultados varias veces) y alguno desconocido
+    tag = f"GATE-{int(time.time())}-{ctx.rng.randint(0, 9999)}"
+    for i in range(count):
+        body = {"resident_id": ctx.user_id(), "visitor_name": "Bench Gate", "id_number": f"{tag}-{i}"}
+        (await ctx.client.post("/api/visitors", json=body, headers=ctx.headers)).raise_for_status()
+
+    def call():
+        i = ctx.rng.randint(0, count - 1) if ctx.rng.random() < 0.9 else f"X{ctx.rng.randint(0, 10**6)}"
+        return ctx.get("/api/visitors/check", id_number=f"{tag}-{i}")
+    return call, ()
+
+
+async def delete_unit_detach(ctx, count=500):
+    # Preparación (no medida): unidades nuevas con un pago cada una
+    tag = f"BENCH-DEL-{int(time.time())}-{ctx.rng.randint(0, 9999)}"
+    rows = [{"code": f"{tag}-{i}"} for i in range(count)]
+    r = await ctx.client.post("/api/units/bulk", json=rows, headers=ctx.headers)
+    r.raise_for_status()
+    ids, after = [], None
+    while len(ids) < count:
+        params = {"sort": "id", "order": "desc", "limit": 500}
+        if after:
+            params["after"] = after
+        page = (await ctx.get("/api/units", **params)).json()
+        ids += [u["id"] for u in page["items"] if u["code"].startswith(tag)]
+        after = page["next_cursor"]
+        if not after:
+            break
+    payments = [{"user_id": 1, "unit_id": i, "amount": 1.0} for i in ids]
+    (await ctx.client.post("/api/payments/bulk", json=payments, headers=ctx.headers)).raise_for_status()
+
+    async def call():
+        if not ids:
+            return None
+        return await ctx.client.delete(f"/api/units/{ids.pop()}", params={"detach": "true"}, headers=ctx.headers)
+    return call, ()
+
+
+SCENARIOS = {
+    "login": login,
+    "me": _get("/api/auth/me"),
+    "list_users": _list("/api/users"),
+    "list_units": _list("/api/units", "owner_id"),
+    "list_amenities": _get("/api/amenities"),
+    "availability": availability,
+    "list_reservations": _list("/api/reservations", "user_id"),
+    "list_tickets": _list("/api/tickets", "user_id"),
+    "list_visitors": _list("/api/visitors", "resident_id"),
+    "gate_check": gate_check,
+    "list_payments": _list("/api/payments", "user_id"),
+    "search": search,
+    "batch": batch,
+    "create_reservation": create_reservation,
+    "delete_unit_detach": delete_unit_detach,
+}
+
+
+# -------------------- servidor y memoria --------------------
+def read_rss_kb(pid):
+    """(actual, pico) en KiB desde /proc (solo Linux)."""
+    values = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    key, value = line.split(":")
+                    values[key] = int(value.split()[0])
+    except OSError:
+        return None, None
+    return values.get("VmRSS"), values.get("VmHWM")
+
+
+def spawn_server(port):
+    """(proceso, ms hasta la primera respuesta): el arranque en frío de un worker."""
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=os.environ.copy(),
+        stdout=sys.stderr,  # los print del servidor no se mezclan con el JSON
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/docs", timeout=1)
+            return proc, round((time.perf_counter() - started) * 1000)
+        except httpx.HTTPError:
+            if proc.poll() is not None:
+                raise SystemExit("uvicorn terminó al arrancar")
+            time.sleep(0.05)
+    proc.terminate()
+    raise SystemExit("uvicorn no respondió en 60 s")
+
+
+def _git_rev():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# -------------------- corrida --------------------
+async def _range(client, headers, path, key):
+    first = (await client.get(path, params={"limit": 1}, headers=headers)).json()["items"]
+    last = (await client.get(path, params={"limit": 1, "order": "desc"}, headers=headers)).json()["items"]
+    return (first[0][key], last[0][key]) if first else (1, 1)
+
+
+async def run(args, pid=None):
+    limits = httpx.Limits(max_connections=args.concurrency)
+    rng = random.Random(args.seed)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60) as client:
+        r = await client.post("/api/auth/login", json={"email": args.email, "password": args.password})
+        r.raise_for_status()
+        headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+        users = await _range(client, headers, "/api/users", "id")
+        units = await _range(client, headers, "/api/units", "id")
+        amenities = [a["id"] for a in (await client.get("/api/amenities", headers=headers)).json()]
+        if not amenities:
+            amenities = [(await client.post("/api/amenities", json={"name": "Bench"}, headers=headers)).json()["id"]]
+        ctx = Context(client, headers, users, units, amenities, rng)
+
+        results, rss_peak = {}, 0
+        for name in args.scenario or SCENARIOS:
+            call, accepted = await SCENARIOS[name](ctx)
+            results[name] = await measure(call, args.concurrency, args.duration, accepted)
+            if pid:
+                _, hwm = read_rss_kb(pid)
+                results[name]["rss_peak_mb"] = round((hwm or 0) / 1024, 1)
+                rss_peak = max(rss_peak, hwm or 0)
+            print(f"{name}: {results[name]['rps']} rps, p95 {results[name]['p95_ms']} ms", file=sys.stderr)
+
+    return {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+            "git": _git_rev(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "database": os.getenv("DATABASE_URL", "").split("@")[-1],
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "seed": args.seed,
+        },
+        "peak_rss_mb": round(rss_peak / 1024, 1) if pid else None,
+        "scenarios": results,
+    }
+
+
+def compare(current, baseline, tolerance):
+    """Por escenario: cambio relativo de p95 y rps; `regression` si excede la tolerancia."""
+    report = {}
+    for name, cur in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        p95 = (cur["p95_ms"] - base["p95_ms"]) / base["p95_ms"] if base["p95_ms"] else 0.0
+        rps = (cur["rps"] - base["rps"]) / base["rps"] if base["rps"] else 0.0
+        report[name] = {
+            "p95_change": round(p95, 3),
+            "rps_change": round(rps, 3),
+            "regression": p95 > tolerance or rps < -tolerance,
+        }
+    if current.get("peak_rss_mb") and baseline.get("peak_rss_mb"):
+        change = (current["peak_rss_mb"] - baseline["peak_rss_mb"]) / baseline["peak_rss_mb"]
+        report["peak_rss"] = {"change": round(change, 3), "regression": change > tolerance}
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--spawn", action="store_true", help="levanta uvicorn en --port y mide su RSS")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--pid", type=int, help="pid del servidor externo, para leer su RSS")
+    parser.add_argument("--email", default=ADMIN_EMAIL)
+    parser.add_argument("--password", default=PASSWORD)
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="repetible; por defecto todos")
+    parser.add_argument("-c", "--concurrency", type=int, default=32)
+    parser.add_argument("-d", "--duration", type=float, default=10.0, help="segundos por escenario")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", type=Path, help="guarda el resultado (JSON)")
+    parser.add_argument("--baseline", type=Path, help="resultado previo contra el que comparar")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="empeoramiento relativo permitido")
+    args = parser.parse_args(argv)
+
+    proc = cold_start_ms = None
+    if args.spawn:
+        proc, cold_start_ms = spawn_server(args.port)
+        args.url = f"http://127.0.0.1:{args.port}"
+    try:
+        result = asyncio.run(run(args, pid=proc.pid if proc else args.pid))
+        result["cold_start_ms"] = cold_start_ms
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    status = 0
+    if args.baseline:
+        result["comparison"] = compare(result, json.loads(args.baseline.read_text()), args.tolerance)
+        if any(c["regression"] for c in result["comparison"].values()):
+            status = 1
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(json.dumps(result, indent=2))
+    print(json.dumps(result, indent=2))
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""Costo de serializar una página grande: ORM + response_model vs. columnas + orjson.
+
+    python -m bench.serialization --rows 10000 --rows 100000
+
+Usa una base SQLite temporal (no toca DATABASE_URL). "orm" reproduce lo que
+hacía FastAPI con response_model: instancias ORM, validación con
+from_attributes, dump a tipos JSON y json.dumps. "columns" es el camino actual
+de `paginate` + `page_response`; "sparse" agrega ?fields=id,amount,paid_at.
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from pydantic import TypeAdapter
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app import models, schemas
+from app.database import Base
+from app.pagination import PageParams, dumps, paginate
+
+SPARSE = "id,amount,paid_at"
+
+
+async def _fill(session_factory, rows):
+    rng = random.Random(1)
+    now = datetime(2025, 1, 1)
+    async with session_factory() as db:
+        await db.execute(insert(models.User), [{"id": 1, "name": "x", "email": "x@example.com", "hashed_password": "-"}])
+        batch = []
+        for i in range(rows):
+            paid_at = now - timedelta(minutes=i)
+            batch.append({
+                "user_id": 1,
+                "unit_id": None,
+                "amount": round(rng.uniform(80, 450), 2),
+                "method": "card",
+                "paid_at": paid_at,
+                "receipt": f"RCPT-{int(paid_at.timestamp())}",
+            })
+            if len(batch) == 5000:
+                await db.execute(insert(models.Payment), batch)
+                batch = []
+        if batch:
+            await db.execute(insert(models.Payment), batch)
+        await db.commit()
+
+
+async def _orm(db, page):
+    P = models.Payment
+    items = (await db.execute(select(P).order_by(P.id).limit(page.limit + 1))).scalars().all()
+    adapter = TypeAdapter(schemas.Page[schemas.PaymentOut])
+    value = adapter.validate_python({"items": items[: page.limit], "next_cursor": None})
+    return json.dumps(adapter.dump_python(value, mode="json")).encode()
+
+
+async def _columns(db, page, fields=None):
+    P = models.Payment
+    result = await paginate(db, select(P), P, {"id": P.id}, page, schemas.PaymentOut, fields)
+    return dumps(result)
+
+
+async def _time(session_factory, fn, repeat):
+    times, size = [], 0
+    for _ in range(repeat):
+        # Sesión nueva por vuelta: el identity map no se reutiliza entre corridas
+        async with session_factory() as db:
+            t0 = time.perf_counter()
+            body = await fn(db)
+            times.append((time.perf_counter() - t0) * 1000)
+            size = len(body)
+    return {"ms": round(statistics.median(times), 1), "bytes": size}
+
+
+async def run(rows_list, repeat):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{Path(tmp) / 'ser.db'}")
+        session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await _fill(session_factory, max(rows_list))
+
+        for rows in rows_list:
+            page = PageParams(sort="id", order="asc", limit=rows, after=None)
+            orm = await _time(session_factory, lambda db: _orm(db, page), repeat)
+            columns = await _time(session_factory, lambda db: _columns(db, page), repeat)
+            sparse = await _time(session_factory, lambda db: _columns(db, page, SPARSE), repeat)
+            results.append({
+                "rows": rows,
+                "orm": orm,
+                "columns": columns,
+                "sparse": sparse,
+                "speedup": round(orm["ms"] / columns["ms"], 2),
+                "speedup_sparse": round(orm["ms"] / sparse["ms"], 2),
+            })
+        await engine.dispose()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, action="append", help="repetible (por defecto 10000 y 100000)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(run(args.rows or [10_000, 100_000], args.repeat)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
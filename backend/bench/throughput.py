@@ -0,0 +1,95 @@
+"""Throughput de la API bajo concurrencia.
+
+    python -m bench.throughput --url http://127.0.0.1:8000 \
+        --email admin@village.local --password secret \
+        --path /api/auth/me --path "/api/payments?limit=50" -c 64 -d 15
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, round(pct / 100 * (len(values) - 1))))
+    return values[k]
+
+
+async def measure(call, concurrency, duration, accepted=()):
+    """Llama `call()` (devuelve un httpx.Response) desde `concurrency` tareas durante `duration` s.
+
+    Los códigos de `accepted` (p. ej. 400 por choque de reservas) no cuentan como
+    error. Si `call()` devuelve None la tarea termina (escenarios con datos finitos).
+    """
+    latencies, errors, rejected = [], 0, 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors, rejected
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            try:
+                response = await call()
+                if response is None:
+                    return
+                status = response.status_code
+            except httpx.HTTPError:
+                status = 0
+            latencies.append((time.perf_counter() - t0) * 1000)
+            if status in accepted:
+                rejected += 1
+            elif not 0 < status < 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "rejected": rejected,
+        "rps": round(len(latencies) / elapsed, 1),
+        "mean_ms": round(statistics.fmean(latencies), 2) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
+
+
+async def run_path(client, path, headers, concurrency, duration):
+    result = await measure(lambda: client.get(path, headers=headers), concurrency, duration)
+    return {"path": path, **result}
+
+
+async def main(args):
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60) as client:
+        r = await client.post(
+            "/api/auth/login", json={"email": args.email, "password": args.password}
+        )
+        r.raise_for_status()
+        headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+        results = []
+        for path in args.path:
+            results.append(
+                await run_path(client, path, headers, args.concurrency, args.duration)
+            )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--path", action="append", required=True)
+    parser.add_argument("-c", "--concurrency", type=int, default=64)
+    parser.add_argument("-d", "--duration", type=float, default=15.0)
+    asyncio.run(main(parser.parse_args()))
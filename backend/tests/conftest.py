@@ -0,0 +1,57 @@
+"""Fixtures comunes: una base con los datos de bench.seed y un cliente logueado como admin.
+
+Las variables de entorno se fijan antes de importar la app (database lee
+DATABASE_URL al importar). Por defecto es un SQLite temporal; con
+TEST_DATABASE_URL se usa otra base (p. ej. MySQL), que se vacía y se recarga.
+"""
+import asyncio
+import os
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="village-tests-")
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL", f"sqlite+aiosqlite:///{_tmp}/test.db")
+os.environ["VISITOR_RETENTION_DAYS"] = "0"
+os.environ["ARCHIVE_DIR"] = os.path.join(_tmp, "archive")
+os.environ["PURGE_PAUSE"] = "0"
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import database
+from bench import seed as bench_seed
+
+SCALE = 0.01  # 10 000 visitas y 10 000 pagos: suficiente para que el planificador use los índices
+
+
+@pytest.fixture(scope="session", autouse=True)
+def seeded():
+    vol = {table: max(1, int(n * SCALE)) for table, n in bench_seed.VOLUMES.items()}
+    asyncio.run(bench_seed.seed(vol, 42, reset=True))
+
+
+def _run(coro_fn):
+    """Corre `coro_fn()` en un loop propio y suelta el pool al final (no queda atado a ese loop)."""
+
+    async def main():
+        try:
+            return await coro_fn()
+        finally:
+            await database.dispose_engine()
+
+    return asyncio.run(main())
+
+
+@pytest.fixture(scope="session")
+def run_async():
+    return _run
+
+
+@pytest.fixture
+def client():
+    from app.main import app
+
+    with TestClient(app) as c:
+        r = c.post("/api/auth/login", json={"email": bench_seed.ADMIN_EMAIL, "password": bench_seed.PASSWORD})
+        r.raise_for_status()
+        c.headers["Authorization"] = f"Bearer {r.json()['access_token']}"
+        yield c
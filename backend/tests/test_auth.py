@@ -0,0 +1,29 @@
+"""Caché de principals: los cambios de otro worker se ven sin esperar el TTL."""
+import random
+
+from sqlalchemy import update
+
+from app import models, versions
+from app.auth import principal_cache
+from app.database import session_factory
+
+
+def test_change_from_another_worker_reaches_the_cache(client, run_async, monkeypatch):
+    monkeypatch.setattr(principal_cache, "check_interval", 0)
+    principal_cache.clear()  # sin chequeo agendado con el intervalo normal
+    email = f"cache-{random.randint(0, 10**9)}@example.com"
+    user = client.post("/api/users", json={"name": "Caché", "email": email, "password": "x"}).json()
+    token = client.post("/api/auth/login", json={"email": email, "password": "x"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    assert client.get("/api/auth/cache-stats", headers=headers).status_code == 403  # residente, ya cacheado
+
+    async def promote():
+        # Como otro worker: escribe en la base sin pasar por la caché de este proceso
+        async with session_factory()() as db:
+            await db.execute(update(models.User).where(models.User.id == user["id"]).values(role="admin"))
+            await versions.bump(db, "users")
+            await db.commit()
+
+    run_async(promote)
+    assert client.get("/api/auth/cache-stats", headers=headers).status_code == 200
@@ -0,0 +1,116 @@
+"""Reservas: choque de horarios entre sesiones concurrentes.
+
+La carrera de MySQL en REPEATABLE READ: la sesión A hace una lectura antes de
+pedir el lock (como get_current_user cuando no está en la caché de usuarios, o
+una sub-petición anterior de un lote), así su transacción ya tiene foto. La
+sesión B toma el lock, reserva y confirma. Después A toma el lock y busca
+choques con find_overlap y find_conflicts: si leyera de su foto vieja no vería
+la reserva de B y reservaría el mismo horario. En SQLite pasa siempre (la
+lectura no abre transacción); con TEST_DATABASE_URL en MySQL es la prueba real.
+"""
+import asyncio
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select
+
+from app import availability, models
+from app.database import current_tenant, session_factory
+
+
+async def _book(db, amenity_id, start_at, end_at) -> int:
+    async with availability.booking_lock(db, amenity_id) as found:
+        assert found
+        r = models.Reservation(amenity_id=amenity_id, user_id=1, start_at=start_at, end_at=end_at, status="pending")
+        db.add(r)
+        await db.commit()
+    return r.id
+
+
+async def _hold(db):
+    async with availability.booking_lock(db, 1):
+        pass
+
+
+def test_booking_sees_reservation_committed_while_waiting(run_async):
+    start_at = datetime(2100, 1, 1) + timedelta(days=random.randint(0, 3000), hours=random.randint(0, 20))
+    end_at = start_at + timedelta(hours=1)
+
+    async def race():
+        factory = session_factory()
+        created = []
+        try:
+            async with factory() as a, factory() as b:
+                amenity_id = await a.scalar(
+                    select(models.Amenity.id).where(models.Amenity.deleted_at.is_(None)).order_by(models.Amenity.id).limit(1)
+                )
+                # A ya leyó: su transacción tiene foto
+                await a.get(models.User, 1)
+
+                created.append(await _book(b, amenity_id, start_at, end_at))
+
+                async with availability.booking_lock(a, amenity_id):
+                    overlap = await availability.find_overlap(a, amenity_id, start_at, end_at)
+                    conflicts = await availability.find_conflicts(a, amenity_id, [(start_at, end_at)])
+                await a.rollback()
+            return overlap, conflicts
+        finally:
+            async with factory() as db:
+                await db.execute(delete(models.Reservation).where(models.Reservation.id.in_(created)))
+                await db.commit()
+
+    overlap, conflicts = run_async(race)
+    assert overlap is not None, "find_overlap no ve la reserva de la otra sesión"
+    assert conflicts == {0}, "find_conflicts no ve la reserva de la otra sesión"
+
+
+def test_overlapping_reservation_is_rejected(client):
+    amenity = client.get("/api/amenities").json()[0]["id"]
+    start = datetime(2100, 1, 1) + timedelta(days=random.randint(0, 3000), hours=random.randint(0, 20))
+    span = {"start_at": start.isoformat(), "end_at": (start + timedelta(hours=2)).isoformat()}
+    assert client.post("/api/reservations", json={"amenity_id": amenity, "user_id": 1, **span}).status_code == 200
+    shifted = {"start_at": (start + timedelta(hours=1)).isoformat(), "end_at": (start + timedelta(hours=3)).isoformat()}
+    assert client.post("/api/reservations", json={"amenity_id": amenity, "user_id": 1, **shifted}).status_code == 400
+
+
+def test_offsets_are_normalized_to_utc(client):
+    amenity = client.get("/api/amenities").json()[0]["id"]
+    day = datetime(2100, 1, 1) + timedelta(days=random.randint(0, 3000))
+    # 10:00-11:00 en UTC-05:00 = 15:00-16:00 UTC, como se guarda
+    local = {"start_at": f"{day:%Y-%m-%d}T10:00:00-05:00", "end_at": f"{day:%Y-%m-%d}T11:00:00-05:00"}
+    r = client.post("/api/reservations", json={"amenity_id": amenity, "user_id": 1, **local})
+    assert r.status_code == 200, r.text
+    assert r.json()["start_at"] == f"{day:%Y-%m-%d}T15:00:00"
+
+    # Rango con zona contra reservas sin zona (antes: TypeError y 500)
+    r = client.get(
+        f"/api/amenities/{amenity}/availability",
+        params={"from": f"{day:%Y-%m-%d}T08:00:00Z", "to": f"{day:%Y-%m-%d}T20:00:00Z", "duration": 60},
+    )
+    assert r.status_code == 200, r.text
+    slots = [(s["start_at"], s["end_at"]) for s in r.json()["slots"]]
+    assert (f"{day:%Y-%m-%d}T08:00:00", f"{day:%Y-%m-%d}T15:00:00") in slots
+    assert all(not (s < f"{day:%Y-%m-%d}T16:00:00" and e > f"{day:%Y-%m-%d}T15:00:00") for s, e in slots)
+
+    # La misma franja escrita en UTC choca
+    utc = {"start_at": f"{day:%Y-%m-%d}T15:30:00Z", "end_at": f"{day:%Y-%m-%d}T16:30:00Z"}
+    assert client.post("/api/reservations", json={"amenity_id": amenity, "user_id": 1, **utc}).status_code == 400
+
+
+def test_amenity_locks_are_released(run_async):
+    async def book_and_wait():
+        factory = session_factory()
+        async with factory() as a, factory() as b:
+            key = (current_tenant.get(), 1)
+            async with availability.booking_lock(a, 1):
+                # Quien espera comparte el mismo lock
+                waiter = asyncio.create_task(_hold(b))
+                await asyncio.sleep(0)
+                assert key in availability._amenity_locks
+            await waiter
+            await a.rollback()
+            await b.rollback()
+        return key in availability._amenity_locks
+
+    assert run_async(book_and_wait) is False
+
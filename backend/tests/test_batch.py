@@ -0,0 +1,74 @@
+"""POST /api/batch con `transaction: true`: todo o nada."""
+
+
+def _resident(client):
+    return client.get("/api/users", params={"role": "resident", "limit": 1}).json()["items"][0]["id"]
+
+
+def _visitors(client, resident_id, name):
+    items = client.get("/api/visitors", params={"resident_id": resident_id, "limit": 500}).json()["items"]
+    return [v for v in items if v["visitor_name"] == name]
+
+
+def test_transaction_commits_every_write(client):
+    resident = _resident(client)
+    r = client.post(
+        "/api/batch",
+        json={
+            "transaction": True,
+            "requests": [
+                {"method": "POST", "path": "/api/visitors", "body": {"resident_id": resident, "visitor_name": "Lote OK"}},
+                {"method": "POST", "path": "/api/units", "body": {"code": "BATCH-OK"}},
+            ],
+        },
+    )
+    body = r.json()
+    assert body["committed"] is True
+    assert [x["status"] for x in body["responses"]] == [200, 200]
+    assert _visitors(client, resident, "Lote OK")
+
+
+def test_failed_request_rolls_back_the_whole_batch(client):
+    resident = _resident(client)
+    taken = client.get("/api/units", params={"limit": 1}).json()["items"][0]["code"]
+    r = client.post(
+        "/api/batch",
+        json={
+            "transaction": True,
+            "requests": [
+                {
+                    "method": "POST",
+                    "path": "/api/visitors",
+                    "body": {"resident_id": resident, "visitor_name": "Lote roto", "id_number": "BATCH-999"},
+                },
+                {"method": "POST", "path": "/api/units", "body": {"code": taken}},  # código repetido
+                {"method": "GET", "path": "/api/units"},
+            ],
+        },
+    )
+    body = r.json()
+    assert body["committed"] is False
+    statuses = [x["status"] for x in body["responses"]]
+    assert statuses[0] == 200 and statuses[1] >= 400 and statuses[2] == 424
+    assert not _visitors(client, resident, "Lote roto")
+    # La portería no puede quedar con el pase de una visita que se deshizo
+    assert client.get("/api/visitors/check", params={"id_number": "BATCH-999"}).json()["authorized"] is False
+
+
+def test_rolled_back_user_update_keeps_cached_principal(client):
+    # La caché de sesión se invalida solo con el commit: un lote que se deshace no la toca
+    me = client.get("/api/auth/me").json()
+    hits = client.get("/api/auth/cache-stats").json()["hits"]
+    r = client.post(
+        "/api/batch",
+        json={
+            "transaction": True,
+            "requests": [
+                {"method": "PUT", "path": f"/api/users/{me['id']}", "body": {"name": "No confirmado"}},
+                {"method": "POST", "path": "/api/units", "body": {"code": client.get("/api/units", params={"limit": 1}).json()["items"][0]["code"]}},
+            ],
+        },
+    )
+    assert r.json()["committed"] is False
+    assert client.get("/api/auth/me").json()["name"] == me["name"]
+    assert client.get("/api/auth/cache-stats").json()["hits"] > hits
@@ -0,0 +1,41 @@
+"""Feed de eventos: cada cambio de reservas, tickets y pagos sale con su acción."""
+import random
+from datetime import datetime, timedelta
+
+from app import events
+
+
+def future_span(hours=1):
+    start = datetime(2100, 1, 1) + timedelta(days=random.randint(0, 3000), hours=random.randint(0, 20))
+    return {"start_at": start.isoformat(), "end_at": (start + timedelta(hours=hours)).isoformat()}
+
+
+def published(run_async, since):
+    return {(e.topic, e.action, e.data["id"]): e.data for e in run_async(lambda: events.broker_for().read(since))}
+
+
+def test_updates_emit_updated(client, run_async):
+    amenity = client.get("/api/amenities").json()[0]["id"]
+    reservation = client.post("/api/reservations", json={"amenity_id": amenity, "user_id": 1, **future_span()}).json()
+    ticket = client.post("/api/tickets", json={"user_id": 1, "title": "Fuga", "description": "Baño"}).json()
+    payment = client.post("/api/payments", json={"user_id": 1, "amount": 10.0}).json()
+    since = events.broker_for().last_id
+
+    assert client.put(f"/api/reservations/{reservation['id']}", json={"status": "approved"}).status_code == 200
+    assert client.put(f"/api/tickets/{ticket['id']}", json={"status": "closed"}).status_code == 200
+    assert client.put(f"/api/payments/{payment['id']}", json={"amount": 12.5}).status_code == 200
+
+    seen = published(run_async, since)
+    assert seen[("reservations", "updated", reservation["id"])]["status"] == "approved"
+    assert seen[("tickets", "updated", ticket["id"])]["status"] == "closed"
+    assert seen[("payments", "updated", payment["id"])]["amount"] == 12.5
+
+
+def test_reactivating_a_reservation_checks_overlap(client):
+    amenity = client.get("/api/amenities").json()[0]["id"]
+    span = future_span()
+    first = client.post("/api/reservations", json={"amenity_id": amenity, "user_id": 1, **span}).json()
+    assert client.put(f"/api/reservations/{first['id']}", json={"status": "cancelled"}).json()["status"] == "cancelled"
+    # El horario quedó libre y lo toma otra reserva: la cancelada ya no puede volver
+    assert client.post("/api/reservations", json={"amenity_id": amenity, "user_id": 1, **span}).status_code == 200
+    assert client.put(f"/api/reservations/{first['id']}", json={"status": "pending"}).status_code == 400
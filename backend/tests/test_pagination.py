@@ -0,0 +1,86 @@
+"""Listados por cursor (keyset) y ETag/304."""
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert, update
+
+from app import models
+from app.database import session_factory
+
+
+def _walk(client, path, **params):
+    """Todas las páginas de un listado; devuelve los items en el orden en que llegaron."""
+    items, after = [], None
+    while True:
+        r = client.get(path, params={**params, **({"after": after} if after else {})})
+        assert r.status_code == 200, r.text
+        body = r.json()
+        items += body["items"]
+        after = body["next_cursor"]
+        if not after:
+            return items
+
+
+@pytest.fixture
+def payer(client):
+    """Un usuario con varios pagos del seed."""
+    return client.get("/api/payments", params={"limit": 1, "sort": "id", "order": "asc"}).json()["items"][0]["user_id"]
+
+
+@pytest.mark.parametrize("sort", ["id", "paid_at"])
+@pytest.mark.parametrize("order", ["asc", "desc"])
+def test_keyset_pages_cover_every_row_once(client, payer, sort, order):
+    whole = client.get("/api/payments", params={"user_id": payer, "sort": sort, "order": order, "limit": 500}).json()
+    assert whole["next_cursor"] is None
+    paged = _walk(client, "/api/payments", user_id=payer, sort=sort, order=order, limit=3)
+    assert [p["id"] for p in paged] == [p["id"] for p in whole["items"]]
+    assert len({p["id"] for p in paged}) == len(paged) > 3
+
+    keys = [(p[sort], p["id"]) for p in paged]
+    assert keys == sorted(keys, reverse=order == "desc")
+
+
+@pytest.mark.parametrize("order", ["asc", "desc"])
+def test_keyset_pages_through_null_sort_values(client, run_async, order):
+    user = client.post("/api/users", json={"name": "Nulos", "email": f"nulls-{random.randint(0, 10**9)}@example.com", "password": "x"}).json()
+    paid = [None] * 4 + [datetime(2020, 1, 1) + timedelta(days=i // 2) for i in range(4)]
+
+    async def add_payments():
+        async with session_factory()() as db:
+            P = models.Payment
+            await db.execute(insert(P), [{"user_id": user["id"], "amount": 1.0, "paid_at": p} for p in paid])
+            # En el INSERT, None toma el default de la columna (ahora)
+            await db.execute(update(P).where(P.user_id == user["id"], P.paid_at > datetime(2021, 1, 1)).values(paid_at=None))
+            await db.commit()
+
+    run_async(add_payments)
+    paged = _walk(client, "/api/payments", user_id=user["id"], sort="paid_at", order=order, limit=3)
+    assert len({p["id"] for p in paged}) == len(paged) == len(paid)
+    # NULL es el menor valor: primero en ASC, último en DESC
+    keys = [(p["paid_at"] is not None, p["paid_at"] or "", p["id"]) for p in paged]
+    assert keys == sorted(keys, reverse=order == "desc")
+
+
+def test_cursor_is_tied_to_its_sort(client, payer):
+    cursor = client.get("/api/payments", params={"user_id": payer, "limit": 1}).json()["next_cursor"]
+    r = client.get("/api/payments", params={"user_id": payer, "sort": "paid_at", "after": cursor})
+    assert r.status_code == 400
+    assert client.get("/api/payments", params={"after": "no-es-un-cursor"}).status_code == 400
+
+
+def test_etag_revalidates_until_the_table_changes(client):
+    first = client.get("/api/units", params={"limit": 5})
+    etag = first.headers["etag"]
+    again = client.get("/api/units", params={"limit": 5}, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+
+    # Otra URL (filtros, cursor) es otro ETag
+    other = client.get("/api/units", params={"limit": 6}, headers={"If-None-Match": etag})
+    assert other.status_code == 200
+
+    assert client.post("/api/units", json={"code": "ETAG-TEST"}).status_code == 200
+    changed = client.get("/api/units", params={"limit": 5}, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
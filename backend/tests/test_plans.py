@@ -0,0 +1,315 @@
+"""Plan de ejecución de cada consulta que emiten las rutas: falla si una consulta caliente recorre la tabla entera.
+
+    python -m pytest tests/test_plans.py -v
+
+Llama a las rutas dentro del proceso (httpx + ASGITransport, sin uvicorn)
+sobre la base de bench.seed que arma conftest, captura cada
+SELECT/UPDATE/DELETE con sus parámetros y corre EXPLAIN sobre cada uno:
+`EXPLAIN QUERY PLAN` en SQLite y `EXPLAIN` en MySQL (TEST_DATABASE_URL). Una
+consulta falla si recorre entera una tabla de HOT_TABLES (SQLite: `SCAN t`,
+también `SCAN t USING INDEX`; MySQL: type `ALL` o `index`), salvo las rutas
+que EXPECTED_SCANS acepta una por una (y sin ordenar aparte).
+
+Además revisa los índices declarados en la base: uno es redundante si sus
+columnas son el comienzo de otro índice de la misma tabla o de la clave
+primaria. Cuesta en cada alta y no sirve a ninguna consulta.
+
+Las rutas de escritura modifican la base (reservas en el año 2100, una unidad,
+un usuario y una amenidad borrados, una facturación).
+"""
+import contextvars
+import re
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from sqlalchemy import event, inspect
+from sqlalchemy.engine import Engine
+
+from app.migrations.v0003_search import FTS
+from bench.seed import ADMIN_EMAIL, PASSWORD
+
+# Tablas que crecen con el uso; las chicas (amenities, resúmenes, versiones) pueden recorrerse
+HOT_TABLES = {
+    "users",
+    "units",
+    "reservations",
+    "reservation_series",
+    "maintenance_tickets",
+    "visitors",
+    "payments",
+    "charges",
+    "events_outbox",
+    "purge_jobs",
+}
+# Recorridos aceptados, uno por uno (ruta -> tablas). Primera página de un
+# listado sin filtros: recorre en el orden del ORDER BY (la PK o su índice) y
+# corta al juntar la página; el único filtro es `deleted_at IS NULL`, que cumple
+# casi todo. La facturación pasa por todas las unidades a propósito. Aun así
+# fallan si además ordenan aparte (TEMP B-TREE / filesort): eso lee la tabla entera.
+EXPECTED_SCANS = {
+    "list_users": {"users"},
+    "list_users?sort=name": {"users"},
+    "list_units": {"units"},
+    "list_units?order=desc": {"units"},
+    "list_units?sort=code": {"units"},
+    "list_reservations": {"reservations"},
+    "list_reservations?sort=start_at": {"reservations"},
+    "list_tickets": {"maintenance_tickets"},
+    "list_visitors": {"visitors"},
+    "list_payments": {"payments"},
+    "billing_run": {"units"},
+}
+DML = re.compile(r"^\s*(SELECT|UPDATE|DELETE)\b", re.I)
+SQLITE_STEP = re.compile(r"^(SCAN|SEARCH) (\w+)(?: AS \w+)?(.*)$")
+
+_route = contextvars.ContextVar("plan_route", default="background")
+_captured = {}  # sql -> (ruta, parámetros): la primera vez que aparece
+_explaining = contextvars.ContextVar("plan_explaining", default=False)
+
+
+def _capture(conn, cursor, statement, parameters, context, executemany):
+    if executemany or _explaining.get() or not DML.match(statement):
+        return
+    _captured.setdefault(statement, (_route.get(), parameters))
+
+
+# -------------------- rutas --------------------
+
+
+async def exercise(client):
+    """Recorre las rutas con sus filtros y variantes de orden; cada llamada queda etiquetada."""
+
+    async def call(name, method, path, **kw):
+        token = _route.set(name)
+        try:
+            r = await client.request(method, path, **kw)
+        finally:
+            _route.reset(token)
+        if r.status_code >= 500:
+            raise RuntimeError(f"{name}: {r.status_code} {r.text[:200]}")
+        return r
+
+    r = await call("login", "POST", "/api/auth/login", json={"email": ADMIN_EMAIL, "password": PASSWORD})
+    r.raise_for_status()
+    client.headers["Authorization"] = f"Bearer {r.json()['access_token']}"
+
+    async def first_id(name, path, **params):
+        return (await call(name, "GET", path, params={"limit": 1, **params})).json()["items"][0]["id"]
+
+    user = await first_id("list_users?role", "/api/users", role="resident")
+    unit = await first_id("list_units?order=desc", "/api/units", sort="id", order="desc")
+    amenity = (await call("list_amenities", "GET", "/api/amenities")).json()[0]["id"]
+    since = (datetime.utcnow() - timedelta(days=30)).isoformat()
+    until = datetime.utcnow().isoformat()
+    future = datetime(2100, 1, 1, 10)
+
+    gets = {
+        "me": ("/api/auth/me", {}),
+        "list_users": ("/api/users", {}),
+        "list_users?role": ("/api/users", {"role": "admin"}),
+        "list_users?sort=name": ("/api/users", {"sort": "name"}),
+        "get_user": (f"/api/users/{user}", {}),
+        "list_units": ("/api/units", {}),
+        "list_units?owner_id": ("/api/units", {"owner_id": user}),
+        "list_units?sort=code": ("/api/units", {"sort": "code"}),
+        "get_unit": (f"/api/units/{unit}", {}),
+        "list_amenities": ("/api/amenities", {}),
+        "availability": (
+            f"/api/amenities/{amenity}/availability",
+            {"from": until, "to": (datetime.utcnow() + timedelta(days=7)).isoformat()},
+        ),
+        "list_reservations": ("/api/reservations", {}),
+        "list_reservations?user_id": ("/api/reservations", {"user_id": user}),
+        "list_reservations?amenity_id&from": ("/api/reservations", {"amenity_id": amenity, "from": since, "sort": "start_at"}),
+        "list_reservations?status": ("/api/reservations", {"status": "cancelled"}),
+        "list_reservations?sort=start_at": ("/api/reservations", {"sort": "start_at", "order": "desc"}),
+        "list_tickets": ("/api/tickets", {}),
+        "list_tickets?user_id": ("/api/tickets", {"user_id": user}),
+        "list_tickets?unit_id": ("/api/tickets", {"unit_id": unit}),
+        "list_tickets?status": ("/api/tickets", {"status": "open", "sort": "created_at", "order": "desc"}),
+        "list_tickets?from": ("/api/tickets", {"from": since, "to": until, "sort": "created_at"}),
+        "list_visitors": ("/api/visitors", {}),
+        "list_visitors?resident_id": ("/api/visitors", {"resident_id": user, "sort": "allowed_at", "order": "desc"}),
+        "list_visitors?unit_id": ("/api/visitors", {"unit_id": unit}),
+        "list_visitors?from": ("/api/visitors", {"from": since, "sort": "allowed_at"}),
+        "list_payments": ("/api/payments", {}),
+        "list_payments?user_id": ("/api/payments", {"user_id": user}),
+        "list_payments?unit_id": ("/api/payments", {"unit_id": unit, "sort": "paid_at", "order": "desc"}),
+        "list_payments?from": ("/api/payments", {"from": since, "to": until, "sort": "paid_at"}),
+        "list_charges?user_id": ("/api/charges", {"user_id": user}),
+        "list_charges?unit_id": ("/api/charges", {"unit_id": unit}),
+        "search_tickets": ("/api/search", {"q": "fuga", "type": "tickets"}),
+        "search_visitors": ("/api/search", {"q": "gom", "type": "visitors"}),
+    }
+    for name, (path, params) in gets.items():
+        await call(name, "GET", path, params=params)
+    for path in ("payments", "owners", "tickets", "reservations"):
+        await call(f"summary_{path}", "GET", f"/api/summary/{path}")
+
+    # Escrituras
+    span = {"start_at": future.isoformat(), "end_at": (future + timedelta(hours=1)).isoformat()}
+    await call("create_reservation", "POST", "/api/reservations", json={"amenity_id": amenity, "user_id": user, **span})
+    await call(
+        "create_series",
+        "POST",
+        "/api/reservations/series",
+        json={
+            "amenity_id": amenity,
+            "user_id": user,
+            "start_at": (future + timedelta(days=1)).isoformat(),
+            "end_at": (future + timedelta(days=1, hours=1)).isoformat(),
+            "rule": {"freq": "weekly", "count": 8},
+        },
+    )
+    await call("create_ticket", "POST", "/api/tickets", json={"user_id": user, "unit_id": unit, "title": "Plan", "description": "test_plans"})
+    await call("create_payment", "POST", "/api/payments", json={"user_id": user, "unit_id": unit, "amount": 1.0})
+    await call(
+        "create_visitor",
+        "POST",
+        "/api/visitors",
+        json={"resident_id": user, "visitor_name": "Plan Bench", "id_number": "PLAN-1"},
+    )
+    # Portería: la tabla en memoria se vacía antes para que la consulta llegue a la base
+    from app.gate import gate_passes
+
+    gate_passes.clear()
+    await call("check_visitor", "GET", "/api/visitors/check", params={"id_number": "PLAN-1"})
+    await call("check_visitor?unknown", "GET", "/api/visitors/check", params={"id_number": "PLAN-0"})
+    await call("billing_run", "POST", "/api/billing/runs", json={"period": "2100-01"})
+    r = await call("delete_unit", "DELETE", f"/api/units/{unit}", params={"detach": "true"})
+    jobs = [r.json()["id"]]
+    r = await call("delete_user", "DELETE", f"/api/users/{user}")
+    jobs.append(r.json()["id"])
+    # Amenidad propia, para no vaciar las del seed al limpiarla
+    spare = (await call("create_amenity", "POST", "/api/amenities", json={"name": "Plan Bench"})).json()["id"]
+    await call("create_reservation", "POST", "/api/reservations", json={"amenity_id": spare, "user_id": user, **span})
+    r = await call("delete_amenity", "DELETE", f"/api/amenities/{spare}")
+    jobs.append(r.json()["id"])
+    await call("get_job", "GET", f"/api/jobs/{jobs[0]}")
+
+
+async def _purge():
+    from app import purge
+    from app.database import session_factory
+
+    token = _route.set("purge_worker")
+    try:
+        await purge.run_pending(session_factory())
+    finally:
+        _route.reset(token)
+
+
+# -------------------- EXPLAIN --------------------
+def _sqlite_verdict(rows, sql):
+    plan = [r[-1] for r in rows]
+    sorted_apart = any("TEMP B-TREE" in step for step in plan)
+    scans = []
+    for step in plan:
+        m = SQLITE_STEP.match(step)
+        if m and m.group(1) == "SCAN" and m.group(2) in HOT_TABLES and "VIRTUAL TABLE" not in m.group(3):
+            scans.append(m.group(2))
+    return plan, scans, sorted_apart
+
+
+def _mysql_verdict(rows, sql):
+    plan, scans, sorted_apart = [], [], False
+    for row in rows:
+        table, access, key, extra = row["table"], row["type"], row["key"], row.get("Extra") or ""
+        plan.append(f"{table}: type={access} key={key} {extra}".strip())
+        sorted_apart = sorted_apart or "filesort" in extra
+        if table in HOT_TABLES and access in ("ALL", "index"):
+            scans.append(table)
+    return plan, scans, sorted_apart
+
+
+async def explain_all(engine) -> list:
+    dialect = engine.dialect.name
+    token = _explaining.set(True)
+    results = []
+    try:
+        async with engine.connect() as conn:
+            for sql, (route, params) in _captured.items():
+                if dialect == "sqlite":
+                    rows = (await conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql, params)).all()
+                    plan, scans, sorted_apart = _sqlite_verdict(rows, sql)
+                else:
+                    rows = (await conn.exec_driver_sql("EXPLAIN " + sql, params)).mappings().all()
+                    plan, scans, sorted_apart = _mysql_verdict(rows, sql)
+                results.append(
+                    {
+                        "route": route,
+                        "sql": " ".join(sql.split()),
+                        "plan": plan,
+                        "full_scan": sorted(set(scans)),
+                        "ok": not set(scans) - EXPECTED_SCANS.get(route, set()) and not (scans and sorted_apart),
+                    }
+                )
+            await conn.rollback()
+    finally:
+        _explaining.reset(token)
+    return results
+
+
+def _redundant(sync_conn) -> list:
+    insp = inspect(sync_conn)
+    found = []
+    for table in insp.get_table_names():
+        if table.startswith(tuple(FTS)):  # tablas FTS5 y sus tablas internas (tickets_fts_data...)
+            continue
+        pk = tuple(insp.get_pk_constraint(table)["constrained_columns"])
+        indexes = [(ix["name"], tuple(ix["column_names"]), ix["unique"]) for ix in insp.get_indexes(table)]
+        for name, cols, unique in indexes:
+            if unique or None in cols:
+                continue
+            covers = [("PRIMARY KEY", pk)] + [(other, ocols) for other, ocols, _ in indexes if other != name]
+            for other, ocols in covers:
+                # Iguales: se reporta solo uno de los dos
+                if ocols[: len(cols)] == cols and (len(ocols) > len(cols) or other == "PRIMARY KEY" or other < name):
+                    found.append({"table": table, "index": name, "columns": list(cols), "covered_by": other})
+                    break
+    return found
+
+
+async def _report() -> dict:
+    from app import database
+    from app.main import app
+
+    engine = database.init_engine()
+    event.listen(Engine, "before_cursor_execute", _capture)
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://plans", timeout=60) as client:
+            await exercise(client)
+        await _purge()
+        results = await explain_all(engine)
+        async with engine.connect() as conn:
+            redundant = await conn.run_sync(_redundant)
+    finally:
+        event.remove(Engine, "before_cursor_execute", _capture)
+    return {"results": results, "redundant_indexes": redundant}
+
+
+@pytest.fixture(scope="module")
+def report(run_async):
+    return run_async(_report)
+
+
+def test_hot_queries_use_indexes(report):
+    failures = [r for r in report["results"] if not r["ok"]]
+    assert not failures, "\n".join(
+        f"[{r['route']}] {r['sql'][:160]}\n    " + "\n    ".join(r["plan"]) for r in failures
+    )
+
+
+def test_no_redundant_indexes(report):
+    assert not report["redundant_indexes"], "\n".join(
+        f"{ix['table']}.{ix['index']} {ix['columns']} (lo cubre {ix['covered_by']})"
+        for ix in report["redundant_indexes"]
+    )
+
+
+def test_expected_scans_name_real_routes(report):
+    # Una excepción para una ruta que ya no se ejercita taparía una regresión futura
+    routes = {r["route"] for r in report["results"]}
+    assert not set(EXPECTED_SCANS) - routes
@@ -0,0 +1,97 @@
+"""Borrado lógico y el worker de limpieza (purge.py)."""
+import random
+import time
+from datetime import datetime, timedelta
+
+from app import events
+
+
+def wait_job(client, job_id, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(f"/api/jobs/{job_id}").json()
+        if job["status"] in ("done", "failed") or time.monotonic() > deadline:
+            return job
+        time.sleep(0.05)
+
+
+def future_span(hours=1):
+    start = datetime(2100, 1, 1) + timedelta(days=random.randint(0, 3000), hours=random.randint(0, 20))
+    return {"start_at": start.isoformat(), "end_at": (start + timedelta(hours=hours)).isoformat()}
+
+
+def test_user_delete_detaches_cancels_and_leaves_tombstone(client):
+    email = f"purge-{random.randint(0, 10**9)}@example.com"
+    user = client.post("/api/users", json={"name": "Purga", "email": email, "password": "x"}).json()
+    unit = client.post("/api/units", json={"code": f"PURGE-{user['id']}", "owner_id": user["id"]}).json()
+    amenity = client.get("/api/amenities").json()[0]["id"]
+    reservation = client.post("/api/reservations", json={"amenity_id": amenity, "user_id": user["id"], **future_span()}).json()
+    assert client.post("/api/payments", json={"user_id": user["id"], "amount": 10.0}).status_code == 200
+
+    r = client.delete(f"/api/users/{user['id']}")
+    assert r.status_code == 202
+    assert r.headers["location"] == f"/api/jobs/{r.json()['id']}"
+    # Borrado lógico inmediato: ya no se ve, aunque el worker no haya terminado
+    assert client.get(f"/api/users/{user['id']}").status_code == 404
+
+    job = wait_job(client, r.json()["id"])
+    assert job["status"] == "done", job
+    assert job["result"] == "tombstone"  # el pago lo sigue referenciando
+    assert client.get(f"/api/units/{unit['id']}").json()["owner_id"] is None
+    items = client.get("/api/reservations", params={"user_id": user["id"], "limit": 500}).json()["items"]
+    assert [x["status"] for x in items if x["id"] == reservation["id"]] == ["cancelled"]
+
+    # El email queda libre
+    again = client.post("/api/users", json={"name": "Purga", "email": email, "password": "x"})
+    assert again.status_code == 200, again.text
+
+
+def test_unreferenced_unit_is_deleted(client):
+    unit = client.post("/api/units", json={"code": f"PURGE-U-{random.randint(0, 10**9)}"}).json()
+    job = wait_job(client, client.delete(f"/api/units/{unit['id']}").json()["id"])
+    assert (job["status"], job["result"]) == ("done", "deleted")
+    assert client.get(f"/api/units/{unit['id']}").status_code == 404
+
+
+def test_amenity_delete_cancels_future_and_keeps_history(client):
+    amenity = client.post("/api/amenities", json={"name": f"Purga {random.randint(0, 10**9)}"}).json()["id"]
+    past = {"start_at": "2001-01-01T10:00:00", "end_at": "2001-01-01T11:00:00"}
+    kept = client.post("/api/reservations", json={"amenity_id": amenity, "user_id": 1, **past}).json()
+    future = client.post("/api/reservations", json={"amenity_id": amenity, "user_id": 1, **future_span()}).json()
+    series = client.post(
+        "/api/reservations/series",
+        json={"amenity_id": amenity, "user_id": 1, **future_span(), "rule": {"freq": "daily", "count": 2}},
+    ).json()
+
+    job = wait_job(client, client.delete(f"/api/amenities/{amenity}").json()["id"])
+    assert (job["status"], job["result"]) == ("done", "tombstone")
+
+    items = {x["id"]: x for x in client.get("/api/reservations", params={"amenity_id": amenity, "limit": 500}).json()["items"]}
+    assert items[kept["id"]]["status"] == kept["status"]  # la pasada queda tal cual
+    assert items[future["id"]]["status"] == "cancelled"
+    for occurrence in series["created"]:
+        # La serie sin ocurrencias pasadas se borra; sus reservas quedan canceladas y sueltas
+        assert (items[occurrence["id"]]["status"], items[occurrence["id"]]["series_id"]) == ("cancelled", None)
+
+
+def test_unused_amenity_is_deleted(client):
+    amenity = client.post("/api/amenities", json={"name": f"Purga {random.randint(0, 10**9)}"}).json()["id"]
+    job = wait_job(client, client.delete(f"/api/amenities/{amenity}").json()["id"])
+    assert (job["status"], job["result"]) == ("done", "deleted")
+
+
+def test_worker_emits_updated_events(client, run_async):
+    user = client.post("/api/users", json={"name": "Purga", "email": f"purge-{random.randint(0, 10**9)}@example.com", "password": "x"}).json()
+    unit = client.post("/api/units", json={"code": f"PURGE-E-{user['id']}"}).json()
+    amenity = client.get("/api/amenities").json()[0]["id"]
+    reservation = client.post("/api/reservations", json={"amenity_id": amenity, "user_id": user["id"], **future_span()}).json()
+    payment = client.post("/api/payments", json={"user_id": user["id"], "unit_id": unit["id"], "amount": 10.0}).json()
+    broker = events.broker_for()
+    since = broker.last_id
+
+    wait_job(client, client.delete(f"/api/users/{user['id']}").json()["id"])
+    wait_job(client, client.delete(f"/api/units/{unit['id']}?detach=true").json()["id"])
+
+    seen = {(e.topic, e.action, e.data["id"]): e.data for e in run_async(lambda: broker.read(since))}
+    assert seen[("reservations", "updated", reservation["id"])]["status"] == "cancelled"
+    assert seen[("payments", "updated", payment["id"])]["unit_id"] is None
@@ -0,0 +1,24 @@
+"""Series de reservas: expansión de la regla."""
+import random
+from datetime import datetime, timedelta
+
+
+def test_until_with_offset_is_normalized(client):
+    amenity = client.get("/api/amenities").json()[0]["id"]
+    day = datetime(2100, 1, 1) + timedelta(days=random.randint(0, 3000))
+    first = f"{day:%Y-%m-%d}T10:00:00Z"
+    # until 09:00-05:00 = 14:00 UTC del tercer día: entran tres ocurrencias
+    until = (day + timedelta(days=2)).strftime("%Y-%m-%dT09:00:00-05:00")
+    body = {
+        "amenity_id": amenity,
+        "user_id": 1,
+        "start_at": first,
+        "end_at": f"{day:%Y-%m-%d}T11:00:00Z",
+        "rule": {"freq": "daily", "until": until},
+        "mode": "skip_conflicts",
+    }
+    r = client.post("/api/reservations/series", json=body)
+    assert r.status_code == 200, r.text
+    starts = [o["start_at"] for o in r.json()["created"]]
+    assert starts == [(day + timedelta(days=i)).strftime("%Y-%m-%dT10:00:00") for i in range(3)]
+    assert client.delete(f"/api/reservations/series/{r.json()['id']}").status_code in (200, 204)
@@ -2,6 +2,11 @@
 const API_BASE = "http://127.0.0.1:8000";
 
 let token = window.localStorage.getItem("village_token") || null;
+
+// Condominio: ?tenant=slug en la URL lo fija (login y registro lo envían en X-Tenant)
+const tenantParam = new URLSearchParams(window.location.search).get("tenant");
+if (tenantParam) window.localStorage.setItem("village_tenant", tenantParam);
+const tenant = window.localStorage.getItem("village_tenant") || null;
 let currentRole = window.localStorage.getItem("village_user_role") || null;
 
 // Visibilidad por rol
@@ -57,17 +62,16 @@ function isDateTimeLike(v) {
 
 // Helper de API
 async function api(path, method = "GET", body = null) {
-  const headers = {
-    "Content-Type": "application/json",
-    "Cache-Control": "no-store",
-  };
+  const headers = { "Content-Type": "application/json" };
   const tk = getToken();
   if (tk) headers["Authorization"] = "Bearer " + tk;
+  if (tenant) headers["X-Tenant"] = tenant;
 
   const res = await fetch(`${API_BASE}${path}`, {
     method,
     headers,
-    cache: "no-store",
+    // GET: el navegador revalida con If-None-Match y el servidor responde 304 si no hubo cambios
+    cache: method === "GET" ? "no-cache" : "no-store",
     body: body ? JSON.stringify(body) : null,
   });
 
@@ -86,6 +90,130 @@ async function api(path, method = "GET", body = null) {
   }
 }
 
+// Cambios en tiempo real (SSE): recarga los listados ya abiertos cuando llega un evento
+const LIVE_LISTS = {
+  reservations: { el: "res-summary", reload: () => listReservations() },
+  tickets: { el: "tickets-summary", reload: () => listTickets() },
+  payments: { el: "payments-summary", reload: () => listPayments() },
+};
+let _events = null;
+const _liveTimers = {};
+
+function refreshLive(topic) {
+  const cfg = LIVE_LISTS[topic];
+  const el = cfg && document.getElementById(cfg.el);
+  if (!el || !el.innerHTML.trim()) return; // listado aún no abierto
+  clearTimeout(_liveTimers[topic]);
+  _liveTimers[topic] = setTimeout(cfg.reload, 300); // agrupa ráfagas de eventos
+}
+
+function startEvents() {
+  stopEvents();
+  const tk = getToken();
+  if (!tk || !window.EventSource) return;
+  // EventSource no envía headers: token por query. Reconecta solo y reanuda con Last-Event-ID
+  _events = new EventSource(`${API_BASE}/api/events?token=${encodeURIComponent(tk)}`);
+  Object.keys(LIVE_LISTS).forEach((topic) =>
+    _events.addEventListener(topic, () => refreshLive(topic))
+  );
+  _events.addEventListener("reset", () =>
+    Object.keys(LIVE_LISTS).forEach(refreshLive)
+  );
+}
+
+function stopEvents() {
+  if (_events) _events.close();
+  _events = null;
+}
+
+// Listados paginados (cursor): cada vista trae una página y las siguientes a pedido
+const PAGE_SIZE = 50;
+const _pages = {}; // vista -> { items, next }
+
+// Primera página (more = false) o la siguiente de la vista `key`; devuelve lo cargado
+async function loadPage(key, path, params = {}, more = false) {
+  const state = more && _pages[key] ? _pages[key] : { items: [], next: null };
+  const qs = new URLSearchParams({ ...params, limit: PAGE_SIZE });
+  if (more && state.next) qs.set("after", state.next);
+  const page = await api(`${path}?${qs}`);
+  state.items = [...state.items, ...(page.items || [])];
+  state.next = page.next_cursor || null;
+  _pages[key] = state;
+  return state;
+}
+
+// Botón "Cargar más" debajo de `listId`, solo si quedan páginas
+function renderMore(listId, state, onMore) {
+  const list = document.getElementById(listId);
+  if (!list) return;
+  let btn = document.getElementById(`${listId}-more`);
+  if (!state.next) {
+    if (btn) btn.remove();
+    return;
+  }
+  if (!btn) {
+    btn = document.createElement("button");
+    btn.id = `${listId}-more`;
+    btn.className = "ghost";
+    btn.style.marginTop = "8px";
+    btn.textContent = "Cargar más";
+    list.insertAdjacentElement("afterend", btn);
+  }
+  btn.disabled = false;
+  btn.onclick = async () => {
+    btn.disabled = true;
+    await onMore();
+  };
+}
+
+// "50" o "50+" si quedan páginas sin cargar
+function loadedCount(state) {
+  return `${state.items.length}${state.next ? "+" : ""}`;
+}
+
+// Listado completo (sigue next_cursor): solo para selects chicos, no para vistas
+async function apiList(path, params = {}) {
+  const items = [];
+  let after = null;
+  do {
+    const qs = new URLSearchParams({ ...params, limit: 500 });
+    if (after) qs.set("after", after);
+    const page = await api(`${path}?${qs}`);
+    items.push(...(page.items || []));
+    after = page.next_cursor;
+  } while (after);
+  return items;
+}
+
+// Varias peticiones en un solo viaje (POST /api/batch): respuestas en el mismo orden
+async function apiBatch(requests, transaction = false) {
+  const data = await api("/api/batch", "POST", { requests, transaction });
+  return data.responses || [];
+}
+
+// Varios GET por id en lotes (máximo BATCH_MAX por lote); devuelve { id: body } de los 200
+const BATCH_MAX = 20;
+async function apiGetMany(pathFor, ids) {
+  const unique = [...new Set(ids)];
+  const chunks = [];
+  for (let i = 0; i < unique.length; i += BATCH_MAX) chunks.push(unique.slice(i, i + BATCH_MAX));
+  const responses = await Promise.all(
+    chunks.map((chunk) => apiBatch(chunk.map((id) => ({ id: String(id), path: pathFor(id) }))))
+  );
+  const byId = {};
+  responses.flat().forEach((res) => {
+    if (res.status === 200) byId[res.id] = res.body;
+  });
+  return byId;
+}
+
+// Filtro por dueño cuando el rol es "user" (lo resuelve el servidor)
+function ownFilter(field = "user_id") {
+  const me = getCurrentUser();
+  const role = me.role || localStorage.getItem("village_user_role") || "";
+  return role === "user" && me.id ? { [field]: me.id } : {};
+}
+
 /* -------------------- Helpers visuales de USUARIOS -------------------- */
 const usersOutEl = () => document.getElementById("users-out");
 function hideUsersOut() {
@@ -218,7 +346,7 @@ async function loadOwnerSelect() {
   const sel = document.getElementById("unit-owner");
   if (!sel) return;
   try {
-    const users = await api("/api/users");
+    const users = await apiList("/api/users");
     sel.innerHTML = '<option value="">— Selecciona propietario —</option>';
     users.forEach((u) => {
       const opt = document.createElement("option");
@@ -251,6 +379,7 @@ async function login() {
     setRole(user.role || null);
     updateSessionBanner(user);
     hideAuth();
+    startEvents();
     if ((user.role || "") === "admin") loadOwnerSelect();
   } catch (e) {
     document.getElementById("log-out").textContent = e.message;
@@ -309,19 +438,6 @@ async function deleteAmenity() {
   }
 }
 
-/* -------------------- CACHE DE UNIDADES (también para pagos) -------------------- */
-let _unitsCache = null;
-
-async function getUnitsCache() {
-  try {
-    if (!_unitsCache) _unitsCache = await api("/api/units");
-    return _unitsCache || [];
-  } catch {
-    _unitsCache = [];
-    return [];
-  }
-}
-
 // === UNIDADES ===
 async function createUnit() {
   const code = document.getElementById("unit-code").value;
@@ -346,7 +462,6 @@ async function createUnit() {
       owner_id: owner_id ? Number(owner_id) : null,
       area_m2,
     });
-    _unitsCache = null;
     out.textContent = "";
     showToast("Unidad creada");
     document.getElementById("unit-code").value = "";
@@ -359,7 +474,7 @@ async function createUnit() {
   }
 }
 
-async function listUnits() {
+async function listUnits(more = false) {
   const out = document.getElementById("units-out");
   const summary = document.getElementById("units-summary");
   const listEl = document.getElementById("units-list");
@@ -372,18 +487,14 @@ async function listUnits() {
   }
 
   try {
-    const [units, users] = await Promise.all([
-      api("/api/units"),
-      api("/api/users"),
-    ]);
-
-    const items = units || [];
-    _unitsCache = items;
+    const state = await loadPage("units", "/api/units", {}, more);
+    const items = state.items;
 
-    const usersById = {};
-    (users || []).forEach((u) => {
-      usersById[u.id] = u;
-    });
+    // Solo los propietarios de las unidades cargadas, en un lote
+    const usersById = await apiGetMany(
+      (id) => `/api/users/${id}`,
+      items.filter((u) => u.owner_id != null).map((u) => u.owner_id)
+    );
 
     const totalArea = items.reduce(
       (acc, u) => acc + (Number(u.area_m2) || 0),
@@ -392,12 +503,13 @@ async function listUnits() {
     const withOwner = items.filter((u) => u.owner_id != null).length;
 
     if (summary) {
-      summary.textContent = `Unidades (${items.length}) — Área total: ${totalArea.toFixed(
+      summary.textContent = `Unidades (${loadedCount(state)}) — Área de las cargadas: ${totalArea.toFixed(
         1
       )} m² · Con propietario: ${withOwner}`;
     }
 
     if (!listEl) return;
+    renderMore("units-list", state, () => listUnits(true));
 
     if (!items.length) {
       const p = document.createElement("p");
@@ -405,31 +517,28 @@ async function listUnits() {
       p.textContent = "— Sin unidades —";
       listEl.appendChild(p);
     } else {
-      items
-        .slice()
-        .sort((a, b) => a.id - b.id)
-        .forEach((u) => {
-          const owner = u.owner_id != null ? usersById[u.owner_id] : null;
-          const ownerLabel = owner
-            ? `${owner.name || "Sin nombre"} (#${u.owner_id})`
-            : "— Sin asignar —";
+      items.forEach((u) => {
+        const owner = u.owner_id != null ? usersById[u.owner_id] : null;
+        const ownerLabel = owner
+          ? `${owner.name || "Sin nombre"} (#${u.owner_id})`
+          : "— Sin asignar —";
 
-          const card = document.createElement("div");
-          card.className = "card";
-          card.innerHTML = `
-            <div class="row space" style="align-items:flex-start;gap:8px">
-              <div>
-                <div style="font-weight:600">[${u.id}] ${u.code}</div>
-                <div class="muted small">Área: ${u.area_m2} m²</div>
-              </div>
-              <div style="text-align:right">
-                <div class="muted small">Propietario</div>
-                <div class="small">${ownerLabel}</div>
-              </div>
+        const card = document.createElement("div");
+        card.className = "card";
+        card.innerHTML = `
+          <div class="row space" style="align-items:flex-start;gap:8px">
+            <div>
+              <div style="font-weight:600">[${u.id}] ${u.code}</div>
+              <div class="muted small">Área: ${u.area_m2} m²</div>
             </div>
-          `;
-          listEl.appendChild(card);
-        });
+            <div style="text-align:right">
+              <div class="muted small">Propietario</div>
+              <div class="small">${ownerLabel}</div>
+            </div>
+          </div>
+        `;
+        listEl.appendChild(card);
+      });
     }
   } catch (e) {
     if (out) {
@@ -454,7 +563,6 @@ async function deleteUnit() {
 
   try {
     await api(`/api/units/${id}?detach=true`, "DELETE");
-    _unitsCache = null;
     out.textContent = "";
     showToast("Unidad eliminada");
     document.getElementById("unit-id").value = "";
@@ -597,7 +705,7 @@ async function createReservation() {
   }
 }
 
-async function listReservations() {
+async function listReservations(more = false) {
   const out = document.getElementById("reservations-out");
   const summaryEl = document.getElementById("res-summary");
   const upWrapEl = document.getElementById("res-upcoming");
@@ -605,7 +713,14 @@ async function listReservations() {
   const pastTitleEl = document.getElementById("res-past-title");
 
   try {
-    const data = await api("/api/reservations");
+    // Las más lejanas primero: las próximas aparecen en la primera página
+    const state = await loadPage(
+      "reservations",
+      "/api/reservations",
+      { ...ownFilter(), sort: "start_at", order: "desc" },
+      more
+    );
+    const data = state.items;
     const me = getCurrentUser();
     const role = me.role || localStorage.getItem("village_user_role") || "";
 
@@ -644,7 +759,22 @@ async function listReservations() {
         </div>`;
     };
 
-    summaryEl.textContent = `Mis Reservas (${items.length}) — Próximas (${upcoming.length}) — Pasadas (${past.length})`;
+    if (role === "admin") {
+      // Uso por amenidad de los últimos 30 días (GET /api/summary/reservations)
+      if (!more) {
+        const usage = await api("/api/summary/reservations");
+        const total = usage.reduce((acc, a) => acc + a.reservations, 0);
+        const busiest = usage
+          .slice()
+          .sort((a, b) => b.utilization - a.utilization)
+          .slice(0, 3)
+          .map((a) => `${a.name}: ${(a.utilization * 100).toFixed(1)}%`)
+          .join(" · ");
+        summaryEl.textContent = `Reservas últimos 30 días (${total}) — Ocupación: ${busiest || "—"}`;
+      }
+    } else {
+      summaryEl.textContent = `Mis Reservas (${loadedCount(state)}) — Próximas (${upcoming.length}) — Pasadas (${past.length})`;
+    }
 
     upWrapEl.innerHTML = upcoming.length
       ? upcoming.map((r) => cardHTML(r, true)).join("")
@@ -655,6 +785,7 @@ async function listReservations() {
       : `<div class="muted">—</div>`;
 
     pastTitleEl.style.display = past.length ? "" : "none";
+    renderMore("res-past", state, () => listReservations(true));
 
     out.style.display = "none";
     out.textContent = "";
@@ -747,27 +878,45 @@ async function createTicket() {
   }
 }
 
-async function listTickets() {
+async function listTickets(more = false) {
   const summaryEl = document.getElementById("tickets-summary");
   try {
-    const data = await api("/api/tickets");
+    const state = await loadPage(
+      "tickets",
+      "/api/tickets",
+      { ...ownFilter(), sort: "created_at", order: "desc" },
+      more
+    );
+    const data = state.items;
     const me = getCurrentUser();
     const role = me.role || localStorage.getItem("village_user_role") || "";
     const items =
       role === "user" ? (data || []).filter((t) => t.user_id === me.id) : data || [];
 
-    const byUnit = {};
-    items.forEach((t) => {
-      const k = t.unit_id ?? "—";
-      byUnit[k] = (byUnit[k] || 0) + 1;
-    });
-    const unitStr =
-      Object.entries(byUnit)
-        .map(([u, c]) => `unidad ${u}: ${c}`)
-        .join(" · ") || "—";
-    summaryEl.textContent = `Tickets (${items.length}) — Por unidad: ${unitStr}`;
+    if (role === "admin") {
+      // Totales del resumen (GET /api/summary/tickets), no de las páginas cargadas
+      if (!more) {
+        const overview = await api("/api/summary/tickets");
+        const byStatus = Object.entries(overview.by_status || {});
+        const total = byStatus.reduce((acc, [, c]) => acc + c, 0);
+        const statusStr = byStatus.map(([st, c]) => `${st}: ${c}`).join(" · ") || "—";
+        summaryEl.textContent = `Tickets (${total}) — Por estado: ${statusStr}`;
+      }
+    } else {
+      const byUnit = {};
+      items.forEach((t) => {
+        const k = t.unit_id ?? "—";
+        byUnit[k] = (byUnit[k] || 0) + 1;
+      });
+      const unitStr =
+        Object.entries(byUnit)
+          .map(([u, c]) => `unidad ${u}: ${c}`)
+          .join(" · ") || "—";
+      summaryEl.textContent = `Tickets (${loadedCount(state)}) — Por unidad: ${unitStr}`;
+    }
 
     renderTickets(items);
+    renderMore("tickets-list", state, () => listTickets(true));
   } catch (e) {
     summaryEl.textContent = e.message || "Error listando tickets";
     console.error("listTickets error:", e);
@@ -788,41 +937,39 @@ function renderTickets(items) {
     return;
   }
 
-  items
-    .sort((a, b) => a.id - b.id)
-    .forEach((t) => {
-      const card = document.createElement("div");
-      card.className = "card";
-      card.innerHTML = `
-        <div style="display:flex;justify-content:space-between;align-items:flex-start;gap:12px">
-          <div>
-            <h4 style="margin:0">Ticket #${t.id}</h4>
-            <div class="muted" style="margin-top:2px">
-              Usuario: ${t.user_id} ${
-        t.unit_id ? `— Unidad: ${t.unit_id}` : "— Unidad: —"
-      }
-            </div>
+  items.forEach((t) => {
+    const card = document.createElement("div");
+    card.className = "card";
+    card.innerHTML = `
+      <div style="display:flex;justify-content:space-between;align-items:flex-start;gap:12px">
+        <div>
+          <h4 style="margin:0">Ticket #${t.id}</h4>
+          <div class="muted" style="margin-top:2px">
+            Usuario: ${t.user_id} ${
+      t.unit_id ? `— Unidad: ${t.unit_id}` : "— Unidad: —"
+    }
           </div>
-          ${
-            role === "admin"
-              ? `<button class="danger" data-del="${t.id}">Eliminar</button>`
-              : ""
-          }
         </div>
-        <p style="margin:8px 0 4px 0; font-weight:600">${t.title}</p>
-        <p class="muted" style="margin:0">${
-          t.description || "—"
-        }</p>
-      `;
-
-      const btn = card.querySelector("button[data-del]");
-      if (btn)
-        btn.addEventListener("click", () =>
-          deleteTicket(Number(btn.dataset.del))
-        );
+        ${
+          role === "admin"
+            ? `<button class="danger" data-del="${t.id}">Eliminar</button>`
+            : ""
+        }
+      </div>
+      <p style="margin:8px 0 4px 0; font-weight:600">${t.title}</p>
+      <p class="muted" style="margin:0">${
+        t.description || "—"
+      }</p>
+    `;
+
+    const btn = card.querySelector("button[data-del]");
+    if (btn)
+      btn.addEventListener("click", () =>
+        deleteTicket(Number(btn.dataset.del))
+      );
 
-      list.appendChild(card);
-    });
+    list.appendChild(card);
+  });
 }
 
 async function deleteTicket(id) {
@@ -843,8 +990,8 @@ async function deleteTicket(id) {
 /* -------------------- PAYMENTS + AUTOFILL -------------------- */
 
 async function findUnitsByOwner(userId) {
-  const units = await getUnitsCache();
-  return units.filter((u) => u.owner_id === userId);
+  const page = await api(`/api/units?${new URLSearchParams({ owner_id: userId, limit: 10 })}`);
+  return page.items || [];
 }
 
 async function onPayUnitChange() {
@@ -859,8 +1006,7 @@ async function onPayUnitChange() {
     return;
   }
 
-  const units = await getUnitsCache();
-  const u = units.find((x) => x.id === unitId);
+  const u = await api(`/api/units/${unitId}`).catch(() => null);
 
   if (u && Number.isInteger(u.owner_id)) {
     userEl.value = String(u.owner_id);
@@ -961,14 +1107,20 @@ async function createPayment() {
   }
 }
 
-async function listPayments() {
+async function listPayments(more = false) {
   const outEl = document.getElementById("payments-out");
   const summaryEl = document.getElementById("payments-summary");
-  const methodsEl = document.getElementById("payments-methods");
+  const monthsEl = document.getElementById("payments-months");
   const listEl = document.getElementById("payments-list");
 
   try {
-    const data = await api("/api/payments");
+    const state = await loadPage(
+      "payments",
+      "/api/payments",
+      { ...ownFilter(), sort: "paid_at", order: "desc" },
+      more
+    );
+    const data = state.items;
     const me = getCurrentUser();
     const role = me.role || localStorage.getItem("village_user_role") || "";
 
@@ -977,27 +1129,33 @@ async function listPayments() {
 
     const sum = (arr, fn) =>
       arr.reduce((acc, x) => acc + (Number(fn(x)) || 0), 0);
-    const total = sum(items, (x) => x.amount);
-    if (summaryEl)
-      summaryEl.textContent = `Pagos (${items.length}) — Total: $${total.toFixed(
-        2
-      )}`;
-
-    if (methodsEl) {
-      if (role === "admin") {
-        const byMethod = {};
-        items.forEach((p) => {
-          byMethod[p.method] =
-            (byMethod[p.method] || 0) + (Number(p.amount) || 0);
-        });
-        const lines = Object.entries(byMethod)
-          .map(([m, tot]) => `${m}: $${tot.toFixed(2)}`)
-          .join(" · ");
-        methodsEl.textContent = lines || "—";
-        methodsEl.style.display = "";
-      } else {
-        methodsEl.textContent = "";
-        methodsEl.style.display = "none";
+    if (role === "admin") {
+      // Totales del resumen mensual (GET /api/summary/payments?group=month)
+      if (!more) {
+        const months = await api("/api/summary/payments?group=month");
+        const total = sum(months, (m) => m.total);
+        if (summaryEl)
+          summaryEl.textContent = `Pagos (${sum(months, (m) => m.count)}) — Total: $${total.toFixed(
+            2
+          )}`;
+        if (monthsEl) {
+          const lines = months
+            .slice(-6)
+            .map((m) => `${m.month}: $${m.total.toFixed(2)}`)
+            .join(" · ");
+          monthsEl.textContent = lines || "—";
+          monthsEl.style.display = "";
+        }
+      }
+    } else {
+      const total = sum(items, (x) => x.amount);
+      if (summaryEl)
+        summaryEl.textContent = `Pagos (${loadedCount(state)}) — Total: $${total.toFixed(
+          2
+        )}`;
+      if (monthsEl) {
+        monthsEl.textContent = "";
+        monthsEl.style.display = "none";
       }
     }
 
@@ -1009,40 +1167,38 @@ async function listPayments() {
         p.textContent = "— Sin pagos —";
         listEl.appendChild(p);
       } else {
-        items
-          .slice()
-          .sort((a, b) => a.id - b.id)
-          .forEach((p) => {
-            const card = document.createElement("div");
-            card.className = "card";
-            card.innerHTML = `
-              <div class="row space">
-                <strong>Pago #${p.id}</strong>
-                <span class="badge">${(p.method || "").toUpperCase()}</span>
-              </div>
-              <div class="muted small">Usuario: ${p.user_id} — Unidad: ${
-              p.unit_id ?? "—"
-            }</div>
-              <div class="row space" style="margin-top:6px">
-                <div>$${Number(p.amount || 0).toFixed(2)}</div>
-                <div class="muted small">${fmt(p.paid_at)}</div>
-              </div>
-              ${
-                role === "admin"
-                  ? `<div class="actions right" style="margin-top:8px">
-                     <button class="danger sm" data-del="${p.id}">Eliminar</button>
-                   </div>`
-                  : ``
-              }
-            `;
-            const btn = card.querySelector("button[data-del]");
-            if (btn)
-              btn.addEventListener("click", () =>
-                deletePaymentById(Number(btn.dataset.del))
-              );
-            listEl.appendChild(card);
-          });
+        items.forEach((p) => {
+          const card = document.createElement("div");
+          card.className = "card";
+          card.innerHTML = `
+            <div class="row space">
+              <strong>Pago #${p.id}</strong>
+              <span class="badge">${(p.method || "").toUpperCase()}</span>
+            </div>
+            <div class="muted small">Usuario: ${p.user_id} — Unidad: ${
+            p.unit_id ?? "—"
+          }</div>
+            <div class="row space" style="margin-top:6px">
+              <div>$${Number(p.amount || 0).toFixed(2)}</div>
+              <div class="muted small">${fmt(p.paid_at)}</div>
+            </div>
+            ${
+              role === "admin"
+                ? `<div class="actions right" style="margin-top:8px">
+                   <button class="danger sm" data-del="${p.id}">Eliminar</button>
+                 </div>`
+                : ``
+            }
+          `;
+          const btn = card.querySelector("button[data-del]");
+          if (btn)
+            btn.addEventListener("click", () =>
+              deletePaymentById(Number(btn.dataset.del))
+            );
+          listEl.appendChild(card);
+        });
       }
+      renderMore("payments-list", state, () => listPayments(true));
     }
 
     if (outEl) {
@@ -1137,7 +1293,7 @@ async function createUser() {
   }
 }
 
-async function listUsers() {
+async function listUsers(more = false) {
   const outEl = document.getElementById("users-out");
   const summaryEl = document.getElementById("users-summary");
   const listEl = document.getElementById("users-list");
@@ -1150,17 +1306,18 @@ async function listUsers() {
   if (listEl) listEl.innerHTML = "";
 
   try {
-    const data = await api(USERS_PATH);
-    const items = data || [];
+    const state = await loadPage("users", USERS_PATH, {}, more);
+    const items = state.items;
 
     const admins = items.filter((u) => u.role === "admin").length;
     const usersCount = items.length - admins;
 
     if (summaryEl) {
-      summaryEl.textContent = `Usuarios (${items.length}) — Admins: ${admins} · Users: ${usersCount}`;
+      summaryEl.textContent = `Usuarios (${loadedCount(state)}) — Admins: ${admins} · Users: ${usersCount}`;
     }
 
     if (!listEl) return;
+    renderMore("users-list", state, () => listUsers(true));
 
     if (!items.length) {
       const p = document.createElement("p");
@@ -1170,31 +1327,28 @@ async function listUsers() {
       return;
     }
 
-    items
-      .slice()
-      .sort((a, b) => a.id - b.id)
-      .forEach((u) => {
-        const card = document.createElement("div");
-        card.className = "card";
+    items.forEach((u) => {
+      const card = document.createElement("div");
+      card.className = "card";
 
-        const roleLabel = (u.role || "user").toUpperCase();
-        const badgeClass = roleLabel === "ADMIN" ? "approved" : "pending";
+      const roleLabel = (u.role || "user").toUpperCase();
+      const badgeClass = roleLabel === "ADMIN" ? "approved" : "pending";
 
-        card.innerHTML = `
-          <div class="row space">
-            <div>
-              <div style="font-weight:600">[${u.id}] ${
-          u.name || "(sin nombre)"
-        }</div>
-              <div class="muted small">${u.email || "— sin email —"}</div>
-            </div>
-            <span class="badge ${badgeClass}">${roleLabel}</span>
+      card.innerHTML = `
+        <div class="row space">
+          <div>
+            <div style="font-weight:600">[${u.id}] ${
+        u.name || "(sin nombre)"
+      }</div>
+            <div class="muted small">${u.email || "— sin email —"}</div>
           </div>
-          <div class="muted small">Activo: ${u.is_active ? "Sí" : "No"}</div>
-        `;
+          <span class="badge ${badgeClass}">${roleLabel}</span>
+        </div>
+        <div class="muted small">Activo: ${u.is_active ? "Sí" : "No"}</div>
+      `;
 
-        listEl.appendChild(card);
-      });
+      listEl.appendChild(card);
+    });
   } catch (e) {
     if (outEl) {
       outEl.style.display = "";
@@ -1279,6 +1433,7 @@ async function deleteUser() {
 
 /* -------------------- LOGOUT -------------------- */
 function logout() {
+  stopEvents();
   localStorage.removeItem("village_token");
   localStorage.removeItem("village_user_role");
   localStorage.removeItem("village_user");